@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# Watches a fleet of sensor-server nodes from one PC: polls /data.json of
+# each node, keeps the latest readings of all of them in one model keyed by
+# (node, sensor), and serves them as a combined page and as JSON.
+#
+#   python3 aggregator.py house=192.168.1.20 garden=192.168.1.21:80
+#   python3 aggregator.py --nodes nodes.txt --port 4444 --history /var/lib/heating
+#
+# nodes.txt has one "name host[:port]" per line. Everything runs in one
+# asyncio loop: each poll has its own timeout, a node that fails is polled
+# again after 2, 4, 8 ... up to 300 s, and at most 'parallel' polls run at
+# once, so hundreds of nodes cost one core very little. Nodes answer 304 to
+# a poll when nothing changed (see send_data in sensorserver.py).
+# With --history every new reading also goes to a history.py store, as the
+# series NODE/SENSOR.
+
+import argparse
+import asyncio
+import html
+import json
+import time
+
+import history
+
+class Node:
+    def __init__(self, name, host, port=80):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.data = None # the last /data.json
+        self.etag = None
+        self.updated = None # when data last came
+        self.polled = None # when we last got any answer
+        self.error = None
+        self.failures = 0 # in a row
+        self.backoff = 0
+        self.next_poll = 0
+
+    def status(self, now, stale):
+        if self.updated is None:
+            return "down" if self.failures else "unknown"
+        if self.failures or now - self.polled > stale:
+            return "stale"
+        return "ok"
+
+
+def readings(data):
+    # /data.json of one node -> {sensor: value}, sensor names like
+    # 'temperature.water'
+    out = {}
+    for name, t in data.get("temperatures", {}).items():
+        out["temperature." + name] = t
+    for name in ("should_heat", "heating_running", "electric", "garden_water_level",
+                 "operated_hours", "electric_hours", "uptime_hours",
+                 "desiredHouseMin", "desiredWaterMin"):
+        if name in data:
+            out[name] = data[name]
+    return out
+
+
+async def http_get(host, port, path, headers, timeout):
+    # a tiny HTTP/1.0 client: (status, headers, body)
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        request = "GET %s HTTP/1.0\r\nHost: %s\r\n" % (path, host)
+        for k, v in headers.items():
+            request += "%s: %s\r\n" % (k, v)
+        writer.write((request + "\r\n").encode())
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    hdrs = {}
+    for line in lines[1:]:
+        k, _, v = line.partition(":")
+        hdrs[k.strip().lower()] = v.strip()
+    return status, hdrs, body
+
+
+class Aggregator:
+    def __init__(self, nodes, period=10, timeout=3, max_backoff=300, parallel=64, stale=60,
+                 store=None):
+        self.store = store # history.Store, or None
+        self.nodes = dict((n.name, n) for n in nodes)
+        self.period = period # seconds between polls of a healthy node
+        self.timeout = timeout # per poll
+        self.max_backoff = max_backoff
+        self.stale = stale # seconds without an answer before data is stale
+        self.limit = asyncio.Semaphore(parallel)
+        self.model = {} # (node, sensor) -> (value, time)
+        self.polls = 0
+        self.version = 0 # counts changes of the model
+
+    async def poll(self, node):
+        async with self.limit:
+            now = time.time()
+            headers = {"If-None-Match": node.etag} if node.etag else {}
+            try:
+                status, hdrs, body = await http_get(node.host, node.port, "/data.json",
+                                                    headers, self.timeout)
+                if status == 200:
+                    data = json.loads(body)
+                    node.data = data
+                    node.etag = hdrs.get("etag")
+                    node.updated = now
+                    for sensor, value in readings(data).items():
+                        self.model[(node.name, sensor)] = (value, now)
+                        if self.store is not None and isinstance(value, (int, float)):
+                            self.store.append(node.name + "/" + sensor, now, value)
+                    self.version += 1
+                elif status != 304:
+                    raise OSError("HTTP %d" % status)
+                node.polled = now
+                node.error = None
+                node.failures = 0
+                node.backoff = 0
+                node.next_poll = now + self.period
+            except (OSError, ValueError, IndexError, asyncio.TimeoutError) as e:
+                node.error = str(e) or e.__class__.__name__
+                node.failures += 1
+                node.backoff = min(max(2, node.backoff * 2), self.max_backoff)
+                node.next_poll = now + node.backoff
+            self.polls += 1
+
+    async def run(self):
+        # start the polls that are due, once a second
+        pending = set()
+        flushed = time.time()
+        while True:
+            now = time.time()
+            if self.store is not None and now - flushed > 600:
+                self.store.flush()
+                flushed = now
+            for node in self.nodes.values():
+                if node.next_poll <= now and node not in pending:
+                    pending.add(node)
+                    task = asyncio.ensure_future(self.poll(node))
+                    task.add_done_callback(lambda t, n=node: pending.discard(n))
+            await asyncio.sleep(1)
+
+    def api_nodes(self):
+        now = time.time()
+        return dict((n.name, {
+          "host": "%s:%d" % (n.host, n.port),
+          "status": n.status(now, self.stale),
+          "updated": n.updated,
+          "failures": n.failures,
+          "error": n.error,
+          "readings": readings(n.data) if n.data else {},
+        }) for n in self.nodes.values())
+
+    def api_readings(self):
+        return [{"node": node, "sensor": sensor, "value": value, "time": t}
+                for (node, sensor), (value, t) in sorted(self.model.items())]
+
+    def dashboard(self):
+        now = time.time()
+        sensors = sorted(set(s for (_, s) in self.model))
+        rows = []
+        for n in sorted(self.nodes.values(), key=lambda n: n.name):
+            cells = []
+            for s in sensors:
+                v = self.model.get((n.name, s))
+                cells.append("<td>%s</td>" % ("" if v is None else html.escape(str(v[0]))))
+            rows.append('<tr><th><a href="http://%s:%d/">%s</a></th><td>%s</td>%s</tr>' % (
+                html.escape(n.host), n.port, html.escape(n.name),
+                n.status(now, self.stale), "".join(cells)))
+        return ("<!DOCTYPE html><html><head><title>Heating fleet</title>"
+                '<meta http-equiv="refresh" content="%d"></head><body>'
+                "<h1>Heating fleet</h1><table border=1><tr><th>node</th><th>status</th>%s</tr>"
+                "%s</table><p>%d nodes, %d polls</p></body></html>") % (
+                    self.period, "".join("<th>%s</th>" % html.escape(s) for s in sensors),
+                    "".join(rows), len(self.nodes), self.polls)
+
+    async def serve_client(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.timeout)
+            while (await asyncio.wait_for(reader.readline(), self.timeout)) not in (b"\r\n", b"\n", b""):
+                pass # the headers, we do not need them
+            parts = line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+            if path == "/":
+                ctype, body = "text/html", self.dashboard()
+            elif path == "/api/nodes":
+                ctype, body = "application/json", json.dumps(self.api_nodes())
+            elif path == "/api/readings":
+                ctype, body = "application/json", json.dumps(self.api_readings())
+            else:
+                writer.write(b"HTTP/1.0 404 Not Found\r\n\r\n")
+                return
+            body = body.encode()
+            writer.write(("HTTP/1.0 200 OK\r\nContent-type: %s\r\nContent-Length: %d\r\n"
+                          "Cache-Control: no-cache\r\n\r\n" % (ctype, len(body))).encode())
+            writer.write(body)
+            await writer.drain()
+        except (OSError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+
+def parse_node(name, address):
+    host, _, port = address.partition(":")
+    return Node(name, host, int(port) if port else 80)
+
+def load_nodes(args):
+    nodes = []
+    for spec in args.node:
+        name, _, address = spec.partition("=")
+        nodes.append(parse_node(name, address or name))
+    if args.nodes:
+        with open(args.nodes) as f:
+            for line in f:
+                line = line.split("#")[0].split()
+                if len(line) == 2:
+                    nodes.append(parse_node(*line))
+    return nodes
+
+async def main(args):
+    store = history.Store(args.history) if args.history else None
+    agg = Aggregator(load_nodes(args), period=args.period, timeout=args.timeout, store=store)
+    server = await asyncio.start_server(agg.serve_client, args.bind, args.port)
+    print("Watching %d nodes, serving on %s:%d" % (len(agg.nodes), args.bind, args.port))
+    try:
+        async with server:
+            await agg.run()
+    finally:
+        if store is not None:
+            store.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll many sensor-server nodes, serve them on one page.")
+    parser.add_argument("node", nargs="*", help="name=host[:port]")
+    parser.add_argument("--nodes", help="file with 'name host[:port]' lines")
+    parser.add_argument("--port", type=int, default=4444)
+    parser.add_argument("--bind", default="0.0.0.0")
+    parser.add_argument("--period", type=float, default=10, help="seconds between polls")
+    parser.add_argument("--timeout", type=float, default=3, help="seconds per poll")
+    parser.add_argument("--history", help="directory of a history store to record to")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
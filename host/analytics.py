@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Offline analysis of what the nodes recorded, with NumPy (no loops per
+# sample) and plots with matplotlib, headless.
+#
+#   python3 analytics.py correlations ../sensor-server/temp-correlations.tab --plot corr.png
+#       how our sensor relates to the mid and top tank thermometers:
+#       correlations and linear fits
+#   python3 analytics.py daily /var/lib/heating house --days 365 --plot daily.png
+#       per day from a history.py store: heating and electric hours, duty
+#       cycle and relay cycles
+#
+# A year of 5 s history is decoded straight from the chunk files into arrays
+# (load_series), which takes seconds.
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import history
+
+DAY = 86400
+MAXGAP = 120 # seconds; a longer gap between samples is time we know nothing about
+
+def load_tab(path):
+    # temp-correlations.tab: mid, top, sensor and a free comment per line
+    rows, comments = [], []
+    with open(path) as f:
+        next(f) # the header
+        for line in f:
+            parts = line.split(None, 3)
+            if len(parts) < 3:
+                continue
+            rows.append([float(p) for p in parts[:3]])
+            comments.append(parts[3].strip() if len(parts) > 3 else "")
+    data = np.array(rows)
+    return {"mid": data[:, 0], "top": data[:, 1], "sensor": data[:, 2], "comment": comments}
+
+def fit(x, y):
+    # least squares y = a*x + b; returns a, b, r and the residual std
+    a, b = np.polyfit(x, y, 1)
+    r = np.corrcoef(x, y)[0, 1]
+    return a, b, r, np.std(y - (a * x + b))
+
+def correlations(tab):
+    names = ["mid", "top", "sensor"]
+    matrix = np.corrcoef(np.vstack([tab[n] for n in names]))
+    fits = dict((n, fit(tab["sensor"], tab[n])) for n in ("mid", "top"))
+    return names, matrix, fits
+
+
+def varints(buf):
+    # all zigzag varints in buf, decoded at once
+    b = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # position of each byte within its varint
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    pos = np.arange(len(b)) - starts[group]
+    z = np.add.reduceat((b & 0x7f).astype(np.int64) << (7 * pos).astype(np.int64), starts)
+    return (z >> 1) ^ -(z & 1)
+
+def load_series(store, name, t0, t1):
+    # (times, values) arrays of one series of a history.Store
+    s = store.get(name)
+    parts_t, parts_v = [], []
+    with open(s.base + '.chunks', 'rb') as f:
+        data = f.read()
+    for offset, nbytes, count, first, last, vmin, vmax in s.index:
+        if last < t0 or first >= t1:
+            continue
+        z = varints(data[offset:offset + nbytes])
+        times = np.empty(count, dtype=np.int64)
+        times[0] = first
+        times[1:] = first + np.cumsum(np.cumsum(z[:count - 1]))
+        parts_t.append(times)
+        parts_v.append(np.cumsum(z[count - 1:]) / s.scale)
+    parts_t.append(np.array(s.times, dtype=np.int64))
+    parts_v.append(np.array(s.values, dtype=np.float64) / s.scale)
+    times = np.concatenate(parts_t)
+    values = np.concatenate(parts_v)
+    keep = (times >= t0) & (times < t1)
+    return times[keep], values[keep]
+
+def on_time(times, state):
+    # seconds each sample stands for, and how many of them the state was on
+    dt = np.minimum(np.diff(times, append=times[-1:]), MAXGAP)
+    return dt, dt * (state > 0.5)
+
+def daily(store, node, t0, t1, tz=0):
+    # per local day from t0 to t1: heating hours, electric hours, duty cycle
+    # (of the time we have data for) and relay cycles
+    first = (int(t0) + tz) // DAY
+    n = (int(t1) + tz) // DAY - first + 1
+    days = {"day": (first + np.arange(n)) * DAY - tz}
+    for key, series in (("heating", "heating_running"), ("electric", "electric")):
+        days[key + "_hours"] = np.zeros(n)
+        times, state = load_series(store, node + "/" + series, t0, t1)
+        if len(times) == 0:
+            continue
+        idx = (times + tz) // DAY - first
+        dt, on = on_time(times, state)
+        days[key + "_hours"] = np.bincount(idx, weights=on, minlength=n) / 3600
+        if key == "heating":
+            seen = np.bincount(idx, weights=dt, minlength=n)
+            days["duty"] = np.divide(days["heating_hours"] * 3600, seen,
+                                     out=np.zeros(n), where=seen > 0)
+            rising = np.flatnonzero(np.diff((state > 0.5).astype(np.int8)) > 0) + 1
+            days["cycles"] = np.bincount(idx[rising], minlength=n)
+    if "cycles" not in days:
+        return None
+    return days
+
+
+def plot_correlations(tab, fits, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    fig, (left, right) = plt.subplots(1, 2, figsize=(12, 5))
+    x = np.arange(1, len(tab["mid"]) + 1)
+    for n in ("mid", "top", "sensor"):
+        left.plot(x, tab[n], marker="o", label=n)
+    left.set_xlabel("measurement")
+    left.set_ylabel("°C")
+    left.legend()
+    xs = np.linspace(tab["sensor"].min(), tab["sensor"].max(), 2)
+    for n in ("mid", "top"):
+        a, b, r, sd = fits[n]
+        right.scatter(tab["sensor"], tab[n], label=n)
+        right.plot(xs, a * xs + b, label="%s = %.2f sensor %+.1f (r %.2f)" % (n, a, b, r))
+    right.set_xlabel("our sensor °C")
+    right.set_ylabel("tank °C")
+    right.legend()
+    fig.tight_layout()
+    fig.savefig(path)
+
+def plot_daily(days, path):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    dates = days["day"].astype("datetime64[s]")
+    fig, (hours, cycles) = plt.subplots(2, 1, figsize=(12, 6), sharex=True)
+    hours.bar(dates, days["heating_hours"], label="heating hours")
+    hours.bar(dates, days["electric_hours"], label="electric hours")
+    hours.legend()
+    cycles.bar(dates, days["cycles"], label="relay cycles")
+    cycles.legend()
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Offline analysis of the heating data")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("correlations", help="our sensor vs the tank thermometers")
+    c.add_argument("tab")
+    c.add_argument("--plot", help="write a PNG here")
+    d = sub.add_parser("daily", help="hours and relay cycles per day")
+    d.add_argument("store")
+    d.add_argument("node")
+    d.add_argument("--days", type=float, default=365)
+    d.add_argument("--tz-hours", type=float, default=1, help="local time offset")
+    d.add_argument("--plot", help="write a PNG here")
+    args = parser.parse_args(argv)
+    if args.cmd == "correlations":
+        tab = load_tab(args.tab)
+        names, matrix, fits = correlations(tab)
+        print("correlations (%d measurements)" % len(tab["mid"]))
+        print("        " + "".join("%8s" % n for n in names))
+        for n, row in zip(names, matrix):
+            print("%-8s" % n + "".join("%8.3f" % v for v in row))
+        for n, (a, b, r, sd) in fits.items():
+            print("%s = %.3f * sensor %+.2f  (r %.3f, residual %.2f °C)" % (n, a, b, r, sd))
+        if args.plot:
+            plot_correlations(tab, fits, args.plot)
+    else:
+        start = time.time()
+        now = time.time()
+        days = daily(history.Store(args.store), args.node, now - args.days * DAY, now,
+                     int(args.tz_hours * 3600))
+        if days is None:
+            print("no heating_running history for", args.node)
+            return
+        print("day\theating_h\telectric_h\tduty\tcycles")
+        for i in range(len(days["day"])):
+            print("%s\t%.2f\t%.2f\t%.2f\t%d" % (
+                np.datetime64(int(days["day"][i]), "s").astype("datetime64[D]"),
+                days["heating_hours"][i], days["electric_hours"][i],
+                days["duty"][i], days["cycles"][i]))
+        print("(%.2f s)" % (time.time() - start), file=sys.stderr)
+        if args.plot:
+            plot_daily(days, args.plot)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
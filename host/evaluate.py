@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# Offline evaluation of the heating control on recorded history: how the
+# threshold rule of the firmware (Params.decide_if_heat with the min run and
+# stop times of Heating.set_heating) and the predictive controller
+# (predictive.py) would have done on the same days.
+#
+#   python3 evaluate.py DIR house --days 60 --house-min 20 --water-min 35
+#   python3 evaluate.py --synthetic 60        (made-up days, no store needed)
+#
+# The firmware code itself is run (decision.py and predictive.py from
+# ../sensor-server, which touch no hardware), so this tests what goes to the
+# Pico. A replay cannot just feed the recorded temperatures: another
+# controller would have changed them. So a small plant model is
+# fitted to the recording (the same linear rates predictive.py learns, here
+# by batch least squares), and only the difference a controller makes is
+# simulated on top of the recorded temperatures: the weather and the wood
+# fires stay as they were.
+#
+# Reports per controller: relay cycles, heating hours, degree-hours the house
+# spent below desiredHouseMin, and tank degrees spent on heating.
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import history
+from analytics import load_series, DAY
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sensor-server"))
+import decision
+import predictive
+
+TANK = predictive.TANK
+REF = 20.0 # the house temperature the cooling rate is fitted around
+
+def load(store, node, t0, t1, step=60):
+    # the recording on a regular grid: times, house, the tank thermometers
+    # and the relay
+    house = load_series(store, node + "/temperature.house", t0, t1)
+    relay = load_series(store, node + "/heating_running", t0, t1)
+    if len(house[0]) == 0 or len(relay[0]) == 0:
+        return None
+    start = max(house[0][0], relay[0][0])
+    end = min(house[0][-1], relay[0][-1])
+    t = np.arange(start, end, step, dtype=np.int64)
+    data = {"time": t, "step": step, "house": np.interp(t, *house)}
+    names = store.names()
+    for n in TANK:
+        if node + "/temperature." + n in names:
+            data[n] = np.interp(t, *load_series(store, node + "/temperature." + n, t0, t1))
+    if "water" not in data:
+        return None
+    idx = np.clip(np.searchsorted(relay[0], t, side="right") - 1, 0, len(relay[0]) - 1)
+    data["running"] = relay[1][idx] > 0.5
+    return data
+
+def tank_max(data):
+    return np.max(np.vstack([data[n] for n in TANK if n in data]), axis=0)
+
+
+class Plant:
+    # house' and water' in degrees per hour, fitted on the recording:
+    #   off: house' = a0 + a1 (house - REF)   water' = d0 + d1 (water - house)
+    #   on:  house' = b0 + b1 (water - house) water' = c0 + c1 (water - house)
+    def __init__(self, data, period=300):
+        k = max(1, int(period // data["step"]))
+        h, w, on = data["house"], tank_max(data), data["running"].astype(np.int64)
+        i = np.arange(0, len(h) - k, k)
+        runs = np.concatenate([[0], np.cumsum(on)])
+        ons = runs[i + k + 1] - runs[i]
+        hours = k * data["step"] / 3600
+        dh = (h[i + k] - h[i]) / hours
+        dw = (w[i + k] - w[i]) / hours
+        hm = (h[i + k] + h[i]) / 2
+        x = (w[i + k] + w[i]) / 2 - hm
+        off, run = ons == 0, ons == k + 1
+        self.samples = (int(off.sum()), int(run.sum()))
+        if min(self.samples) < 3:
+            raise ValueError("too few samples with the relay on and off: %s" % (self.samples,))
+        self.cooling = self.fit(hm[off] - REF, dh[off])
+        self.heating = self.fit(x[run], dh[run])
+        # the tank only while nothing charges it (no fire, no sun)
+        self.tank_on = self.fit(x[run & (dw <= 0)], dw[run & (dw <= 0)])
+        self.tank_off = self.fit(x[off & (dw <= 0)], dw[off & (dw <= 0)])
+
+    def fit(self, x, y):
+        c = np.linalg.lstsq(np.vstack([np.ones_like(x), x]).T, y, rcond=None)[0]
+        return float(c[0]), float(c[1])
+
+    def effect(self, h, w):
+        # what running does to the house and the tank, over not running
+        dh = self.heating[0] + self.heating[1] * (w - h) - (self.cooling[0] + self.cooling[1] * (h - REF))
+        dw = self.tank_on[0] + self.tank_on[1] * (w - h) - (self.tank_off[0] + self.tank_off[1] * (w - h))
+        return dh, dw
+
+
+class Readings:
+    # what Params.decide_if_heat reads from Temperatures
+    def __init__(self):
+        self.temperatures = {}
+
+def make_params(house_min, water_min, min_run=3, min_stop=10):
+    params = decision.Params()
+    params.desiredHouseMin = house_min
+    params.desiredWaterMin = water_min
+    params.min_runtime_minutes = min_run
+    params.min_stoptime_minutes = min_stop
+    return params
+
+def simulate(data, plant, params, predictor=None):
+    # run a controller over the recording; None as params replays the relay
+    # as recorded
+    t, step = data["time"], data["step"]
+    hours = step / 3600
+    tank = dict((n, data[n]) for n in TANK if n in data)
+    wmax = tank_max(data)
+    readings = Readings()
+    readings.temperatures = dict.fromkeys(("house",) + TANK)
+    dh = dw = 0.0 # how much warmer the house and the tank are than recorded
+    running, lastON, lastOFF = False, -1e12, -1e12
+    starts, was_on = 0, False
+    on_hours = deficit = tank_used = 0.0
+    house_min = params.desiredHouseMin if params else 20
+    for i in range(len(t)):
+        now = int(t[i])
+        h = float(data["house"][i]) + dh
+        w = float(wmax[i]) + dw
+        if params is None:
+            on = bool(data["running"][i])
+        else:
+            readings.temperatures["house"] = h
+            for n, v in tank.items():
+                readings.temperatures[n] = float(v[i]) + dw
+            if predictor is not None:
+                predictor.observe(now, readings.temperatures, running, params.desiredHouseMin)
+                should_heat = predictor.decide(now, readings, params, running)
+            else:
+                should_heat = params.decide_if_heat(readings)
+            # as Heating.set_heating
+            if running and not should_heat and now - lastON > params.min_runtime_minutes * 60:
+                running, lastOFF = False, now
+            elif not running and should_heat and now - lastOFF > params.min_stoptime_minutes * 60:
+                running, lastON = True, now
+            on = running
+        if on and not was_on:
+            starts += 1
+        was_on = on
+        eh, ew = plant.effect(h, w)
+        rh, rw = plant.effect(float(data["house"][i]), float(wmax[i])) if data["running"][i] else (0.0, 0.0)
+        dh += (plant.cooling[1] * dh + (eh if on else 0.0) - rh) * hours
+        dw += ((ew if on else 0.0) - rw) * hours
+        if on:
+            on_hours += hours
+            tank_used -= ew * hours
+        deficit += max(0.0, house_min - h) * hours
+    days = len(t) * hours / 24
+    return {"cycles": starts, "cycles_per_day": starts / days, "heating_hours": on_hours,
+            "deficit_degree_hours": deficit, "tank_degrees": tank_used}
+
+
+def synthetic(days, step=60, house_min=20, water_min=35, seed=1):
+    # made-up days: cold nights, a wood fire every evening, the threshold
+    # rule with short runs; to try the evaluator without a store
+    rng = np.random.default_rng(seed)
+    n = int(days * DAY / step)
+    t = 1700000000 + np.arange(n, dtype=np.int64) * step
+    hod = (t % DAY) / 3600
+    outdoor = 6 + 5 * np.sin((hod - 9) / 24 * 2 * np.pi) + np.repeat(rng.normal(0, 3, days + 1), DAY // step)[:n]
+    fire = ((hod >= 18) & (hod < 20)).astype(float)
+    house = np.empty(n)
+    water = np.empty(n)
+    running = np.zeros(n, dtype=bool)
+    h, w, on, changed = 20.0, 50.0, False, -1e12
+    hours = step / 3600
+    for i in range(n):
+        want = h < house_min and w > water_min
+        if want != on and t[i] - changed > (3 if on else 10) * 60:
+            on, changed = want, t[i]
+        h += (-0.05 * (h - outdoor[i]) + (0.1 * (w - h) if on else 0.0)) * hours
+        w += (-0.02 * (w - 20) + 20 * fire[i] - (0.2 * (w - h) if on else 0.0)) * hours
+        house[i], water[i], running[i] = h, w, on
+    q = 0.0625 # the resolution of a DS18B20
+    return {"time": t, "step": step, "running": running,
+            "house": np.round((house + rng.normal(0, 0.03, n)) / q) * q,
+            "water": np.round((water + rng.normal(0, 0.05, n)) / q) * q}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Threshold vs predictive control on recorded history")
+    parser.add_argument("store", nargs="?")
+    parser.add_argument("node", nargs="?")
+    parser.add_argument("--days", type=float, default=30)
+    parser.add_argument("--synthetic", type=int, metavar="DAYS", help="made-up history instead of a store")
+    parser.add_argument("--step", type=int, default=60, help="seconds between decisions")
+    parser.add_argument("--house-min", type=float, default=20)
+    parser.add_argument("--water-min", type=float, default=35)
+    parser.add_argument("--min-run", type=float, default=3, help="minutes")
+    parser.add_argument("--min-stop", type=float, default=10, help="minutes")
+    args = parser.parse_args(argv)
+    start = time.time()
+    if args.synthetic:
+        data = synthetic(args.synthetic, args.step, args.house_min, args.water_min)
+    elif args.store and args.node:
+        now = time.time()
+        data = load(history.Store(args.store), args.node, now - args.days * DAY, now, args.step)
+        if data is None:
+            print("no house, water and heating_running history for", args.node)
+            return
+    else:
+        parser.error("give a store and a node, or --synthetic DAYS")
+    plant = Plant(data)
+    print("plant (degrees per hour), from %d off and %d on samples:" % plant.samples)
+    print("  house off: %+.3f %+.4f (house - %g)" % (plant.cooling[0], plant.cooling[1], REF))
+    print("  house on:  %+.3f %+.4f (water - house)" % tuple(plant.heating))
+    print("  tank on:   %+.3f %+.4f (water - house)" % tuple(plant.tank_on))
+    print("  tank off:  %+.3f %+.4f (water - house)" % tuple(plant.tank_off))
+    params = lambda: make_params(args.house_min, args.water_min, args.min_run, args.min_stop)
+    predictor = predictive.Predictor(filename=os.devnull)
+    results = [("recorded", simulate(data, plant, None)),
+               ("threshold", simulate(data, plant, params())),
+               ("predictive", simulate(data, plant, params(), predictor))]
+    print("\n%-11s %8s %10s %10s %14s %12s" % ("", "cycles", "cycles/day", "heating_h",
+                                              "below_min_Ch", "tank_C"))
+    for name, r in results:
+        print("%-11s %8d %10.1f %10.1f %14.1f %12.1f" % (
+            name, r["cycles"], r["cycles_per_day"], r["heating_hours"],
+            r["deficit_degree_hours"], r["tank_degrees"]))
+    print("\nlearned on the Pico side:", predictor.as_dict())
+    print("(%.1f s)" % (time.time() - start), file=sys.stderr)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# Long-term history of the readings: one column per series (e.g.
+# 'house/water', 'house/heating_running'); a 5 s temperature costs about 2
+# bytes a sample, 13 MB a year.
+#
+# Files of a series, all append-only:
+#   NAME.chunks  chunks of up to CHUNK points: timestamps as delta-of-delta
+#                and values as fixed-point deltas, both zigzag varints, so a
+#                regular 5 s sample of a slow temperature costs ~2 bytes
+#   NAME.index   one fixed record per chunk: where it is, its time range and
+#                min/max, so a query decodes only the chunks it needs
+#   NAME.hour, NAME.day
+#                rollups, one fixed record (start, count, sum, min, max) per
+#                hour / day, memory-mapped and bisected by time: a year at
+#                1 h resolution is 8760 records, a few ms
+#   NAME.meta    the fixed-point scale
+#
+# Points must come in time order per series (older ones are dropped and
+# counted). Appends are buffered in RAM and written a chunk at a time, or on
+# flush(); queries see the buffer too.
+#
+#   python3 history.py bench /tmp/hist      (a year of 5 s data, then queries)
+#   python3 history.py query DIR house/water --days 365 --step 3600
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import time
+
+CHUNK = 4096 # points
+INDEX = struct.Struct('<qIIqqdd') # offset, bytes, count, first t, last t, min, max
+ROLLUP = struct.Struct('<qIddd') # bucket start, count, sum, min, max
+HOUR = 3600
+DAY = 86400
+
+def zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+def put_varint(out, n):
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+def encode(times, values):
+    # times: ints, values: fixed-point ints; the first time is in the index
+    out = bytearray()
+    last, delta = times[0], 0
+    for t in times[1:]:
+        d = t - last
+        put_varint(out, zigzag(d - delta))
+        last, delta = t, d
+    last = 0
+    for v in values:
+        put_varint(out, zigzag(v - last))
+        last = v
+    return out
+
+def decode(buf, start, count, t0):
+    # -> (times, values as fixed-point ints)
+    pos = start
+    def varints(n):
+        nonlocal pos
+        res = [0] * n
+        for i in range(n):
+            shift = z = 0
+            while True:
+                b = buf[pos]
+                pos += 1
+                z |= (b & 0x7f) << shift
+                if b < 0x80:
+                    break
+                shift += 7
+            res[i] = (z >> 1) ^ -(z & 1)
+        return res
+    times = [t0] * count
+    t, delta = t0, 0
+    for i, dd in enumerate(varints(count - 1), 1):
+        delta += dd
+        t += delta
+        times[i] = t
+    values = varints(count)
+    v = 0
+    for i in range(count):
+        v += values[i]
+        values[i] = v
+    return times, values
+
+
+class Rollup:
+    # fixed-size bucket records in one file; the last one may still grow
+    def __init__(self, path, width):
+        self.path = path
+        self.width = width
+        open(path, 'ab').close()
+        self.map = None
+
+    def count(self):
+        return os.path.getsize(self.path) // ROLLUP.size
+
+    def last(self):
+        n = self.count()
+        if n == 0:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek((n - 1) * ROLLUP.size)
+            return list(ROLLUP.unpack(f.read(ROLLUP.size)))
+
+    def add(self, times, values, scale):
+        # fold points (in time order, after all that is stored) into buckets
+        last = self.last()
+        replace = last is not None
+        cur = last
+        out = []
+        for t, v in zip(times, values):
+            v = v / scale
+            b = t - t % self.width
+            if cur is not None and cur[0] == b:
+                cur[1] += 1
+                cur[2] += v
+                if v < cur[3]: cur[3] = v
+                if v > cur[4]: cur[4] = v
+            else:
+                if cur is not None:
+                    out.append(cur)
+                cur = [b, 1, v, v, v]
+        out.append(cur)
+        data = b''.join(ROLLUP.pack(*r) for r in out)
+        n = self.count()
+        with open(self.path, 'r+b') as f:
+            f.seek((n - 1 if replace else n) * ROLLUP.size)
+            f.write(data)
+        self.map = None
+
+    def query(self, t0, t1):
+        # records with t0 <= start < t1
+        n = self.count()
+        if n == 0:
+            return []
+        if self.map is None or len(self.map) != n * ROLLUP.size:
+            with open(self.path, 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), n * ROLLUP.size, access=mmap.ACCESS_READ)
+        m = self.map
+        def start(i):
+            return struct.unpack_from('<q', m, i * ROLLUP.size)[0]
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if start(mid) < t0: lo = mid + 1
+            else: hi = mid
+        res = []
+        i = lo
+        while i < n and start(i) < t1:
+            res.append(ROLLUP.unpack_from(m, i * ROLLUP.size))
+            i += 1
+        return res
+
+
+class Series:
+    def __init__(self, base, scale=100):
+        self.base = base
+        meta = base + '.meta'
+        if os.path.exists(meta):
+            with open(meta) as f:
+                scale = json.load(f)["scale"]
+        else:
+            with open(meta, 'w') as f:
+                json.dump({"scale": scale}, f)
+        self.scale = scale
+        self.index = []
+        if os.path.exists(base + '.index'):
+            with open(base + '.index', 'rb') as f:
+                data = f.read()
+            self.index = [INDEX.unpack_from(data, i)
+                          for i in range(0, len(data) - INDEX.size + 1, INDEX.size)]
+        # a chunk written without its index record (cut off) is dropped
+        end = self.index[-1][0] + self.index[-1][1] if self.index else 0
+        with open(base + '.chunks', 'a+b') as f:
+            f.truncate(end)
+        self.starts = [r[3] for r in self.index]
+        self.rollups = {HOUR: Rollup(base + '.hour', HOUR), DAY: Rollup(base + '.day', DAY)}
+        self.times = [] # not written yet
+        self.values = []
+        self.lasttime = self.index[-1][4] if self.index else None
+        self.dropped = 0
+        self.map = None
+
+    def append(self, t, value):
+        t = int(t)
+        if self.lasttime is not None and t <= self.lasttime:
+            self.dropped += 1
+            return
+        self.lasttime = t
+        self.times.append(t)
+        self.values.append(int(round(value * self.scale)))
+        if len(self.times) >= CHUNK:
+            self.flush()
+
+    def flush(self):
+        if not self.times:
+            return
+        times, values = self.times, self.values
+        data = encode(times, values)
+        with open(self.base + '.chunks', 'ab') as f:
+            offset = f.tell()
+            f.write(data)
+        rec = (offset, len(data), len(times), times[0], times[-1],
+               min(values) / self.scale, max(values) / self.scale)
+        with open(self.base + '.index', 'ab') as f:
+            f.write(INDEX.pack(*rec))
+        self.index.append(rec)
+        self.starts.append(times[0])
+        for r in self.rollups.values():
+            r.add(times, values, self.scale)
+        self.times, self.values = [], []
+        self.map = None
+
+    def raw(self, t0, t1):
+        # (times, values) with t0 <= t < t1
+        times, values = [], []
+        i = max(0, bisect.bisect_right(self.starts, t0) - 1)
+        if i < len(self.index):
+            if self.map is None:
+                with open(self.base + '.chunks', 'rb') as f:
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            while i < len(self.index) and self.index[i][3] < t1:
+                offset, nbytes, count, first, last, vmin, vmax = self.index[i]
+                if last >= t0:
+                    ts, vs = decode(self.map, offset, count, first)
+                    times += ts
+                    values += vs
+                i += 1
+        times += self.times
+        values += self.values
+        lo = bisect.bisect_left(times, t0)
+        hi = bisect.bisect_left(times, t1)
+        scale = self.scale
+        return times[lo:hi], [v / scale for v in values[lo:hi]]
+
+    def query(self, t0, t1, step=None):
+        # raw points, or per step seconds: (start, count, mean, min, max)
+        if step is None:
+            return list(zip(*self.raw(t0, t1)))
+        if step % DAY == 0:
+            width = DAY
+        elif step % HOUR == 0:
+            width = HOUR
+        else:
+            width = None
+        if width is not None:
+            records = self.rollups[width].query(t0 - t0 % width, t1)
+            # the buffer is not in the rollups yet
+            lo = bisect.bisect_left(self.times, t0)
+            if lo < len(self.times):
+                bucket = {}
+                for t, v in zip(self.times[lo:], self.values[lo:]):
+                    if t >= t1: break
+                    v = v / self.scale
+                    b = t - t % width
+                    r = bucket.get(b)
+                    bucket[b] = [b, 1, v, v, v] if r is None else [
+                        b, r[1] + 1, r[2] + v, min(r[3], v), max(r[4], v)]
+                merged = dict((r[0], list(r)) for r in records)
+                for b, r in bucket.items():
+                    m = merged.get(b)
+                    merged[b] = r if m is None else [
+                        b, m[1] + r[1], m[2] + r[2], min(m[3], r[3]), max(m[4], r[4])]
+                records = [merged[b] for b in sorted(merged)]
+            return downsample(((r[0], r[1], r[2], r[3], r[4]) for r in records), step)
+        times, values = self.raw(t0, t1)
+        return downsample(((t, 1, v, v, v) for t, v in zip(times, values)), step)
+
+
+def downsample(records, step):
+    # (start, count, sum, min, max) in time order -> (start, count, mean, min, max) per step
+    out = []
+    cur = None
+    for t, n, s, lo, hi in records:
+        b = t - t % step
+        if cur is not None and cur[0] == b:
+            cur[1] += n
+            cur[2] += s
+            if lo < cur[3]: cur[3] = lo
+            if hi > cur[4]: cur[4] = hi
+        else:
+            if cur is not None:
+                out.append(cur)
+            cur = [b, n, s, lo, hi]
+    if cur is not None:
+        out.append(cur)
+    return [(b, n, s / n, lo, hi) for b, n, s, lo, hi in out]
+
+
+class Store:
+    # a directory of series
+    def __init__(self, path, scale=100):
+        self.path = path
+        self.scale = scale
+        self.series = {}
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, name):
+        s = self.series.get(name)
+        if s is None:
+            base = os.path.join(self.path, name)
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            s = self.series[name] = Series(base, self.scale)
+        return s
+
+    def append(self, name, t, value):
+        if value is None:
+            return # a lost sensor is a gap
+        self.get(name).append(t, float(value))
+
+    def flush(self):
+        for s in self.series.values():
+            s.flush()
+
+    def names(self):
+        res = []
+        for root, dirs, files in os.walk(self.path):
+            for f in files:
+                if f.endswith('.meta'):
+                    res.append(os.path.relpath(os.path.join(root, f[:-5]), self.path))
+        return sorted(res)
+
+    def query(self, name, t0, t1, step=None):
+        return self.get(name).query(t0, t1, step)
+
+
+def bench(path):
+    import math, random
+    store = Store(path)
+    s = store.get('bench/water')
+    start = 1700000000
+    n = 365 * DAY // 5
+    t0 = time.time()
+    if s.lasttime is None:
+        temp = 40.0
+        for i in range(n):
+            temp += random.gauss(0, 0.02) + 0.01 * math.sin(i / 8640 * math.pi)
+            s.append(start + i * 5, round(temp * 16) / 16)
+        s.flush()
+        print("wrote %d points in %.1f s, %.2f bytes/point" % (
+            n, time.time() - t0, os.path.getsize(s.base + '.chunks') / n))
+    for label, t_from, step in (("year at 1 h", start, HOUR), ("year at 1 day", start, DAY),
+                                ("day raw", start + 100 * DAY, None),
+                                ("week at 10 min", start + 100 * DAY, 600)):
+        t0 = time.time()
+        res = store.query('bench/water', t_from, t_from + (365 * DAY if step in (HOUR, DAY)
+                                                          else 7 * DAY if step else DAY), step)
+        print("%-15s %6d rows in %7.2f ms" % (label, len(res), (time.time() - t0) * 1000))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar history store")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="write a year of data and time queries")
+    b.add_argument("path")
+    q = sub.add_parser("query", help="print a series")
+    q.add_argument("path")
+    q.add_argument("series")
+    q.add_argument("--days", type=float, default=1)
+    q.add_argument("--step", type=int, help="seconds per row (default: raw points)")
+    l = sub.add_parser("list", help="names of the series")
+    l.add_argument("path")
+    args = parser.parse_args()
+    if args.cmd == "bench":
+        bench(args.path)
+    elif args.cmd == "list":
+        print("\n".join(Store(args.path).names()))
+    else:
+        now = time.time()
+        for row in Store(args.path).query(args.series, now - args.days * DAY, now, args.step):
+            print("\t".join(str(x) for x in row))
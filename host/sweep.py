@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# Which thresholds to use: replays the threshold rule of the firmware
+# (Params.decide_if_heat and the min run / stop times of Heating.set_heating)
+# over recorded history for every combination of desiredHouseMin,
+# desiredWaterMin, min_runtime_minutes and min_stoptime_minutes, and prints
+# the Pareto front of comfort vs relay cycles vs tank use, with the presets
+# of the page (20-50, 20-35, 20-30, at 3 and 10 minutes) for comparison.
+#
+#   python3 sweep.py DIR house --days 365 --csv sweep.csv --plot sweep.png
+#   python3 sweep.py --synthetic 60
+#
+# The house and tank model is the one of evaluate.py. Each time step is one
+# set of NumPy operations over a block of parameter sets, and the blocks are
+# spread over a process pool: a year at 60 s steps is half a million steps,
+# a few minutes for a few thousand combinations on a laptop.
+#   comfort:   degree-hours the house spent below --comfort (the same for
+#              all combinations, so they compare)
+#   cycles:    relay starts per day
+#   tank:      tank degrees spent on heating
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import history
+from analytics import DAY
+import evaluate
+
+PRESETS = [(20, 50, 3, 10), (20, 35, 3, 10), (20, 30, 3, 10)] # index.html
+SAFETY = 57 # Params.decide_if_heat frees the tank above this
+
+def simulate(data, plant, house_min, water_min, min_run, min_stop, comfort):
+    # evaluate.simulate for many parameter sets at once (arrays of one length)
+    t, hours = data["time"], data["step"] / 3600
+    house, wood, wmax = data["house"], data["water"], evaluate.tank_max(data)
+    recorded = data["running"]
+    # what the recorded relay did, per step
+    rh, rw = plant.effect(house, wmax)
+    rh, rw = np.where(recorded, rh, 0.0), np.where(recorded, rw, 0.0)
+    a1 = plant.cooling[1]
+    p = len(house_min)
+    winter = water_min < 0
+    run_s, stop_s = min_run * 60, min_stop * 60
+    dh, dw = np.zeros(p), np.zeros(p)
+    running = np.zeros(p, dtype=bool)
+    lastON, lastOFF = np.full(p, -1e12), np.full(p, -1e12)
+    starts = np.zeros(p, dtype=np.int64)
+    on_steps = np.zeros(p, dtype=np.int64)
+    deficit, tank_used = np.zeros(p), np.zeros(p)
+    for i in range(len(t)):
+        now = float(t[i])
+        h = house[i] + dh
+        w = wmax[i] + dw
+        should = np.where(winter, h < house_min,
+                          ((h < house_min) & (w > water_min)) | (wood[i] + dw > SAFETY))
+        stop = running & ~should & (now - lastON > run_s)
+        start = ~running & should & (now - lastOFF > stop_s)
+        running = (running & ~stop) | start
+        lastOFF = np.where(stop, now, lastOFF)
+        lastON = np.where(start, now, lastON)
+        starts += start
+        on_steps += running
+        eh, ew = plant.effect(h, w)
+        dh += (a1 * dh + running * eh - rh[i]) * hours
+        dw += (running * ew - rw[i]) * hours
+        tank_used -= running * ew * hours
+        deficit += np.maximum(0.0, comfort - h) * hours
+    days = len(t) * hours / 24
+    return {"cycles_per_day": starts / days, "heating_hours": on_steps * hours,
+            "deficit_degree_hours": deficit, "tank_degrees": tank_used}
+
+
+_data = None
+_plant = None
+
+def _init(data, plant):
+    global _data, _plant
+    _data, _plant = data, plant
+
+def _block(args):
+    return simulate(_data, _plant, *args)
+
+def sweep(data, plant, grid, comfort, workers=None):
+    # grid: (house_min, water_min, min_run, min_stop) arrays; results in the
+    # same order. One block per process: the bigger the arrays, the less the
+    # Python loop over time costs per combination.
+    n = len(grid[0])
+    workers = workers or os.cpu_count() or 1
+    block = -(-n // workers)
+    blocks = [tuple(g[i:i + block] for g in grid) + (comfort,) for i in range(0, n, block)]
+    if workers == 1:
+        _init(data, plant)
+        parts = [_block(b) for b in blocks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init, initargs=(data, plant)) as pool:
+            parts = list(pool.map(_block, blocks))
+    return dict((k, np.concatenate([r[k] for r in parts])) for k in parts[0])
+
+def pareto(points):
+    # mask of the rows not dominated by another (all columns minimized)
+    worse_eq = (points[None, :, :] <= points[:, None, :]).all(axis=2)
+    better = (points[None, :, :] < points[:, None, :]).any(axis=2)
+    return ~(worse_eq & better).any(axis=1)
+
+def frange(spec):
+    # "18:22:0.5" or "3,5,10"
+    if ":" in spec:
+        lo, hi, step = [float(x) for x in spec.split(":")]
+        return list(np.round(np.arange(lo, hi + step / 2, step), 3))
+    return [float(x) for x in spec.split(",")]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Sweep the heating thresholds over recorded history")
+    parser.add_argument("store", nargs="?")
+    parser.add_argument("node", nargs="?")
+    parser.add_argument("--days", type=float, default=365)
+    parser.add_argument("--synthetic", type=int, metavar="DAYS", help="made-up history instead of a store")
+    parser.add_argument("--step", type=int, default=60, help="seconds between decisions")
+    parser.add_argument("--house", default="18:22:0.5", help="desiredHouseMin values, lo:hi:step or a,b,c")
+    parser.add_argument("--water", default="25:55:5", help="desiredWaterMin values")
+    parser.add_argument("--min-run", default="1,3,5,10,15,20", help="minutes")
+    parser.add_argument("--min-stop", default="5,10,20,30,45,60", help="minutes")
+    parser.add_argument("--comfort", type=float, default=20, help="house temperature comfort is counted from")
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--csv", help="write all results here")
+    parser.add_argument("--plot", help="write a PNG of the front here")
+    args = parser.parse_args(argv)
+    start = time.time()
+    if args.synthetic:
+        data = evaluate.synthetic(args.synthetic, args.step)
+    elif args.store and args.node:
+        now = time.time()
+        data = evaluate.load(history.Store(args.store), args.node, now - args.days * DAY, now, args.step)
+        if data is None:
+            print("no house, water and heating_running history for", args.node)
+            return
+    else:
+        parser.error("give a store and a node, or --synthetic DAYS")
+    plant = evaluate.Plant(data)
+    combos = PRESETS + list(itertools.product(frange(args.house), frange(args.water),
+                                              frange(args.min_run), frange(args.min_stop)))
+    grid = tuple(np.array(c, dtype=np.float64) for c in zip(*combos))
+    print("%d combinations over %.0f days, %d steps" % (
+        len(combos), len(data["time"]) * args.step / DAY, len(data["time"])), file=sys.stderr)
+    results = sweep(data, plant, grid, args.comfort, args.workers)
+
+    keys = ("deficit_degree_hours", "cycles_per_day", "tank_degrees")
+    front = pareto(np.vstack([results[k] for k in keys]).T)
+    front[:len(PRESETS)] = False # they are in the grid again if they are on it
+    # combinations that came out the same are shown once
+    idx = np.flatnonzero(front)
+    metrics = np.round(np.vstack([results[k][idx] for k in keys]).T, 3)
+    _, first, same = np.unique(metrics, axis=0, return_index=True, return_counts=True)
+    order = np.argsort(results["cycles_per_day"][idx[first]])
+    row = "%-8s %8s %8s %8s %9s %10s %9s %10s %8s %5s"
+    print(row % ("", "house", "water", "run_min", "stop_min", "below_Ch", "cycles/d", "heating_h", "tank_C", "same"))
+    shown = [("preset", i, 1) for i in range(len(PRESETS))] + \
+            [("front", idx[first[j]], same[j]) for j in order]
+    for label, i, n in shown:
+        print("%-8s %8g %8g %8g %9g %10.1f %9.2f %10.1f %8.1f %5d" % (
+            label, grid[0][i], grid[1][i], grid[2][i], grid[3][i],
+            results["deficit_degree_hours"][i], results["cycles_per_day"][i],
+            results["heating_hours"][i], results["tank_degrees"][i], n))
+    print("%d of %d on the front (%.1f s)" % (front.sum(), len(combos) - len(PRESETS),
+                                             time.time() - start), file=sys.stderr)
+    if args.csv:
+        with open(args.csv, "w") as f:
+            f.write("house,water,min_run,min_stop,below_degree_hours,cycles_per_day,heating_hours,tank_degrees,front\n")
+            for i in range(len(PRESETS), len(combos)):
+                f.write("%g,%g,%g,%g,%.2f,%.3f,%.2f,%.2f,%d\n" % (
+                    grid[0][i], grid[1][i], grid[2][i], grid[3][i],
+                    results["deficit_degree_hours"][i], results["cycles_per_day"][i],
+                    results["heating_hours"][i], results["tank_degrees"][i], front[i]))
+    if args.plot:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots(figsize=(9, 6))
+        sc = ax.scatter(results["cycles_per_day"], results["deficit_degree_hours"],
+                        c=results["tank_degrees"], s=6, alpha=0.4)
+        ax.scatter(results["cycles_per_day"][front], results["deficit_degree_hours"][front],
+                   facecolors="none", edgecolors="red", label="Pareto front")
+        for i, (h, w, _, _) in enumerate(PRESETS):
+            ax.annotate("%g-%g" % (h, w), (results["cycles_per_day"][i], results["deficit_degree_hours"][i]))
+        ax.set_xlabel("relay cycles per day")
+        ax.set_ylabel("degree-hours below %g °C" % args.comfort)
+        fig.colorbar(sc, label="tank °C used")
+        ax.legend()
+        fig.tight_layout()
+        fig.savefig(args.plot)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,5 @@
+# the host tools are scripts, imported from their directory
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
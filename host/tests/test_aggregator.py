@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+
+import aggregator
+import history
+from aggregator import Aggregator, Node
+
+DATA = {
+  "temperatures": {"water": 45.5, "house": 21.25, "heaterOut": None},
+  "should_heat": False,
+  "heating_running": True,
+  "desiredHouseMin": 20,
+  "desiredWaterMin": 50,
+  "version": 7,
+}
+
+
+class StubNode:
+    # answers /data.json like send_data in sensorserver.py: 304 when the
+    # ETag matches
+    def __init__(self, data):
+        self.data = data
+        self.etag = '"d1"'
+        self.requests = []
+
+    async def serve(self, reader, writer):
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        self.requests.append(head)
+        if 'If-None-Match: %s' % self.etag in head:
+            writer.write(b"HTTP/1.0 304 Not Modified\r\n\r\n")
+        else:
+            body = json.dumps(self.data).encode()
+            writer.write(b"HTTP/1.0 200 OK\r\nETag: %s\r\n\r\n" % self.etag.encode() + body)
+        await writer.drain()
+        writer.close()
+
+
+async def with_stub(stub, test):
+    server = await asyncio.start_server(stub.serve, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await test(port)
+
+
+def test_readings():
+    r = aggregator.readings(DATA)
+    assert r == {"temperature.water": 45.5, "temperature.house": 21.25,
+                 "temperature.heaterOut": None, "should_heat": False,
+                 "heating_running": True, "desiredHouseMin": 20, "desiredWaterMin": 50}
+    assert aggregator.readings({}) == {}
+
+
+def test_poll(tmp_path):
+    stub = StubNode(DATA)
+    store = history.Store(str(tmp_path))
+
+    async def test(port):
+        node = Node('house', '127.0.0.1', port)
+        agg = Aggregator([node], period=10, timeout=2, store=store)
+        await agg.poll(node)
+        assert node.etag == '"d1"' and node.failures == 0
+        assert agg.model[('house', 'temperature.water')][0] == 45.5
+        assert agg.version == 1
+        # nothing changed: a 304, the model stays
+        await agg.poll(node)
+        assert 'If-None-Match: "d1"' in stub.requests[1]
+        assert agg.version == 1 and agg.polls == 2
+        assert node.status(node.polled, agg.stale) == "ok"
+        assert agg.api_nodes()["house"]["readings"]["temperature.house"] == 21.25
+        return node.updated
+
+    t = asyncio.run(with_stub(stub, test))
+    store.flush()
+    # what went to the store decodes with history.decode
+    base = os.path.join(str(tmp_path), 'house', 'temperature.water')
+    with open(base + '.index', 'rb') as f:
+        offset, nbytes, count, first, last, vmin, vmax = history.INDEX.unpack(f.read())
+    with open(base + '.chunks', 'rb') as f:
+        times, values = history.decode(f.read(), offset, count, first)
+    assert times == [int(t)] and values == [4550]
+    assert store.names() == sorted('house/' + s for s in (
+        'temperature.water', 'temperature.house', 'should_heat', 'heating_running',
+        'desiredHouseMin', 'desiredWaterMin'))
+
+
+def test_failing_node_backs_off():
+    async def test():
+        # a port nobody listens on
+        server = await asyncio.start_server(lambda r, w: None, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        node = Node('gone', '127.0.0.1', port)
+        agg = Aggregator([node], timeout=1, max_backoff=8)
+        backoffs = []
+        for _ in range(5):
+            await agg.poll(node)
+            backoffs.append(node.backoff)
+        return node, backoffs
+
+    node, backoffs = asyncio.run(test())
+    assert backoffs == [2, 4, 8, 8, 8]
+    assert node.failures == 5 and node.error
+    assert node.status(0, 60) == "down"
+
+
+def test_bad_status():
+    stub = StubNode(DATA)
+
+    async def serve(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(b"HTTP/1.0 500 Internal Server Error\r\n\r\n")
+        writer.close()
+    stub.serve = serve
+
+    async def test(port):
+        node = Node('house', '127.0.0.1', port)
+        agg = Aggregator([node])
+        await agg.poll(node)
+        return node, agg
+
+    node, agg = asyncio.run(with_stub(stub, test))
+    assert node.error == "HTTP 500" and node.failures == 1
+    assert agg.model == {}
@@ -0,0 +1,87 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import analytics
+import history
+from analytics import DAY
+
+START = 20000 * DAY # midnight UTC
+HOUR = 3600
+
+
+def heating_on(t):
+    # 06:00-08:00 and 18:00-19:00, every day
+    h = (t - START) % DAY // HOUR
+    return 6 <= h < 8 or h == 18
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # two days of a minute sample; small chunks, and a tail left in RAM
+    monkeypatch.setattr(history, 'CHUNK', 500)
+    s = history.Store(str(tmp_path))
+    for t in range(START, START + 2 * DAY, 60):
+        s.append('house/heating_running', t, 1 if heating_on(t) else 0)
+        noon2 = START + DAY + 12 * HOUR # electric for an hour on the second day
+        s.append('house/electric', t, 1 if noon2 <= t < noon2 + HOUR else 0)
+        s.append('house/temperature.water', t, 40 + (t - START) % 997 / 100)
+    return s
+
+
+def test_varints_match_decode():
+    times = [1000, 1005, 1010, 1016, 1015, 2000000000]
+    values = [4550, 4550, -3, 4551, 0, 1 << 40]
+    z = analytics.varints(history.encode(times, values))
+    n = len(times)
+    assert list(times[0] + np.cumsum(np.cumsum(z[:n - 1]))) == times[1:]
+    assert list(np.cumsum(z[n - 1:])) == values
+
+
+def test_load_series(store):
+    s = store.get('house/temperature.water')
+    assert len(s.index) > 1 and s.times # on disk and in RAM
+    for t0, t1 in ((0, START + 3 * DAY), (START + 1000, START + 40000), (START + DAY, START + DAY + 60)):
+        times, values = analytics.load_series(store, 'house/temperature.water', t0, t1)
+        rt, rv = s.raw(t0, t1)
+        assert list(times) == rt
+        assert np.allclose(values, rv)
+
+
+def test_on_time():
+    times = np.array([0, 60, 120, 1000, 1060])
+    state = np.array([1, 1, 0, 1, 0])
+    dt, on = analytics.on_time(times, state)
+    assert list(dt) == [60, 60, analytics.MAXGAP, 60, 0]
+    assert list(on) == [60, 60, 0, 60, 0]
+
+
+def test_daily(store):
+    days = analytics.daily(store, 'house', START, START + 2 * DAY)
+    assert list(days["day"]) == [START, START + DAY, START + 2 * DAY]
+    assert np.allclose(days["heating_hours"], [3, 3, 0])
+    assert np.allclose(days["electric_hours"], [0, 1, 0])
+    assert list(days["cycles"]) == [2, 2, 0]
+    assert days["duty"][0] == pytest.approx(3 / 24)
+    assert days["duty"][2] == 0 # no data that day
+    # a local day an hour ahead moves the edges, not the totals
+    local = analytics.daily(store, 'house', START, START + 2 * DAY, tz=HOUR)
+    assert local["heating_hours"].sum() == pytest.approx(6)
+    assert analytics.daily(store, 'garden', START, START + DAY) is None
+
+
+def test_correlations(tmp_path):
+    path = tmp_path / 'corr.tab'
+    sensor = np.array([30.0, 35.0, 40.0, 45.0, 50.0])
+    with open(str(path), 'w') as f:
+        f.write('mid top sensor comment\n')
+        for s in sensor:
+            f.write('%.1f %.1f %.1f after %d\n' % (2 * s - 10, s + 5, s, s))
+        f.write('junk\n')
+    tab = analytics.load_tab(str(path))
+    assert tab["comment"][0] == 'after 30'
+    names, matrix, fits = analytics.correlations(tab)
+    assert np.allclose(matrix, 1)
+    a, b, r, sd = fits["mid"]
+    assert (a, b, r) == pytest.approx((2, -10, 1))
+    assert sd == pytest.approx(0, abs=1e-9)
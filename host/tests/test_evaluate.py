@@ -0,0 +1,74 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import evaluate
+import predictive
+
+STEP = 60
+
+
+def still_plant():
+    # a controller changes nothing: the temperatures stay as recorded
+    return SimpleNamespace(cooling=(0.0, 0.0), heating=(0.0, 0.0),
+                           tank_on=(0.0, 0.0), tank_off=(0.0, 0.0),
+                           effect=lambda h, w: (0.0, 0.0))
+
+
+def recording(house, water=50.0, running=None):
+    n = len(house)
+    return {"time": 1700000000 + np.arange(n, dtype=np.int64) * STEP, "step": STEP,
+            "house": np.array(house, dtype=float), "water": np.full(n, water),
+            "running": np.zeros(n, dtype=bool) if running is None else np.array(running)}
+
+
+def test_no_hardware_imported():
+    # in a fresh interpreter: the other tests may have imported the firmware
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.check_output([sys.executable, '-c', 'import sys, evaluate; '
+                                   'print(sorted(set(sys.modules) & {"sensorserver", "hwbackend", "machine"}))'],
+                                  cwd=here)
+    assert out.strip() == b'[]'
+    assert evaluate.make_params(21, 40).desiredHouseMin == 21
+
+
+def test_replay():
+    running = [False, True, True, False, True, False, False, True]
+    data = recording([19.0] * 8, running=running)
+    r = evaluate.simulate(data, still_plant(), None)
+    assert r["cycles"] == 3
+    assert r["heating_hours"] == pytest.approx(4 * STEP / 3600)
+    assert r["deficit_degree_hours"] == pytest.approx(8 * STEP / 3600)
+
+
+def test_threshold_keeps_min_times():
+    # the house crosses the limit every 2 minutes; the relay may stop only
+    # after 3 minutes of running and start after 10 of rest
+    house = [19.0, 19.0, 21.0, 21.0] * 30
+    params = evaluate.make_params(20, 35, min_run=3, min_stop=10)
+    r = evaluate.simulate(recording(house), still_plant(), params)
+    minutes = len(house) * STEP / 60
+    assert r["cycles"] == pytest.approx(minutes / 14, abs=1) # 4 on, 10 off
+    # water too cold: never on
+    r = evaluate.simulate(recording(house, water=30.0), still_plant(), params)
+    assert r["cycles"] == 0 and r["heating_hours"] == 0
+
+
+def test_synthetic_days():
+    data = evaluate.synthetic(3)
+    plant = evaluate.Plant(data)
+    assert plant.heating[1] > 0 # a warmer tank heats the house faster
+    assert plant.tank_on[1] < 0 # and cools faster doing it
+    recorded = evaluate.simulate(data, plant, None)
+    threshold = evaluate.simulate(data, plant, evaluate.make_params(20, 35))
+    predicted = evaluate.simulate(data, plant, evaluate.make_params(20, 35),
+                                  predictive.Predictor(filename=os.devnull))
+    assert recorded["cycles"] > 0
+    # fewer, longer runs for about the same heat
+    assert predicted["cycles"] < threshold["cycles"]
+    assert predicted["heating_hours"] == pytest.approx(threshold["heating_hours"], rel=0.2)
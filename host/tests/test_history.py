@@ -0,0 +1,71 @@
+import history
+from history import Store, HOUR, DAY
+
+
+def test_encode_decode_round_trip():
+    times = [1000, 1005, 1010, 1016, 1015, 2000000000]
+    values = [4550, 4550, -3, 4551, 0, 1 << 40]
+    buf = history.encode(times, values)
+    assert history.decode(buf, 0, len(times), times[0]) == (times, values)
+    # regular samples of a steady value: a byte per time and per value
+    # (but two for the first value)
+    times = list(range(0, 5000, 5))
+    assert len(history.encode(times, [2000] * len(times))) == 2 * len(times)
+    # from the middle of a buffer
+    buf = b'xyz' + history.encode([7, 9], [1, 2])
+    assert history.decode(buf, 3, 2, 7) == ([7, 9], [1, 2])
+
+
+def test_zigzag():
+    assert [history.zigzag(n) for n in (0, -1, 1, -2, 2)] == [0, 1, 2, 3, 4]
+
+
+def test_raw_query_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, 'CHUNK', 10)
+    s = Store(str(tmp_path))
+    for i in range(25):
+        s.append('house/water', 100 + i * 5, 40 + i / 100)
+    s.append('house/water', 100, 99) # older: dropped
+    assert s.get('house/water').dropped == 1
+    points = s.query('house/water', 110, 150)
+    assert [t for t, v in points] == list(range(110, 150, 5))
+    assert points[0][1] == 40.02
+    # the 5 still in RAM are seen too, and everything after a reopen
+    assert len(s.query('house/water', 0, 1000)) == 25
+    s.flush()
+    again = Store(str(tmp_path))
+    assert again.query('house/water', 0, 1000) == s.query('house/water', 0, 1000)
+    assert again.names() == ['house/water']
+
+
+def test_rollups(tmp_path):
+    s = Store(str(tmp_path))
+    t0 = 10 * DAY
+    for i in range(2 * DAY // 60):
+        s.append('w', t0 + i * 60, i // 60) # hour k has the value k
+    s.flush()
+    for i in range(10): # not flushed yet
+        s.append('w', t0 + 2 * DAY + i * 60, 100)
+    hours = s.query('w', t0, t0 + 3 * DAY, HOUR)
+    assert len(hours) == 49
+    assert hours[1] == (t0 + HOUR, 60, 1.0, 1.0, 1.0)
+    assert hours[-1] == (t0 + 2 * DAY, 10, 100.0, 100.0, 100.0)
+    days = s.query('w', t0, t0 + 3 * DAY, DAY)
+    assert [(b, n, lo, hi) for b, n, mean, lo, hi in days] == [
+        (t0, 1440, 0, 23), (t0 + DAY, 1440, 24, 47), (t0 + 2 * DAY, 10, 100, 100)]
+    # other steps from the raw points
+    assert s.query('w', t0, t0 + 600, 300) == [(t0, 5, 0.0, 0.0, 0.0), (t0 + 300, 5, 0.0, 0.0, 0.0)]
+
+
+def test_gaps_and_cut_off_chunk(tmp_path):
+    s = Store(str(tmp_path))
+    s.append('w', 1, None) # a lost sensor
+    s.append('w', 2, 20)
+    s.flush()
+    with open(str(tmp_path / 'w.chunks'), 'ab') as f:
+        f.write(b'\x01\x02') # written without its index record
+    again = Store(str(tmp_path))
+    assert again.query('w', 0, 10) == [(2, 20.0)]
+    again.append('w', 3, 21)
+    again.flush()
+    assert Store(str(tmp_path)).query('w', 0, 10) == [(2, 20.0), (3, 21.0)]
@@ -0,0 +1,49 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import evaluate
+import sweep
+
+# the presets, winter mode and a few run and stop times
+COMBOS = sweep.PRESETS + [(20, -1, 3, 10), (20, 40, 1, 5), (20, 45, 15, 30), (19.5, 35, 5, 20)]
+
+
+@pytest.fixture(scope='module')
+def days():
+    data = evaluate.synthetic(3)
+    return data, evaluate.Plant(data)
+
+
+def grid(combos):
+    return tuple(np.array(c, dtype=np.float64) for c in zip(*combos))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_batched_matches_firmware(days, workers):
+    data, plant = days
+    results = sweep.sweep(data, plant, grid(COMBOS), 20, workers)
+    for k, combo in enumerate(COMBOS):
+        r = evaluate.simulate(data, plant, evaluate.make_params(*combo))
+        for key in ("cycles_per_day", "heating_hours", "tank_degrees"):
+            assert results[key][k] == pytest.approx(r[key], rel=1e-9, abs=1e-9), (combo, key)
+        if combo[0] == 20: # evaluate counts the deficit from the house limit
+            assert results["deficit_degree_hours"][k] == pytest.approx(r["deficit_degree_hours"])
+
+
+def test_pareto():
+    points = np.array([
+      [1.0, 5.0, 3.0], # on the front
+      [2.0, 4.0, 3.0], # on the front
+      [2.0, 5.0, 3.0], # worse than both above
+      [1.0, 5.0, 3.0], # the same as the first: neither dominates
+      [0.5, 9.0, 9.0], # best in one column
+      [3.0, 6.0, 4.0], # dominated
+    ])
+    assert list(sweep.pareto(points)) == [True, True, False, True, True, False]
+    assert list(sweep.pareto(points[:1])) == [True]
+
+
+def test_frange():
+    assert sweep.frange("18:20:0.5") == [18.0, 18.5, 19.0, 19.5, 20.0]
+    assert sweep.frange("3,5,10") == [3.0, 5.0, 10.0]
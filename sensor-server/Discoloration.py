@@ -1,23 +1,19 @@
 import RGB1602
 import time
-import math
+import backlight
 colorR = 64
 colorG = 128
 colorB = 64
 
 lcd=RGB1602.RGB1602(16,2)
 
-t=0
+# the color wheel runs on a timer (backlight.py), from a table
+light = backlight.Backlight(lcd, fps=10)
+light.wheel()
 
 while True:
   
-    r = int((abs(math.sin(3.14*t/180)))*255);
-    g = int((abs(math.sin(3.14*(t+60)/180)))*255);
-    b = int((abs(math.sin(3.14*(t+120)/180)))*255);
-    t = t + 3;
-  
-  
-    lcd.setRGB(r,g,b);
+    light.poll() # only off the Pico, where there is no timer
 # set the cursor to column 0, line 1
     lcd.setCursor(0, 0)
 # print the number of seconds since reset:
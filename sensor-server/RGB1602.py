@@ -2,10 +2,10 @@
 import time
 from machine import Pin,I2C
 
-RGB1602_SDA = Pin(4)
-RGB1602_SCL = Pin(5)
+RGB1602_SDA = 4
+RGB1602_SCL = 5
 
-RGB1602_I2C = I2C(0,sda = RGB1602_SDA,scl = RGB1602_SCL ,freq = 400000)
+RGB1602_I2C = None # made by the first RGB1602(), importing touches no hardware
 
 #Device I2C Arress
 LCD_ADDRESS   =  (0x7c>>1)
@@ -58,6 +58,9 @@ LCD_5x8DOTS = 0x00
 
 class RGB1602:
   def __init__(self, col, row):
+    global RGB1602_I2C
+    if RGB1602_I2C is None:
+      RGB1602_I2C = I2C(0,sda = Pin(RGB1602_SDA),scl = Pin(RGB1602_SCL) ,freq = 400000)
     self._row = row
     self._col = col
 
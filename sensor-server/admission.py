@@ -0,0 +1,104 @@
+# Who may talk to the web server, decided right after accept() and before we
+# read a byte: an optional allowlist of subnets (e.g. the LAN), and a token
+# bucket per client address so that one scanner cannot keep the loop busy.
+#
+# The bucket table has a fixed size; when it is full the client seen longest
+# ago is forgotten (it starts again with a full bucket, which is fine).
+
+def parse_ip(ip):
+    # '192.168.1.7' -> 32-bit int, None if it is not IPv4
+    parts = ip.split('.')
+    if len(parts) != 4:
+        return None
+    n = 0
+    try:
+        for p in parts:
+            b = int(p)
+            if b < 0 or b > 255:
+                return None
+            n = (n << 8) | b
+    except ValueError:
+        return None
+    return n
+
+def parse_net(net):
+    # '192.168.1.0/24' -> (address, mask), None if it is not a subnet
+    if '/' in net:
+        ip, bits = net.split('/', 1)
+        try:
+            bits = int(bits)
+        except ValueError:
+            return None
+    else:
+        ip, bits = net, 32
+    n = parse_ip(ip)
+    if n is None or bits < 0 or bits > 32:
+        return None
+    mask = (0xffffffff << (32 - bits)) & 0xffffffff
+    return (n & mask, mask)
+
+class Admission:
+    def __init__(self, allow=None, rate=0.5, burst=6, clients=8):
+        # allow: list of subnets like '192.168.1.0/24', None lets anyone in;
+        # entries that are not subnets are skipped, and if none is left
+        # anyone is let in (rather than nobody, and a reset every 30 minutes
+        # for lack of contact)
+        self.nets = None
+        for n in allow or ():
+            net = parse_net(n)
+            if net is None:
+                print('Ignoring bad allow entry', n)
+                continue
+            if self.nets is None:
+                self.nets = []
+            self.nets.append(net)
+        self.rate = rate # requests per second refilled
+        self.burst = burst # and how many may come at once
+        self.clients = clients
+        self.buckets = {} # ip -> [tokens, last time]
+        self.refused = 0 # not in the allowlist
+        self.limited = 0 # over the rate
+
+    def allowed(self, ip):
+        if self.nets is None:
+            return True
+        n = parse_ip(ip)
+        if n is None:
+            return False
+        for net, mask in self.nets:
+            if n & mask == net:
+                return True
+        return False
+
+    def take(self, ip, now):
+        # one token for a request of ip at now (seconds), False if none left
+        b = self.buckets.get(ip)
+        if b is None:
+            if len(self.buckets) >= self.clients:
+                oldest = None
+                for k, v in self.buckets.items():
+                    if oldest is None or v[1] < self.buckets[oldest][1]:
+                        oldest = k
+                del self.buckets[oldest]
+            b = [self.burst, now]
+            self.buckets[ip] = b
+        else:
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+        if b[0] < 1:
+            return False
+        b[0] -= 1
+        return True
+
+    def stats(self):
+        return {"refused": self.refused, "limited": self.limited}
+
+    def admit(self, ip, now):
+        # None if the client may go on, else the HTTP status to refuse it with
+        if not self.allowed(ip):
+            self.refused += 1
+            return 403
+        if not self.take(ip, now):
+            self.limited += 1
+            return 429
+        return None
@@ -0,0 +1,188 @@
+# The backlight of the RGB1602: steady colors and animations from tables
+# made once at import, so a frame is a few lookups and integer sums, no
+# floats and no math.sin.
+#   TEMP   color per whole degree 20..60, the ramp of the display: blue
+#          when the water is cool, red at 100 up to 40, then red
+#   WHEEL  one period of |sin|, 60 steps; R, G and B a third apart (the
+#          Discoloration demo)
+#   PULSE  one breath of red, for the hot-water safety (above 57)
+# and a fade, e.g. to the yellow of a failure.
+#
+# On the Pico a machine.Timer ticks the frames while an animation runs and
+# is stopped when it ends; the tick only schedules the frame
+# (micropython.schedule), as I2C cannot be used in an interrupt, so the
+# main loop never waits for an animation. Elsewhere call poll() from the
+# loop. Each frame writes only the channels that changed.
+
+import math
+import time
+try:
+    import micropython
+    schedule = micropython.schedule
+except ImportError:
+    micropython = None
+import machine
+try:
+    import RGB1602
+except ImportError:
+    RGB1602 = None # no display here (the fake machine has no I2C); the tables still work
+
+MINTEMP = 20
+NICETEMP = 40
+MAXTEMP = 60
+HOT = 57 # Params.decide_if_heat frees the tank above this
+
+def _temp_lut():
+    lut = bytearray(3 * (MAXTEMP - MINTEMP + 1))
+    for i in range(MAXTEMP - MINTEMP + 1):
+        t = MINTEMP + i
+        if t <= NICETEMP:
+            red, blue = 100, 255 - 255 * (t - MINTEMP) // (NICETEMP - MINTEMP)
+        else:
+            red, blue = 100 + 155 * (t - NICETEMP) // (NICETEMP - MINTEMP), 0
+        lut[3 * i] = max(0, min(255, red))
+        lut[3 * i + 2] = max(0, min(255, blue))
+    return lut
+
+TEMP = _temp_lut()
+WHEEL = bytearray([int(abs(math.sin(math.pi * i / 60)) * 255) for i in range(60)])
+PULSE = bytearray([int((1 - math.cos(2 * math.pi * i / 32)) * 0.5 * 215) + 40 for i in range(32)])
+YELLOW = (255, 255, 0)
+
+def temperature_rgb(temp):
+    i = int(temp + 0.5) - MINTEMP
+    i = 3 * max(0, min(MAXTEMP - MINTEMP, i))
+    return TEMP[i], TEMP[i + 1], TEMP[i + 2]
+
+STEADY = 0
+FADE = 1
+PULSING = 2
+WHEELING = 3
+
+class Backlight:
+    def __init__(self, lcd, fps=20, fade_frames=20):
+        self.lcd = lcd
+        self.period = 1000 // fps # ms per frame
+        self.fade_frames = fade_frames
+        self.rgb = [-1, -1, -1] # what the backlight shows, -1 unknown
+        self.mode = STEADY
+        self.color = (0, 0, 0) # steady, or where a fade goes
+        self.start = (0, 0, 0) # where a fade started
+        self.frame = 0
+        self.failed = False
+        self.frame_ref = self.step # bound once for the timer
+        self.timer = None
+        self.running = False
+        self.lastpoll = 0
+
+    def write(self, r, g, b):
+        # only the channels that changed
+        rgb = self.rgb
+        try:
+            if r != rgb[0]:
+                self.lcd.setReg(RGB1602.REG_RED, r)
+                rgb[0] = r
+            if g != rgb[1]:
+                self.lcd.setReg(RGB1602.REG_GREEN, g)
+                rgb[1] = g
+            if b != rgb[2]:
+                self.lcd.setReg(RGB1602.REG_BLUE, b)
+                rgb[2] = b
+        except Exception as e:
+            print('Backlight failed', e)
+            self.failed = True
+            self.stop()
+
+    def step(self, arg=None):
+        # one frame of the animation
+        if self.failed:
+            return
+        i = self.frame
+        self.frame += 1
+        if self.mode == FADE:
+            n = self.fade_frames
+            if i >= n:
+                self.mode = STEADY
+                self.stop()
+                self.write(*self.color)
+                return
+            s, c = self.start, self.color
+            self.write(s[0] + (c[0] - s[0]) * i // n, s[1] + (c[1] - s[1]) * i // n,
+                       s[2] + (c[2] - s[2]) * i // n)
+        elif self.mode == PULSING:
+            self.write(PULSE[i & 31], 0, 0)
+        elif self.mode == WHEELING:
+            p = i % 60
+            self.write(WHEEL[p], WHEEL[(p + 20) % 60], WHEEL[(p + 40) % 60])
+        else:
+            self.stop()
+            self.write(*self.color)
+
+    def tick(self, timer):
+        # in the timer interrupt: no I2C here
+        try:
+            schedule(self.frame_ref, 0)
+        except RuntimeError:
+            pass # the schedule queue is full, skip the frame
+
+    def run(self):
+        # frames from now on, until the animation ends
+        self.frame = 0
+        if self.running:
+            return
+        self.running = True
+        self.lastpoll = int(time.time() * 1000)
+        if micropython is not None and hasattr(machine, 'Timer'):
+            if self.timer is None:
+                self.timer = machine.Timer()
+            self.timer.init(period=self.period, mode=machine.Timer.PERIODIC, callback=self.tick)
+
+    def stop(self):
+        if self.running and self.timer is not None:
+            self.timer.deinit()
+        self.running = False
+
+    def poll(self):
+        # without a timer: the frames that are due, from the main loop
+        if not self.running or self.timer is not None:
+            return
+        now = int(time.time() * 1000)
+        frames = min(self.fade_frames, (now - self.lastpoll) // self.period)
+        self.lastpoll = now
+        for _ in range(max(1, frames)):
+            if not self.running:
+                break
+            self.step()
+
+    def steady(self, rgb):
+        if self.mode == STEADY and not self.running and self.rgb == list(rgb):
+            return
+        self.mode = STEADY
+        self.color = rgb
+        self.stop()
+        self.write(*rgb)
+
+    def fade(self, rgb):
+        if self.mode in (FADE, STEADY) and self.color == rgb:
+            return
+        self.start = tuple([max(0, c) for c in self.rgb])
+        self.color = rgb
+        self.mode = FADE
+        self.run()
+
+    def pulse(self):
+        if self.mode != PULSING:
+            self.mode = PULSING
+            self.run()
+
+    def wheel(self):
+        if self.mode != WHEELING:
+            self.mode = WHEELING
+            self.run()
+
+    def temperature(self, temp):
+        # the water temperature, pulsing red above the safety limit
+        if temp > HOT:
+            self.pulse()
+        else:
+            self.steady(temperature_rgb(temp))
@@ -0,0 +1,88 @@
+# Benchmark of the 1-Wire driver: bus slots and wall time for a full ROM
+# scan (with one of the thermometers missing, the slow case at startup) and
+# for reading 4 thermometers.
+#
+# On a PC it runs against the simulated bus from fake_onewire:
+#   python3 bench_onewire.py
+# On the Pico (copy it over next to onewire_fast.py) it uses the real bus on
+# thermoPIN and compares with the firmware's interpreted onewire module.
+
+import time
+import onewire_fast
+
+try:
+    import machine
+    import onewire
+    on_raspberry = True
+except ImportError:
+    import fake_onewire
+    on_raspberry = False
+
+thermoPIN = 15
+rounds = 20
+
+roms = [
+  bytearray(b'(D\xc1\x81\xe3\x8f<\x07'),
+  bytearray(b'(\x956\x81\xe3w<\xec'),
+  bytearray(b'(du\x81\xe3\xdd<\x07'),
+  bytearray(b'(\x8c\x19\x81\xe3P<\x19'),
+]
+
+def ticks_us():
+    if on_raspberry:
+        return time.ticks_us()
+    return int(time.perf_counter() * 1000000)
+
+def read_all(ow, roms):
+    # what ds18x20.DS18X20 does for convert_temp + read_temp of each sensor,
+    # without the 750 ms conversion wait
+    buf = bytearray(9)
+    ow.reset(True)
+    ow.writebyte(ow.SKIP_ROM)
+    ow.writebyte(0x44)
+    temps = []
+    for rom in roms:
+        ow.reset(True)
+        ow.select_rom(rom)
+        ow.writebyte(0xBE)
+        ow.readinto(buf)
+        if ow.crc8(buf):
+            temps.append(None)
+        else:
+            t = buf[1] << 8 | buf[0]
+            if t & 0x8000:
+                t = -((t ^ 0xFFFF) + 1)
+            temps.append(t / 16)
+    return temps
+
+def bench(name, ow, bus=None):
+    start = ticks_us()
+    for i in range(rounds):
+        found = ow.scan()
+    scan_us = (ticks_us() - start) // rounds
+    scan_slots = ''
+    if bus is not None:
+        scan_slots = '%d resets, %d slots, %d us on the wire' % (
+            bus.resets // rounds, bus.slots // rounds, bus.bus_time_us() // rounds)
+        bus.reset_counters()
+    start = ticks_us()
+    for i in range(rounds):
+        temps = read_all(ow, roms)
+    read_us = (ticks_us() - start) // rounds
+    read_slots = ''
+    if bus is not None:
+        read_slots = '%d resets, %d slots, %d us on the wire' % (
+            bus.resets // rounds, bus.slots // rounds, bus.bus_time_us() // rounds)
+    print(name)
+    print('  scan: %d devices, %d us per scan %s' % (len(found), scan_us, scan_slots))
+    print('  read: %s, %d us per read %s' % (temps, read_us, read_slots))
+
+if on_raspberry:
+    pin = machine.Pin(thermoPIN)
+    bench('firmware onewire', onewire.OneWire(pin))
+    bench('onewire_fast', onewire_fast.OneWire(pin))
+else:
+    # the last thermometer is missing, as when a sensor dropped off the bus
+    devices = [fake_onewire.FakeDS18B20(rom, 20 + i) for i, rom in enumerate(roms[:3])]
+    bus = fake_onewire.FakeBus(devices)
+    bench('onewire_fast on simulated bus', onewire_fast.OneWire(None, bus), bus)
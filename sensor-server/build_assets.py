@@ -0,0 +1,42 @@
+# Builds the static files of the web page into www/ (run on a PC, then copy
+# www/ to the Pico next to sensor-server.py):
+#   www/<file>.gz   - gzipped copy, served as it is with Content-Encoding
+#   www/assets.json - URL path -> file, content type and ETag (content hash),
+#                     and the plain source with its own ETag for clients
+#                     that do not take gzip
+# The server streams them from flash and answers If-None-Match with 304.
+
+import gzip
+import hashlib
+import json
+import os
+
+assets = {
+  # URL path: (source file, content type)
+  "/": ("index.html", "text/html"),
+}
+
+def build(outdir="www"):
+    os.makedirs(outdir, exist_ok=True)
+    manifest = {}
+    for path, (source, ctype) in assets.items():
+        with open(source, "rb") as f:
+            data = f.read()
+        packed = gzip.compress(data, 9, mtime=0) # same input, same bytes
+        target = os.path.join(outdir, source + ".gz")
+        with open(target, "wb") as f:
+            f.write(packed)
+        manifest[path] = {
+          "file": target,
+          "type": ctype,
+          "encoding": "gzip",
+          "etag": '"%s"' % hashlib.sha256(packed).hexdigest()[:16],
+          "identity": source,
+          "identity_etag": '"%s"' % hashlib.sha256(data).hexdigest()[:16],
+        }
+        print("%s: %s, %i -> %i bytes" % (path, target, len(data), len(packed)))
+    with open(os.path.join(outdir, "assets.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,147 @@
+# Warm restarts: the counters of Stats and the relay timing of Heating and
+# of the zones (zones.py, the first ZONES of them) are saved to flash now
+# and then, and read back at boot, so that the resets we do on purpose (and
+# the watchdog ones) do not zero the heating hours or let the relay switch
+# sooner than min_runtime / min_stoptime allow.
+# (Params are saved by store_params already.)
+#
+# The record is a fixed 122-byte struct with a sequence number and a CRC,
+# written alternately to two files: a write cut off by a reset spoils only
+# the older copy. Times are stored as ages in milliseconds relative to the
+# moment of the save (the clock of the Pico starts over at a reset); the
+# time the reset itself took is not known and counted as zero.
+#
+# Flash wear: we save at most every 'period' seconds, when the relay
+# switches, and right before a planned reset; and not at all when nothing
+# but the ages changed. A record of another format (an older firmware) is
+# not read: the counters start over once after such an update.
+
+import struct
+try:
+    from binascii import crc32
+except ImportError:
+    from ubinascii import crc32
+
+MAGIC = b'NZC2'
+GARDEN = 20 # garden measurements kept
+ZONES = 4 # zones whose relay timing is kept
+# magic, seq, heating ms, electric ms, heating on, electric on, ON age ms,
+# OFF age ms, boots, watchdog resets, last reset cause, last planned reset
+# reason, garden count, garden measurements, zone count, ON and OFF age ms
+# per zone, zone on per zone
+FORMAT = '<4sIQQBBIIIIBBB%dHB%dI%dB' % (GARDEN, 2 * ZONES, ZONES)
+SIZE = struct.calcsize(FORMAT)
+FILES = ('checkpoint.a', 'checkpoint.b')
+MAXAGE = 0xffffffff
+
+# why we reset on purpose (stored before machine.reset())
+REASON_NONE = 0
+REASON_UPTIME = 1
+REASON_NO_CONTACT = 2
+REASONS = {REASON_NONE: 'none', REASON_UPTIME: 'uptime', REASON_NO_CONTACT: 'no contact'}
+
+def age_ms(now, then):
+    if then is None:
+        return MAXAGE
+    return max(0, min(MAXAGE, int((now - then) * 1000)))
+
+
+class Checkpoints:
+    def __init__(self, files=FILES, period=600):
+        self.files = files
+        self.period = period # seconds between two saves at most
+        self.seq = 0
+        self.saved = None # what we wrote last, without the ages
+        self.lastsave = None
+        self.writes = 0
+        self.record = None # what load() found
+
+    def load(self):
+        # the newest good record, as a dict, or None
+        best = None
+        for name in self.files:
+            try:
+                with open(name, 'rb') as f:
+                    data = f.read(SIZE + 4)
+            except OSError:
+                continue
+            if data[:4] != MAGIC:
+                continue
+            if len(data) != SIZE + 4 or crc32(data[:SIZE]) != struct.unpack('<I', data[SIZE:])[0]:
+                print('Checkpoint', name, 'is damaged')
+                continue
+            fields = struct.unpack(FORMAT, data[:SIZE])
+            if best is None or fields[1] > best[1]:
+                best = fields
+        if best is None:
+            return None
+        self.seq = best[1]
+        count = best[12]
+        zones = []
+        z = 13 + GARDEN
+        for i in range(best[z]):
+            zones.append({"running": bool(best[z + 1 + 2 * ZONES + i]),
+                          "on_age_ms": best[z + 1 + 2 * i],
+                          "off_age_ms": best[z + 2 + 2 * i]})
+        self.record = {
+          "heating_ms": best[2],
+          "electric_ms": best[3],
+          "heating_running": bool(best[4]),
+          "electric_running": bool(best[5]),
+          "on_age_ms": best[6],
+          "off_age_ms": best[7],
+          "boots": best[8],
+          "watchdog_resets": best[9],
+          "reset_cause": best[10],
+          "reason": best[11],
+          "garden": list(best[13:13 + count]),
+          "zones": zones,
+        }
+        return self.record
+
+    def pack(self, now, stats, heating, reason, zones=()):
+        heating_ms = int((stats.heating_runtime_sum + (
+            0 if stats.heating_starttime is None else now - stats.heating_starttime)) * 1000)
+        electric_ms = int((stats.electric_runtime_sum + (
+            0 if stats.electric_starttime is None else now - stats.electric_starttime)) * 1000)
+        garden = stats.garden_water_measurements[-GARDEN:]
+        garden = [max(0, min(0xffff, int(g))) for g in garden]
+        zones = zones[:ZONES]
+        ages = []
+        for z in zones:
+            ages += [age_ms(now, z.lastONtime), age_ms(now, z.lastOFFtime)]
+        running = [1 if z.running else 0 for z in zones]
+        # the part that matters for wear: without the ages
+        fixed = (heating_ms // 60000, electric_ms // 60000, heating.heating_running,
+                 stats.electric_starttime is not None, stats.boots,
+                 stats.watchdog_resets, reason, tuple(garden), tuple(running))
+        return fixed, (heating_ms, electric_ms,
+                       1 if heating.heating_running else 0,
+                       0 if stats.electric_starttime is None else 1,
+                       age_ms(now, heating.lastONtime), age_ms(now, heating.lastOFFtime),
+                       stats.boots, stats.watchdog_resets, stats.reset_cause, reason,
+                       len(garden)) + tuple(garden + [0] * (GARDEN - len(garden))) + \
+                       (len(zones),) + tuple(ages + [0] * (2 * (ZONES - len(zones)))) + \
+                       tuple(running + [0] * (ZONES - len(zones)))
+
+    def save(self, now, stats, heating, reason=REASON_NONE, force=False, zones=()):
+        # returns True if it wrote; zones: the Zone objects of zones.py
+        if not force and self.lastsave is not None and now - self.lastsave < self.period:
+            return False
+        fixed, fields = self.pack(now, stats, heating, reason, zones)
+        if not force and fixed == self.saved:
+            self.lastsave = now
+            return False
+        self.seq += 1
+        data = struct.pack(FORMAT, MAGIC, self.seq, *fields)
+        try:
+            with open(self.files[self.seq % 2], 'wb') as f:
+                f.write(data)
+                f.write(struct.pack('<I', crc32(data)))
+        except OSError as e:
+            print('Cannot write checkpoint', e)
+            return False
+        self.saved = fixed
+        self.lastsave = now
+        self.writes += 1
+        return True
@@ -0,0 +1,121 @@
+# The heating decision: the limits the page and the knob may set and
+# Params.decide_if_heat. Nothing here touches the hardware or the network,
+# so the host tools (host/evaluate.py) import it and run the very code that
+# goes to the Pico.
+
+import json
+import time
+
+import journal
+
+# what the limits may be set to, from the page or the knob
+LIMITS = {"water": (-1, 90), "house": (5, 30)} # -1: winter mode
+
+def in_limits(name, value):
+    lo, hi = LIMITS[name]
+    return lo <= value <= hi
+
+def within_limits(house, water):
+    return in_limits("house", house) and in_limits("water", water)
+
+class Params:
+    # constants and decisions about heating; with a filename the limits are
+    # loaded from it and saved to it, with events (a Journal) their changes
+    # are logged there
+    def __init__(self, filename=None, events=None):
+        self.filename = filename
+        self.events = events
+        self.min_runtime_minutes = 3
+          # do not run heating for less than 3 minutes
+        self.min_stoptime_minutes = 10
+          # do not stop hearing for less than 10 minutes
+        self.desiredHouseMin = 20
+          # start heating if house below this
+        self.desiredWaterMin = 50
+          # stop heating if water below this
+        self.desiredWaterMinNeverSaveLessThanThis = 33
+          # for safety reasons, never save lower value for water than this
+        self.decision = journal.WHY_NONE # why decide_if_heat said what it said
+        if filename is None:
+            return
+        try:
+            infile = open(filename, "r")
+            params = json.load(infile)
+            infile.close()
+            print("Loaded saved params: ", params)
+            # a saved value out of LIMITS is refused, not bent to fit
+            if in_limits("water", params["desiredWaterMin"]):
+                self.desiredWaterMin = params["desiredWaterMin"]
+            else:
+                print("Saved water limit out of range, using default.")
+            if in_limits("house", params["desiredHouseMin"]):
+                self.desiredHouseMin = params["desiredHouseMin"]
+            else:
+                print("Saved house limit out of range, using default.")
+        except:
+            print("Failed to load params, using defaults.")
+    def store_params(self, desiredHouseMin=None, desiredWaterMin=None):
+        # False (and nothing stored) if a limit is out of LIMITS
+        if ((desiredWaterMin is not None and not in_limits("water", desiredWaterMin))
+                or (desiredHouseMin is not None and not in_limits("house", desiredHouseMin))):
+            print("Limits out of range, not stored:", desiredHouseMin, desiredWaterMin)
+            return False
+        if desiredWaterMin is not None:
+            self.desiredWaterMin = desiredWaterMin
+        if desiredHouseMin is not None:
+            self.desiredHouseMin = desiredHouseMin
+        # safe param values to a file
+        data = {
+          "desiredHouseMin": self.desiredHouseMin,
+          "desiredWaterMin": self.desiredWaterMin if self.desiredWaterMin > self.desiredWaterMinNeverSaveLessThanThis else self.desiredWaterMinNeverSaveLessThanThis,
+        }
+        if self.filename is not None:
+            outfile = open(self.filename, "w")
+            json.dump(data, outfile)
+            outfile.close()
+        if self.events is None:
+            return True
+        try:
+            self.events.log(time.time(), journal.SETPOINT, 0, self.desiredHouseMin, self.desiredWaterMin)
+        except Exception as e:
+            # the limits are stored, a journal that fails must not undo that
+            print("Cannot journal the limits", repr(e))
+        return True
+    def decide_if_heat(self, temps):
+        # also leaves why in self.decision (journal.WHY_*)
+        house = temps.temperatures["house"]
+        self.decision = journal.WHY_NO_THERMOMETER
+        if house is None: return False
+          # if we do not know house temperature, we cannot decide
+        if self.desiredWaterMin < 0:
+          # winter mode, we ignore availability of water heat
+          self.decision = journal.WHY_WINTER if house < self.desiredHouseMin else journal.WHY_SATISFIED
+          return (house < self.desiredHouseMin)
+        # the following decides if we should heat based on temperatures
+        waterFromWood = temps.temperatures["water"]
+        if waterFromWood is None: return False
+          # if we lost termometers, don't consider deciding
+        water = waterFromWood # collect max across all temps
+        # consult also output temperature
+        heaterOut = temps.temperatures["heaterOut"]
+        if heaterOut is not None and heaterOut > water: water = heaterOut
+            # and pretend water is this warm, so heat more
+        # consult also sun temperature
+        waterFromSun = temps.temperatures["waterFromSun"]
+        if waterFromSun is not None and waterFromSun > water: water = waterFromSun
+            # and pretend water is this warm, so heat more
+        # decide if we should heat
+        should_heat = (house < self.desiredHouseMin and water > self.desiredWaterMin)
+        self.decision = journal.WHY_HOUSE_COLD if should_heat else journal.WHY_SATISFIED
+        #if not should_heat:
+        #    # second option: heat if house is cold
+        #    should_heat = (temps.houseTemp < 10 and temps.waterTemp > 40)
+        if not should_heat:
+            # safety option: if water too hot, free the capacity regardless
+            # house temperature
+            should_heat = (waterFromWood > 57)
+            if should_heat:
+                self.decision = journal.WHY_WATER_HOT
+        ## Debugging heating: every 10 seconds switch on and off
+        #should_heat = (time.time() - stats.starttime) % 20 < 10
+        return should_heat
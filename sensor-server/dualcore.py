@@ -0,0 +1,75 @@
+# Running the control on the second core of the RP2040 (with _thread; on a
+# PC the same code runs as a thread). Core 1 reads the thermometers, decides
+# and switches the relay; core 0 serves the network and the display.
+#
+# The cores share only three things: the published snapshot, a mailbox of
+# the changes core 0 asks for (new limits from the page or the knob, a
+# planned reset), which core 1 makes, so that only core 1 writes the
+# parameters, the zones and the checkpoints, and a heartbeat each, so that
+# core 0 feeds the watchdog only while both are alive. The journal has a
+# lock of its own.
+
+import _thread
+
+class SnapshotBuffer:
+    # Double buffer of snapshots: the writer puts a new one in the slot the
+    # readers do not use and flips under the lock, so a reader always gets a
+    # whole snapshot and never waits for the control step.
+    def __init__(self, snap):
+        self.lock = _thread.allocate_lock()
+        self.slots = [snap, snap]
+        self.current = 0
+
+    def publish(self, snap):
+        spare = 1 - self.current
+        self.slots[spare] = snap
+        with self.lock:
+            self.current = spare
+
+    def latest(self):
+        with self.lock:
+            return self.slots[self.current]
+
+
+class Mailbox:
+    # Changes for core 1, taken all at once at the start of its step; when
+    # 'size' of them are waiting, core 1 does not run and put() refuses more.
+    def __init__(self, size=8):
+        self.lock = _thread.allocate_lock()
+        self.items = []
+        self.size = size
+
+    def put(self, item):
+        with self.lock:
+            if len(self.items) >= self.size:
+                return False
+            self.items.append(item)
+            return True
+
+    def take(self):
+        with self.lock:
+            items = self.items
+            self.items = []
+        return items
+
+
+class Liveness:
+    # Heartbeats of the cores; a core that did not beat for 'timeout'
+    # seconds is considered stuck.
+    def __init__(self, now, cores=2, timeout=5):
+        self.timeout = timeout
+        self.beats = [now] * cores
+
+    def beat(self, core, now):
+        self.beats[core] = now
+
+    def alive(self, now):
+        for t in self.beats:
+            if now - t > self.timeout:
+                return False
+        return True
+
+
+def start(function, *args):
+    # on the Pico the new thread runs on core 1
+    _thread.start_new_thread(function, args)
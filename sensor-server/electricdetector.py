@@ -0,0 +1,87 @@
+# Guesses if the electric heater in the tank runs, from how much warmer the
+# heater output is than the water coming from the sun collector.
+#
+# Computed once per new temperature sample over a small ring of recent
+# deltas (running sum, no allocations), with hysteresis between the on and
+# off thresholds, a faster start when the delta rises quickly, and a minimum
+# dwell time between two switches, so that noise around the threshold does
+# not flicker the state (and the electric hours counted from it).
+
+class ElectricDetector:
+    __slots__ = ('on_delta', 'off_delta', 'rise', 'dwell', 'size', 'deltas',
+                 'times', 'pos', 'count', 'total', 'state', 'confidence',
+                 'lastchange', 'transitions', 'seen')
+
+    def __init__(self, on_delta=27, off_delta=24, rise=1.0, dwell=120, size=6):
+        self.on_delta = on_delta # degrees, mean delta above this means on
+        self.off_delta = off_delta # and below this off again
+        self.rise = rise # degrees per minute, a rise this fast starts earlier
+        self.dwell = dwell # seconds, no switch sooner after the last one
+        self.size = size
+        self.deltas = [0.0] * size
+        self.times = [0] * size
+        self.pos = 0
+        self.count = 0
+        self.total = 0.0
+        self.state = None # True, False, or None when we do not know
+        self.confidence = 0.0 # 0..1
+        self.lastchange = None
+        self.transitions = 0
+        self.seen = None # the temps.readings we last used
+
+    def mean(self):
+        return self.total / self.count
+
+    def trend(self):
+        # degrees per minute between the oldest and newest delta in the ring
+        if self.count < 2:
+            return 0.0
+        newest = (self.pos - 1) % self.size
+        oldest = (self.pos - self.count) % self.size
+        dt = self.times[newest] - self.times[oldest]
+        if dt <= 0:
+            return 0.0
+        return (self.deltas[newest] - self.deltas[oldest]) * 60 / dt
+
+    def update(self, temps, now):
+        if temps.readings == self.seen:
+            return self.state # nothing new since the last call
+        self.seen = temps.readings
+        intemp = temps.temperatures["waterFromSun"]
+        outtemp = temps.temperatures["heaterOut"]
+        if intemp is None or outtemp is None:
+            # lost a thermometer, start over once it is back
+            self.count = 0
+            self.total = 0.0
+            self.state = None
+            self.confidence = 0.0
+            return None
+        delta = outtemp - intemp
+        if self.count == self.size:
+            self.total -= self.deltas[self.pos]
+        else:
+            self.count += 1
+        self.deltas[self.pos] = delta
+        self.times[self.pos] = now
+        self.total += delta
+        self.pos = (self.pos + 1) % self.size
+        mean = self.mean()
+        if self.state:
+            want = mean > self.off_delta
+            limit = self.off_delta
+        else:
+            want = mean > self.on_delta or (
+                mean > self.off_delta and self.trend() > self.rise)
+            limit = self.on_delta
+        self.confidence = min(1.0, abs(mean - limit) / 3)
+        if self.state is None:
+            self.state = want
+            self.lastchange = now
+        elif want != self.state:
+            if now - self.lastchange >= self.dwell:
+                self.state = want
+                self.lastchange = now
+                self.transitions += 1
+            else:
+                self.confidence = 0.0 # we would like to switch, but wait
+        return self.state
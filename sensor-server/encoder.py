@@ -0,0 +1,110 @@
+# Rotary encoder with a push button, driven by pin interrupts (nothing is
+# polled). The interrupt handlers only decode and put small events into a
+# ring buffer, without allocating; micropython.schedule then runs the
+# consumer soon after (also during the sleep of the main loop), which
+# passes the events to on_event: +1 / -1 per detent, or CLICK.
+#
+# Turning: both edges of A and B go through the quadrature state table;
+# bounces make invalid or back-and-forth transitions, which cancel out, and
+# an event comes once per detent ('steps' transitions). The button: edges
+# closer than 'debounce_ms' to the previous one are ignored, a release after
+# a press of at least 'click_ms' is a CLICK.
+#
+# The ring has one writer (the interrupts) and one reader (the scheduled
+# consumer), each moving its own index only, so it needs no lock.
+
+import time
+try:
+    import micropython
+    schedule = micropython.schedule
+except ImportError:
+    # off the Pico: run the consumer right away
+    def schedule(fn, arg):
+        fn(arg)
+try:
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_ms():
+        return int(time.time() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+import machine
+
+CLICK = 0x7f
+# previous AB << 2 | current AB -> -1 (255), 0, +1; A leading B is +1
+TABLE = bytearray([0, 255, 1, 0, 1, 0, 0, 255, 255, 0, 0, 1, 0, 1, 255, 0])
+
+class Encoder:
+    def __init__(self, pin_a, pin_b, pin_sw, on_event, steps=4, debounce_ms=5,
+                 click_ms=30, size=16):
+        self.on_event = on_event
+        self.steps = steps # transitions per detent
+        self.debounce_ms = debounce_ms
+        self.click_ms = click_ms
+        self.ring = bytearray(size) # size a power of two
+        self.mask = size - 1
+        self.head = 0 # written by the interrupts only
+        self.tail = 0 # written by the consumer only
+        self.dropped = 0
+        self.pending = False # the consumer is scheduled
+        self.consume_ref = self.consume # bound once, the handlers must not allocate
+        self.a = machine.Pin(pin_a, machine.Pin.IN, machine.Pin.PULL_UP)
+        self.b = machine.Pin(pin_b, machine.Pin.IN, machine.Pin.PULL_UP)
+        self.sw = machine.Pin(pin_sw, machine.Pin.IN, machine.Pin.PULL_UP)
+        self.state = (self.a.value() << 1) | self.b.value()
+        self.count = 0 # transitions since the last detent
+        self.pressed = None # ticks of the press
+        self.lastedge = ticks_ms() - 1000
+        edges = machine.Pin.IRQ_RISING | machine.Pin.IRQ_FALLING
+        self.a.irq(self.turned, edges)
+        self.b.irq(self.turned, edges)
+        self.sw.irq(self.button, edges)
+
+    def put(self, event):
+        nxt = (self.head + 1) & self.mask
+        if nxt == self.tail:
+            self.dropped += 1
+            return
+        self.ring[self.head] = event
+        self.head = nxt
+        if not self.pending:
+            self.pending = True
+            try:
+                schedule(self.consume_ref, 0)
+            except RuntimeError:
+                # the schedule queue is full, the next event tries again
+                self.pending = False
+
+    def turned(self, pin):
+        state = (self.a.value() << 1) | self.b.value()
+        step = TABLE[(self.state << 2) | state]
+        self.state = state
+        if step == 0:
+            return
+        self.count += 1 if step == 1 else -1
+        if self.count >= self.steps:
+            self.count = 0
+            self.put(1)
+        elif self.count <= -self.steps:
+            self.count = 0
+            self.put(255)
+
+    def button(self, pin):
+        now = ticks_ms()
+        if ticks_diff(now, self.lastedge) < self.debounce_ms:
+            return
+        self.lastedge = now
+        if self.sw.value() == 0:
+            self.pressed = now
+        elif self.pressed is not None:
+            if ticks_diff(now, self.pressed) >= self.click_ms:
+                self.put(CLICK)
+            self.pressed = None
+
+    def consume(self, arg):
+        self.pending = False
+        while self.tail != self.head:
+            event = self.ring[self.tail]
+            self.tail = (self.tail + 1) & self.mask
+            self.on_event(-1 if event == 255 else event)
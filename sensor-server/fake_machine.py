@@ -17,5 +17,9 @@ class WDT:
         print("FAKE machine WDT ", args, kwargs)
     def feed(self, *args, **kwargs):
         print("FAKE machine WDT feed ", args, kwargs)
-        
 
+PWRON_RESET = 1
+WDT_RESET = 3
+
+def reset_cause():
+    return PWRON_RESET
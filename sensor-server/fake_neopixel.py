@@ -0,0 +1,15 @@
+class NeoPixel:
+    def __init__(self, pin, n, *args):
+        print("FAKE NeoPixel ", n)
+        self.n = n
+        self.pixels = [(0, 0, 0)] * n
+        self.writes = 0
+    def __setitem__(self, i, rgb):
+        self.pixels[i] = rgb
+    def __getitem__(self, i):
+        return self.pixels[i]
+    def __len__(self):
+        return self.n
+    def write(self):
+        self.writes += 1
+        print("FAKE NeoPixel write ", self.pixels)
@@ -1,3 +1,131 @@
 class OneWire:
     def __init__(self, *args):
         print("FAKE OneWire ", args)
+
+
+# Simulated 1-Wire bus with DS18B20 thermometers, byte/bit level, so that the
+# real drivers (onewire_fast, ds18x20) can run and be benchmarked on a PC.
+# Use it as the 'bus' of onewire_fast.OneWire: FakeBus has the same
+# functions as the firmware's _onewire module.
+
+from onewire_fast import crc8 as _crc8
+
+SLOT_US = 65     # one read/write time slot
+RESET_US = 960   # reset pulse + presence detect
+
+class FakeDS18B20:
+    def __init__(self, rom, temp=20.0):
+        self.rom = bytes(rom)
+        self.temp = temp # what the thermometer "feels"
+        # scratchpad: temp lsb, msb, TH, TL, config, 3 reserved, crc
+        self.scratch = bytearray(b'\x50\x05\x4b\x46\x7f\xff\x0c\x10\x00')
+        self.scratch[8] = _crc8(self.scratch[:8])
+    def convert(self):
+        t = int(self.temp * 16) & 0xFFFF
+        self.scratch[0] = t & 0xFF
+        self.scratch[1] = t >> 8
+        self.scratch[8] = _crc8(self.scratch[:8])
+    def alarm(self):
+        # compares the integer part of the last conversion with TH and TL
+        t = self.scratch[1] << 8 | self.scratch[0]
+        if t & 0x8000:
+            t -= 0x10000
+        t >>= 4
+        th = self.scratch[2] - 256 if self.scratch[2] & 0x80 else self.scratch[2]
+        tl = self.scratch[3] - 256 if self.scratch[3] & 0x80 else self.scratch[3]
+        return t >= th or t <= tl
+
+class FakeBus:
+    def __init__(self, devices=()):
+        self.devices = list(devices)
+        self.resets = 0
+        self.slots = 0
+        self._state = None
+        self._selected = []
+        self._pending = b''
+    def bus_time_us(self):
+        # time the transactions would take on a real bus
+        return self.resets * RESET_US + self.slots * SLOT_US
+    def reset_counters(self):
+        self.resets = 0
+        self.slots = 0
+
+    def reset(self, pin):
+        self.resets += 1
+        self._state = 'rom'
+        self._selected = []
+        self._pending = b''
+        return len(self.devices) > 0
+
+    def readbit(self, pin):
+        self.slots += 1
+        if self._state != 'search':
+            return 1 # idle bus is pulled up
+        # open drain: the line stays high only if all participants send 1
+        pos = self._search_bit
+        bit = (pos & 7)
+        if self._search_half == 0:
+            val = all((d.rom[pos >> 3] >> bit) & 1 for d in self._selected)
+        else:
+            val = all(not (d.rom[pos >> 3] >> bit) & 1 for d in self._selected)
+        self._search_half ^= 1
+        return 1 if val else 0
+
+    def writebit(self, pin, value):
+        self.slots += 1
+        if self._state == 'search':
+            pos = self._search_bit
+            self._selected = [d for d in self._selected
+                              if ((d.rom[pos >> 3] >> (pos & 7)) & 1) == value]
+            self._search_bit += 1
+            self._search_half = 0
+            if self._search_bit == 64:
+                self._state = 'function'
+
+    def readbyte(self, pin):
+        self.slots += 8
+        if self._state == 'read' and len(self._selected) == 1:
+            if self._pending:
+                b = self._pending[0]
+                self._pending = self._pending[1:]
+                return b
+        return 0xFF
+
+    def writebyte(self, pin, value):
+        self.slots += 8
+        if self._state == 'rom':
+            if value in (0xF0, 0xEC): # search rom, alarm search
+                self._state = 'search'
+                self._search_bit = 0
+                self._search_half = 0
+                self._selected = [d for d in self.devices
+                                  if value == 0xF0 or d.alarm()]
+            elif value == 0x55: # match rom
+                self._state = 'match'
+                self._pending = b''
+            elif value == 0xCC: # skip rom
+                self._state = 'function'
+                self._selected = list(self.devices)
+        elif self._state == 'match':
+            self._pending += bytes([value])
+            if len(self._pending) == 8:
+                self._selected = [d for d in self.devices if d.rom == self._pending]
+                self._pending = b''
+                self._state = 'function'
+        elif self._state == 'function':
+            if value == 0x44: # convert T
+                for d in self._selected:
+                    d.convert()
+            elif value == 0xBE: # read scratchpad
+                self._state = 'read'
+                if len(self._selected) == 1:
+                    self._pending = bytes(self._selected[0].scratch)
+            elif value == 0x4E: # write scratchpad: TH, TL, config
+                self._state = 'write'
+                self._write_pos = 2
+        elif self._state == 'write':
+            if self._write_pos <= 4:
+                for d in self._selected:
+                    d.scratch[self._write_pos] = value
+                    d.scratch[8] = _crc8(d.scratch[:8])
+                self._write_pos += 1
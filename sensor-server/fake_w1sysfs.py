@@ -0,0 +1,37 @@
+# Creates a fake /sys/bus/w1/devices tree with DS18B20 thermometers, for
+# running sensor-server with the linux backend on any PC:
+#   python3 fake_w1sysfs.py /tmp/w1 && W1_SYSFS=/tmp/w1 python3 sensor-server.py
+# Edit the temperature files to "heat" the house.
+
+import os
+import sys
+
+from linux_w1 import name_from_rom
+
+thermometers = [
+  (bytearray(b'(D\xc1\x81\xe3\x8f<\x07'), 45.5),  # water
+  (bytearray(b'(\x956\x81\xe3w<\xec'), 19.25),    # house
+  (bytearray(b'(du\x81\xe3\xdd<\x07'), 30.0),     # waterFromSun
+  (bytearray(b'(\x8c\x19\x81\xe3P<\x19'), 44.0),  # heaterOut
+]
+
+def make_tree(path, thermometers=thermometers, w1_slave_only=False):
+    os.makedirs(os.path.join(path, 'w1_bus_master1'), exist_ok=True)
+    for rom, t in thermometers:
+        device = os.path.join(path, name_from_rom(rom))
+        os.makedirs(device, exist_ok=True)
+        set_temperature(path, rom, t, w1_slave_only)
+
+def set_temperature(path, rom, t, w1_slave_only=False, crc_ok=True):
+    device = os.path.join(path, name_from_rom(rom))
+    milli = int(round(t * 1000))
+    raw = int(t * 16) & 0xFFFF
+    data = '%02x %02x 4b 46 7f ff 0c 10 00' % (raw & 0xFF, raw >> 8)
+    with open(os.path.join(device, 'w1_slave'), 'w') as f:
+        f.write('%s : crc=00 %s\n%s t=%d\n' % (data, 'YES' if crc_ok else 'NO', data, milli))
+    if not w1_slave_only:
+        with open(os.path.join(device, 'temperature'), 'w') as f:
+            f.write('%d\n' % milli)
+
+if __name__ == '__main__':
+    make_tree(sys.argv[1] if len(sys.argv) > 1 else '/tmp/w1')
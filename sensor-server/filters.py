@@ -0,0 +1,68 @@
+# Incremental filters for temperature channels, O(1) per sample with all the
+# state allocated up front (runs every read on the Pico).
+#
+# Per sample:
+#   1. DS18B20's power-on value (85.0) is dropped unless we are near 85 anyway
+#   2. Hampel-style spike check over the last 3 samples: a sample further
+#      than 'spike' degrees from the median of 3 is replaced by the median,
+#      so a single glitch never gets through but a real step does after
+#      two samples (and normal samples pass without any delay)
+#   3. EMA with time constant 'tau' seconds (samples come irregularly)
+#   4. slope of the filtered value in degrees per minute, also smoothed
+
+POWER_ON_VALUE = 85.0
+
+class ChannelFilter:
+    __slots__ = ('tau', 'spike', 'window', 'pos', 'count', 'raw', 'value',
+                 'slope', 'lasttime', 'rejected')
+
+    def __init__(self, tau=6, spike=2.0):
+        self.tau = tau
+        self.spike = spike
+        self.window = [0.0, 0.0, 0.0] # ring of the last 3 accepted raw samples
+        self.reset()
+
+    def reset(self):
+        self.pos = 0
+        self.count = 0
+        self.raw = None
+        self.value = None
+        self.slope = 0.0 # degrees per minute
+        self.lasttime = None
+        self.rejected = 0 # samples thrown away as glitches
+
+    def median3(self):
+        a, b, c = self.window
+        if a > b:
+            a, b = b, a
+        if b > c:
+            b = c
+        return a if a > b else b
+
+    def add(self, t, now):
+        # feed a raw sample taken at time now (seconds); returns the filtered value
+        self.raw = t
+        if t == POWER_ON_VALUE and (self.value is None or abs(t - self.value) > self.spike):
+            self.rejected += 1
+            return self.value
+        self.window[self.pos] = t
+        self.pos = (self.pos + 1) % 3
+        if self.count < 3:
+            self.count += 1
+        x = t
+        if self.count == 3:
+            m = self.median3()
+            if abs(t - m) > self.spike:
+                self.rejected += 1
+                x = m
+        if self.value is None:
+            self.value = x
+        else:
+            dt = now - self.lasttime
+            if dt > 0:
+                old = self.value
+                self.value += (x - old) * dt / (self.tau + dt)
+                slope = (self.value - old) * 60 / dt
+                self.slope += (slope - self.slope) * dt / (self.tau + dt)
+        self.lasttime = now
+        return self.value
@@ -0,0 +1,196 @@
+# Incremental HTTP/1.x request parser over one preallocated buffer.
+#
+# Feed it whatever arrived on the socket (requests may come split into any
+# number of TCP segments); it scans only the new bytes, remembers where the
+# lines start and decodes nothing but the request line and the few headers
+# we use. Limits are enforced while reading: a head that does not fit the
+# buffer gets 431, a request line over maxline gets 414 (as soon as we see
+# that many bytes without its end), a body over maxbody gets 413, garbage
+# (also a path or a header that is not UTF-8, like /%ff) gets 400.
+
+NEED_MORE = 0
+DONE = 1
+ERROR = 2
+
+REASONS = {
+  400: 'Bad Request',
+  404: 'Not Found', # of the answers, not the parser
+  408: 'Request Timeout',
+  413: 'Payload Too Large',
+  414: 'URI Too Long',
+  431: 'Request Header Fields Too Large',
+}
+
+# headers we keep (lowercase); the others are skipped without decoding
+KNOWN_HEADERS = (b'content-length', b'content-type', b'if-none-match', b'accept-encoding')
+
+HEXDIGITS = '0123456789abcdefABCDEF' # of a %XX escape
+
+class Request:
+    def __init__(self, maxhead=1024, maxbody=256, maxlines=32, maxline=256):
+        self.maxhead = maxhead
+        self.maxline = maxline
+        self.maxbody = maxbody
+        self.buf = bytearray(maxhead + maxbody)
+        self.mv = memoryview(self.buf)
+        self.lines = [0] * maxlines # where each line of the head starts
+        self.reset()
+
+    def reset(self):
+        self.n = 0 # bytes in buf
+        self.scanned = 0
+        self.match = 0 # how much of CRLF CRLF we just saw
+        self.nlines = 1
+        self.head_end = 0 # first byte of the body, once the head is complete
+        self.content_length = 0
+        self.status = None # error code when the request is refused
+        self.method = None
+        self.path = None
+        self.query = ''
+        self.headers = {}
+
+    def space(self):
+        # where the next recv should put its bytes
+        return self.mv[self.n:]
+
+    def feed(self, nbytes):
+        # nbytes were written to space(); returns NEED_MORE, DONE or ERROR
+        self.n += nbytes
+        if self.head_end == 0:
+            if not self.scan():
+                if self.status is not None:
+                    return ERROR
+                if self.n >= self.maxhead:
+                    return self.fail(431)
+                return NEED_MORE
+            if not self.parse_head():
+                return ERROR
+        if self.n - self.head_end >= self.content_length:
+            return DONE
+        return NEED_MORE
+
+    def fail(self, status):
+        self.status = status
+        return ERROR
+
+    def scan(self):
+        # look for the end of the head in the bytes that are new
+        buf = self.buf
+        match = self.match
+        i = self.scanned
+        end = min(self.n, self.maxhead)
+        while i < end:
+            c = buf[i]
+            i += 1
+            if c == 10: # \n
+                if self.nlines == 1 and i > self.maxline + 1:
+                    self.status = 414
+                    return False
+                if match == 1 or match == 3:
+                    match += 1
+                else:
+                    match = 0
+                if match == 4:
+                    self.head_end = i
+                    self.scanned = i
+                    return True
+                if self.nlines == len(self.lines):
+                    self.status = 431
+                    return False
+                self.lines[self.nlines] = i
+                self.nlines += 1
+            elif c == 13: # \r
+                match = match + 1 if match in (0, 2) else 1
+            else:
+                match = 0
+        self.match = match
+        self.scanned = i
+        if self.nlines == 1 and i > self.maxline:
+            self.status = 414
+        return False
+
+    def line(self, k):
+        # the k-th line of the head, without CRLF, as a memoryview
+        start = self.lines[k]
+        end = self.lines[k + 1] - 2 if k + 1 < self.nlines else self.head_end - 4
+        return self.mv[start:end]
+
+    def parse_head(self):
+        parts = bytes(self.line(0)).split(b' ')
+        if len(parts) != 3 or not parts[2].startswith(b'HTTP/'):
+            self.status = 400
+            return False
+        try:
+            self.method = parts[0].decode()
+            target = parts[1].decode()
+            if '?' in target:
+                self.path, self.query = target.split('?', 1)
+            else:
+                self.path = target
+            self.path = unquote(self.path)
+            for k in range(1, self.nlines - 1):
+                line = self.line(k)
+                colon = -1
+                for i in range(min(len(line), 20)):
+                    if line[i] == 58: # ':'
+                        colon = i
+                        break
+                if colon < 0:
+                    continue
+                name = bytes(line[:colon]).lower()
+                if name in KNOWN_HEADERS:
+                    self.headers[name.decode()] = bytes(line[colon+1:]).decode().strip()
+        except UnicodeError:
+            self.status = 400
+            return False
+        try:
+            self.content_length = int(self.headers.get('content-length', 0))
+        except ValueError:
+            self.status = 400
+            return False
+        if self.content_length < 0 or self.content_length > self.maxbody:
+            self.status = 413
+            return False
+        return True
+
+    def body(self):
+        return bytes(self.mv[self.head_end:self.head_end + self.content_length])
+
+    def args(self):
+        # the query string, or the form in the body of a POST; empty when
+        # they are not UTF-8
+        try:
+            if self.method == 'POST' and self.headers.get('content-type', '').startswith(
+                    'application/x-www-form-urlencoded'):
+                return parse_qs(self.body().decode())
+            return parse_qs(self.query)
+        except UnicodeError:
+            return {}
+
+
+def unquote(s):
+    # %XX of URL paths ('+' is a plus there)
+    if '%' not in s:
+        return s
+    parts = s.split('%')
+    res = bytearray(parts[0].encode())
+    for p in parts[1:]:
+        if len(p) >= 2 and p[0] in HEXDIGITS and p[1] in HEXDIGITS:
+            res.append(int(p[:2], 16))
+            res.extend(p[2:].encode())
+        else:
+            # not two hex digits ('%a', '% 1'): the % stays as it is
+            res.extend(('%' + p).encode())
+    return bytes(res).decode()
+
+def unquote_plus(s):
+    # %XX and + (a space) of query strings and forms
+    return unquote(s.replace('+', ' '))
+
+def parse_qs(s):
+    pairs = {}
+    for pair in s.split('&'):
+        if '=' in pair:
+            k, v = pair.split('=', 1)
+            pairs[unquote_plus(k)] = unquote_plus(v)
+    return pairs
@@ -0,0 +1,38 @@
+# Picks the hardware at startup:
+#   pico  - MicroPython on the Pico (machine, onewire, ds18x20 of the firmware)
+#   linux - a Linux host with w1-gpio thermometers (linux_machine, linux_w1)
+#   fake  - anything else, for developing the rest of the server
+# SENSOR_BACKEND=linux|fake forces the choice off the Pico.
+#
+# Off the Pico the chosen machine module is also registered as 'machine',
+# so RGB1602 and hcsr04 pick it up with their plain "import machine".
+
+import sys
+
+try:
+    import rp2
+    import machine
+    import onewire, ds18x20
+    try:
+        # natively compiled, API compatible replacement of onewire
+        import onewire_fast as onewire
+    except:
+        print("Using firmware onewire")
+    backend = 'pico'
+except ImportError:
+    import os
+    backend = os.environ.get('SENSOR_BACKEND')
+    if backend is None:
+        import linux_w1
+        backend = 'linux' if linux_w1.available() else 'fake'
+    if backend == 'linux':
+        import linux_machine as machine
+        import linux_w1 as onewire
+        import linux_w1 as ds18x20
+    else:
+        import fake_machine as machine
+        import fake_ds18x20 as ds18x20
+        import fake_onewire as onewire
+    sys.modules['machine'] = machine
+
+print("Hardware backend:", backend)
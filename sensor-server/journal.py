@@ -0,0 +1,226 @@
+# What happened, kept on flash: relay switches and why, setpoint changes,
+# the electric heater coming and going, resets and lost thermometers.
+#
+# Each event is one fixed 14-byte record. Records collect in a small RAM
+# buffer and go to flash together (when it is full, every 'period' seconds,
+# and before a planned reset), to spare the flash and the loop. The files
+# journal.0 .. journal.3 are used in turn; when the current one is full the
+# oldest is started over, so the journal never grows beyond 4 segments.
+#
+# Records are in time order, so a time range is found by bisecting the
+# fixed-size records in the file, without reading it whole. The clock of the
+# Pico starts over at each reset, so the times are the clock plus an offset
+# taken at the first record after a boot: enough to continue after the newest
+# record on flash. Times thus keep increasing across resets (and segments
+# fill up, none is given up per boot); within a boot they are never let go
+# back.
+
+import struct
+try:
+    import _thread
+except ImportError:
+    _thread = None
+
+FORMAT = '<IIBBhh' # time, seq, kind, reason, a, b
+SIZE = struct.calcsize(FORMAT)
+MAXQUERY = 1000 # records one query copies at most
+
+# kinds; a and b are the numbers that go with each
+RELAY_ON = 1 # a: zone (0 the main heating, see zones.py)
+RELAY_OFF = 2 # a: zone
+SETPOINT = 3 # reason: zone, a: house min, b: water min
+ELECTRIC_ON = 4 # -
+ELECTRIC_OFF = 5 # -
+BOOT = 6 # reason: machine.reset_cause(), a: reason of the planned reset before
+RESET = 7 # reason: checkpoint.REASON_*, planned by us
+SENSOR_LOST = 8 # a: thermometer index
+SENSOR_BACK = 9 # a: thermometer index
+KINDS = {RELAY_ON: 'relay_on', RELAY_OFF: 'relay_off', SETPOINT: 'setpoint',
+         ELECTRIC_ON: 'electric_on', ELECTRIC_OFF: 'electric_off', BOOT: 'boot',
+         RESET: 'reset', SENSOR_LOST: 'sensor_lost', SENSOR_BACK: 'sensor_back'}
+
+# why the relay switched (Params.decision)
+WHY_NONE = 0
+WHY_HOUSE_COLD = 1 # house below its limit, water above its one
+WHY_WATER_HOT = 2 # free the tank whatever the house
+WHY_WINTER = 3 # house below its limit, water ignored
+WHY_SATISFIED = 4 # nothing asks for heat
+WHY_NO_THERMOMETER = 5 # house or water unknown
+WHY_PLANNED = 6 # a run planned by predictive.py goes on
+WHY_TANK_LOW = 7 # predictive.py: the tank would not carry a run
+
+class Journal:
+    def __init__(self, prefix='journal.', segments=4, segment_records=1024,
+                 buffer_records=32, period=300):
+        self.names = [prefix + str(i) for i in range(segments)]
+        self.segment_records = segment_records
+        self.period = period # seconds between flushes at most
+        self.buf = bytearray(SIZE * buffer_records)
+        self.n = 0 # records in buf
+        self.lock = _thread.allocate_lock() if _thread else None
+        self.lastflush = None
+        self.flushes = 0
+        self.dropped = 0 # records lost because flash did not take them
+        # continue in the segment with the newest record
+        self.seq = 0
+        self.current = 0
+        self.count = 0 # records in the current segment
+        self.lasttime = 0
+        self.offset = None # added to the clock, set by the first record
+        for i, name in enumerate(self.names):
+            count = self.records(name)
+            if count:
+                rec = self.read(name, count - 1)
+                if rec[1] >= self.seq:
+                    self.seq = rec[1] + 1
+                    self.current = i
+                    self.count = count
+                    self.lasttime = rec[0]
+
+    def records(self, name):
+        try:
+            with open(name, 'rb') as f:
+                f.seek(0, 2)
+                return f.tell() // SIZE
+        except OSError:
+            return 0
+
+    def read(self, name, i, f=None):
+        if f is None:
+            with open(name, 'rb') as f:
+                return self.read(name, i, f)
+        f.seek(i * SIZE)
+        return struct.unpack(FORMAT, f.read(SIZE))
+
+    def log(self, now, kind, reason=0, a=0, b=0):
+        if self.lock:
+            self.lock.acquire()
+        try:
+            now = int(now)
+            if self.offset is None:
+                self.offset = max(0, self.lasttime + 1 - now)
+            now = max(now + self.offset, self.lasttime)
+            if self.n * SIZE == len(self.buf):
+                self.write()
+            self.lasttime = now
+            struct.pack_into(FORMAT, self.buf, self.n * SIZE, now, self.seq,
+                             clamp(kind, 0, 255), clamp(reason, 0, 255),
+                             clamp(a, -32768, 32767), clamp(b, -32768, 32767))
+            self.seq += 1
+            self.n += 1
+        finally:
+            if self.lock:
+                self.lock.release()
+        print('Journal:', KINDS.get(kind), reason, a, b)
+
+    def tick(self, now):
+        # flush now and then; call every loop
+        if self.lastflush is None:
+            self.lastflush = now
+        if self.n and now - self.lastflush >= self.period:
+            self.flush(now)
+
+    def flush(self, now=None):
+        if self.lock:
+            self.lock.acquire()
+        try:
+            self.write()
+        finally:
+            if self.lock:
+                self.lock.release()
+        if now is not None:
+            self.lastflush = now
+
+    def write(self):
+        # the buffer to flash, starting the next segment when this one is full
+        mv = memoryview(self.buf)
+        done = 0
+        try:
+            while done < self.n:
+                if self.count == self.segment_records:
+                    self.current = (self.current + 1) % len(self.names)
+                    self.count = 0
+                    open(self.names[self.current], 'wb').close()
+                k = min(self.n - done, self.segment_records - self.count)
+                with open(self.names[self.current], 'ab') as f:
+                    f.write(mv[done * SIZE:(done + k) * SIZE])
+                self.count += k
+                done += k
+            self.flushes += 1
+        except OSError as e:
+            print('Cannot write journal', e)
+            self.dropped += self.n - done
+        self.n = 0
+
+    def segments(self):
+        # names from the oldest to the current one
+        k = len(self.names)
+        return [self.names[(self.current + 1 + i) % k] for i in range(k)]
+
+    def find(self, f, count, t):
+        # index of the first record at or after t in an open segment
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            f.seek(mid * SIZE)
+            if struct.unpack('<I', f.read(4))[0] < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, t0=0, t1=0xffffffff, limit=None):
+        # records (time, seq, kind, reason, a, b) with t0 <= time < t1, oldest
+        # first; also the ones still in RAM (without writing them). They are
+        # copied under the lock, as the other core may log or start a segment
+        # over meanwhile, and handed out after; so at most MAXQUERY of them
+        limit = MAXQUERY if limit is None else max(0, min(limit, MAXQUERY))
+        out = bytearray(limit * SIZE)
+        n = 0
+        if self.lock:
+            self.lock.acquire()
+        try:
+            for name in self.segments():
+                count = self.records(name)
+                if count == 0:
+                    continue
+                try:
+                    f = open(name, 'rb')
+                except OSError:
+                    continue
+                with f:
+                    if self.read(name, 0, f)[0] >= t1 or self.read(name, count - 1, f)[0] < t0:
+                        continue
+                    i = self.find(f, count, t0)
+                    f.seek(i * SIZE)
+                    while i < count and n < limit:
+                        rec = f.read(SIZE)
+                        if struct.unpack_from('<I', rec)[0] >= t1:
+                            break
+                        out[n * SIZE:(n + 1) * SIZE] = rec
+                        n += 1
+                        i += 1
+            for i in range(0, self.n * SIZE, SIZE):
+                if n == limit:
+                    break
+                if t0 <= struct.unpack_from('<I', self.buf, i)[0] < t1:
+                    out[n * SIZE:(n + 1) * SIZE] = self.buf[i:i + SIZE]
+                    n += 1
+        finally:
+            if self.lock:
+                self.lock.release()
+        for i in range(n):
+            yield struct.unpack_from(FORMAT, out, i * SIZE)
+
+def clamp(v, lo, hi):
+    # into a field of FORMAT: struct would raise on CPython and wrap around
+    # on MicroPython
+    return max(lo, min(hi, int(v)))
+
+def pack(rec):
+    return struct.pack(FORMAT, *rec)
+
+def csv_line(rec):
+    return '%d,%d,%s,%d,%d,%d\n' % (rec[0], rec[1], KINDS.get(rec[2], rec[2]), rec[3], rec[4], rec[5])
+
+CSV_HEADER = 'time,seq,kind,reason,a,b\n'
@@ -0,0 +1,162 @@
+# The parts of MicroPython's machine module that sensor-server uses,
+# implemented for a Linux host (e.g. a Raspberry Pi):
+#   Pin  - GPIO lines through the character device /dev/gpiochipN
+#   I2C  - /dev/i2c-N (the RGB1602 display)
+#   ADC  - ADC(4), the Pico's on-board thermometer, reads the CPU thermal zone
+#   WDT  - a software watchdog that restarts the process when not fed
+#   reset() - restarts the process (run it under systemd or a loop)
+#
+# GPIOCHIP and I2C_BUS environment variables select the devices; pin
+# numbers are line offsets on that chip (BCM numbers on a Raspberry Pi).
+
+import os
+import sys
+import struct
+import fcntl
+import threading
+
+GPIOCHIP = os.environ.get('GPIOCHIP', '/dev/gpiochip0')
+I2C_BUS = os.environ.get('I2C_BUS') # default: /dev/i2c-<id+1>, i.e. i2c-1 on a Pi
+THERMAL_ZONE = '/sys/class/thermal/thermal_zone0/temp'
+
+# linux/gpio.h, v1 ABI
+_GPIOHANDLE_REQUEST_INPUT = 1 << 0
+_GPIOHANDLE_REQUEST_OUTPUT = 1 << 1
+_GPIOHANDLE_REQUEST = '64II64B32sIi'
+_GPIO_GET_LINEHANDLE_IOCTL = 0xC16CB403
+_GPIOHANDLE_GET_LINE_VALUES_IOCTL = 0xC040B408
+_GPIOHANDLE_SET_LINE_VALUES_IOCTL = 0xC040B409
+# linux/i2c-dev.h
+_I2C_SLAVE = 0x0703
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, id, mode=None, pull=None, value=None):
+        self.id = id
+        self.fd = None
+        self.simulated = None # the value, when the host has no such GPIO
+        if mode is not None:
+            self.init(mode, pull, value)
+
+    def init(self, mode=None, pull=None, value=None):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        flags = _GPIOHANDLE_REQUEST_OUTPUT if mode == Pin.OUT else _GPIOHANDLE_REQUEST_INPUT
+        lines = [self.id] + [0] * 63
+        defaults = [1 if value else 0] + [0] * 63
+        req = bytearray(struct.pack(_GPIOHANDLE_REQUEST, *lines, flags, *defaults,
+                                    b'sensor-server', 1, 0))
+        try:
+            chip = os.open(GPIOCHIP, os.O_RDWR)
+            try:
+                fcntl.ioctl(chip, _GPIO_GET_LINEHANDLE_IOCTL, req)
+            finally:
+                os.close(chip)
+        except (OSError, TypeError):
+            # e.g. thermometers on a USB 1-Wire master of a plain PC
+            print("No GPIO", self.id, "on", GPIOCHIP, "- simulating it")
+            self.simulated = 1 if value else 0
+            return
+        self.fd = struct.unpack(_GPIOHANDLE_REQUEST, req)[-1]
+
+    def value(self, *args):
+        if self.fd is None and self.simulated is None:
+            self.init(Pin.IN)
+        if self.fd is None:
+            if args:
+                self.simulated = 1 if args[0] else 0
+                return None
+            return self.simulated
+        data = bytearray(64)
+        if args:
+            data[0] = 1 if args[0] else 0
+            fcntl.ioctl(self.fd, _GPIOHANDLE_SET_LINE_VALUES_IOCTL, data)
+            return None
+        fcntl.ioctl(self.fd, _GPIOHANDLE_GET_LINE_VALUES_IOCTL, data)
+        return data[0]
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+class I2C:
+    def __init__(self, id=0, sda=None, scl=None, freq=None):
+        # sda/scl/freq are fixed by the device tree
+        path = I2C_BUS or '/dev/i2c-%d' % (id + 1)
+        self.fd = os.open(path, os.O_RDWR)
+        self.addr = None
+
+    def _address(self, addr):
+        if addr != self.addr:
+            fcntl.ioctl(self.fd, _I2C_SLAVE, addr)
+            self.addr = addr
+
+    def writeto(self, addr, buf):
+        if isinstance(buf, str):
+            buf = buf.encode('latin-1')
+        self._address(addr)
+        return os.write(self.fd, bytes(buf))
+
+    def writeto_mem(self, addr, memaddr, buf):
+        if isinstance(buf, str):
+            buf = buf.encode('latin-1')
+        self._address(addr)
+        os.write(self.fd, bytes([memaddr]) + bytes(buf))
+
+
+class ADC:
+    def __init__(self, channel):
+        self.channel = channel
+
+    def read_u16(self):
+        if self.channel != 4:
+            return 0
+        try:
+            with open(THERMAL_ZONE) as f:
+                t = int(f.read()) / 1000
+        except (OSError, ValueError):
+            return 0
+        # the inverse of the RP2040 sensor formula used by Temperatures
+        volts = 0.706 - (t - 27) * 0.001721
+        return max(0, min(65535, int(volts / 3.3 * 65535)))
+
+
+class WDT:
+    def __init__(self, id=0, timeout=5000):
+        self.timeout = timeout / 1000
+        self.timer = None
+        self.feed()
+
+    def feed(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = threading.Timer(self.timeout, self.expired)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def expired(self):
+        print("Watchdog expired, restarting")
+        reset()
+
+
+# like the Pico, where machine.reset() goes through the watchdog too
+PWRON_RESET = 1
+WDT_RESET = 3
+
+def reset_cause():
+    return int(os.environ.get('MACHINE_RESET_CAUSE', PWRON_RESET))
+
+def reset():
+    sys.stdout.flush()
+    os.environ['MACHINE_RESET_CAUSE'] = str(WDT_RESET)
+    os.execv(sys.executable, [sys.executable] + sys.argv)
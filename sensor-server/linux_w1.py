@@ -0,0 +1,113 @@
+# DS18B20 thermometers through the Linux w1 subsystem (w1-gpio + w1_therm)
+#
+# Stands in for both onewire and ds18x20 of the Pico firmware: the kernel
+# does the bus work, we read /sys/bus/w1/devices/28-*/temperature (or the
+# older w1_slave). A conversion takes 750 ms in the kernel, so convert_temp()
+# triggers one bulk conversion for the whole bus where the kernel supports
+# it (therm_bulk_read) and starts reading every thermometer in a thread pool;
+# read_temp() then only collects the results, and four thermometers cost one
+# conversion time, not four.
+#
+# W1_SYSFS overrides the sysfs directory, see fake_w1sysfs.py for a fake tree.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from onewire_fast import crc8
+
+W1_DEVICES = os.environ.get('W1_SYSFS', '/sys/bus/w1/devices')
+FAMILIES = (0x10, 0x22, 0x28)
+READ_TIMEOUT = 5 # seconds, the kernel retries reads with bad CRC itself
+
+def available(path=None):
+    path = path or W1_DEVICES
+    try:
+        return any(n.startswith('w1_bus_master') for n in os.listdir(path))
+    except OSError:
+        return False
+
+def name_from_rom(rom):
+    # family-serial, the serial printed most significant byte first
+    return '%02x-%s' % (rom[0], ''.join(['%02x' % b for b in reversed(rom[1:7])]))
+
+def rom_from_name(name):
+    family, serial = name.split('-')
+    rom = bytearray(8)
+    rom[0] = int(family, 16)
+    for i in range(6):
+        rom[6 - i] = int(serial[2*i:2*i+2], 16)
+    rom[7] = crc8(rom[:7])
+    return rom
+
+
+class OneWireError(Exception):
+    pass
+
+class OneWire:
+    def __init__(self, pin=None, path=None):
+        # the pin is configured in the device tree (dtoverlay=w1-gpio),
+        # it is accepted only to keep the firmware's signature
+        self.pin = pin
+        self.path = path or W1_DEVICES
+
+    def masters(self):
+        return [os.path.join(self.path, n) for n in sorted(os.listdir(self.path))
+                if n.startswith('w1_bus_master')]
+
+    def scan(self):
+        roms = []
+        for n in sorted(os.listdir(self.path)):
+            if '-' not in n or n.startswith('w1_bus_master'):
+                continue
+            try:
+                roms.append(rom_from_name(n))
+            except ValueError:
+                print("Skipping w1 device", n)
+        return roms
+
+
+class DS18X20:
+    def __init__(self, onewire, workers=4):
+        self.ow = onewire
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {} # device name -> future of its temperature
+
+    def scan(self):
+        return [rom for rom in self.ow.scan() if rom[0] in FAMILIES]
+
+    def convert_temp(self):
+        for m in self.ow.masters():
+            bulk = os.path.join(m, 'therm_bulk_read')
+            if os.path.exists(bulk):
+                try:
+                    with open(bulk, 'w') as f:
+                        f.write('trigger\n')
+                except OSError:
+                    pass # needs root; the reads below convert one by one
+        for rom in self.scan():
+            name = name_from_rom(rom)
+            future = self.pending.get(name)
+            if future is None or future.done():
+                # a finished result that nobody collected is stale by now
+                self.pending[name] = self.pool.submit(self.read_sysfs, name)
+
+    def read_temp(self, rom):
+        name = name_from_rom(rom)
+        future = self.pending.pop(name, None)
+        if future is None:
+            return self.read_sysfs(name)
+        return future.result(timeout=READ_TIMEOUT)
+
+    def read_sysfs(self, name):
+        device = os.path.join(self.ow.path, name)
+        try:
+            with open(os.path.join(device, 'temperature')) as f:
+                return int(f.read().strip()) / 1000
+        except (OSError, ValueError):
+            pass
+        # older kernels: "<9 bytes> : crc=07 YES\n<9 bytes> t=20125\n"
+        with open(os.path.join(device, 'w1_slave')) as f:
+            lines = f.read().split('\n')
+        if len(lines) < 2 or not lines[0].strip().endswith('YES'):
+            raise OneWireError("CRC error")
+        return int(lines[1].split('t=')[1]) / 1000
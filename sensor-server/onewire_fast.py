@@ -0,0 +1,168 @@
+# 1-Wire driver with natively compiled hot paths
+#
+# Drop-in replacement for the firmware's onewire.OneWire (same methods, so
+# ds18x20.DS18X20 can sit on top of it). The bit loops of the ROM search and
+# the byte loops of readinto/write are the slowest interpreted code we run,
+# so they are compiled with @micropython.native and bind the bus primitives
+# to locals. This is not a bulk transfer: _onewire has none, so readinto and
+# write still make one call to its C readbyte/writebyte per byte; only the
+# loop around the calls is native. Off the Pico the decorators are no-ops
+# and the bus primitives come from the simulated bus in fake_onewire, so the
+# same code runs on CPython (and can be benchmarked there, see
+# bench_onewire.py).
+
+try:
+    import micropython
+    import _onewire
+    native = micropython.native
+    on_micropython = True
+except ImportError:
+    _onewire = None
+    def native(f):
+        return f
+    on_micropython = False
+
+
+class OneWireError(Exception):
+    pass
+
+
+def _make_crc8_table():
+    # Dallas/Maxim CRC8, polynomial x^8 + x^5 + x^4 + 1 (0x8C reflected)
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8C if crc & 1 else crc >> 1
+        table[i] = crc
+    return bytes(table)
+
+CRC8_TABLE = _make_crc8_table()
+
+if on_micropython:
+    # the firmware's C implementation beats anything we can compile here
+    crc8 = _onewire.crc8
+else:
+    def crc8(data):
+        # table-driven CRC8 for the host; returns 0 for a buffer with a
+        # valid trailing CRC byte, just like _onewire.crc8
+        table = CRC8_TABLE
+        crc = 0
+        for b in data:
+            crc = table[crc ^ b]
+        return crc
+
+
+@native
+def _readinto(bus, pin, buf):
+    # a call per byte, the bits are timed in C
+    readbyte = bus.readbyte
+    for i in range(len(buf)):
+        buf[i] = readbyte(pin)
+
+@native
+def _write(bus, pin, buf):
+    writebyte = bus.writebyte
+    for b in buf:
+        writebyte(pin, b)
+
+@native
+def _search_rom(bus, pin, cmd, l_rom, rom, diff):
+    # one pass of the ROM search: 64 times read bit + complement, write the
+    # chosen bit; returns the discrepancy to follow next time, -1 on error
+    readbit = bus.readbit
+    writebit = bus.writebit
+    bus.writebyte(pin, cmd)
+    next_diff = 0
+    i = 64
+    for byte in range(8):
+        r_b = 0
+        last = l_rom[byte]
+        for bit in range(8):
+            b = readbit(pin)
+            if readbit(pin):
+                if b:  # there are no devices or there is an error on the bus
+                    return -1
+            else:
+                if not b:  # collision, two devices with different bit meaning
+                    if diff > i or ((last & (1 << bit)) and diff != i):
+                        b = 1
+                        next_diff = i
+            writebit(pin, b)
+            if b:
+                r_b |= 1 << bit
+            i -= 1
+        rom[byte] = r_b
+    return next_diff
+
+
+class OneWire:
+    SEARCH_ROM = 0xF0
+    MATCH_ROM = 0x55
+    SKIP_ROM = 0xCC
+    ALARM_SEARCH = 0xEC
+
+    def __init__(self, pin, bus=None):
+        # bus: module with reset/readbit/readbyte/writebit/writebyte taking
+        # the pin as first argument (_onewire on the Pico)
+        self.pin = pin
+        self.bus = bus if bus is not None else _onewire
+        if hasattr(pin, 'init') and hasattr(pin, 'OPEN_DRAIN'):
+            self.pin.init(pin.OPEN_DRAIN, pin.PULL_UP)
+
+    def reset(self, required=False):
+        reset = self.bus.reset(self.pin)
+        if required and not reset:
+            raise OneWireError
+        return reset
+
+    def readbit(self):
+        return self.bus.readbit(self.pin)
+
+    def readbyte(self):
+        return self.bus.readbyte(self.pin)
+
+    def readinto(self, buf):
+        _readinto(self.bus, self.pin, buf)
+
+    def writebit(self, value):
+        return self.bus.writebit(self.pin, value)
+
+    def writebyte(self, value):
+        return self.bus.writebyte(self.pin, value)
+
+    def write(self, buf):
+        _write(self.bus, self.pin, buf)
+
+    def select_rom(self, rom):
+        self.reset()
+        self.writebyte(self.MATCH_ROM)
+        self.write(rom)
+
+    def scan(self):
+        return self._scan(self.SEARCH_ROM)
+
+    def alarm_scan(self):
+        # only devices with the alarm flag set answer, e.g. DS18B20s whose
+        # last conversion was >= TH or <= TL
+        return self._scan(self.ALARM_SEARCH)
+
+    def _scan(self, cmd):
+        devices = []
+        diff = 65
+        l_rom = bytearray(8)
+        for i in range(0xFF):
+            if not self.reset():
+                break
+            rom = bytearray(8)
+            diff = _search_rom(self.bus, self.pin, cmd, l_rom, rom, diff)
+            if diff < 0:
+                break
+            devices.append(rom)
+            l_rom = rom
+            if diff == 0:
+                break
+        return devices
+
+    def crc8(self, data):
+        return crc8(data)
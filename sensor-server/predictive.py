@@ -0,0 +1,203 @@
+# Predictive control (optional, see predictive_control in sensorserver.py):
+# instead of switching the relay whenever the house crosses desiredHouseMin,
+# learn how the house and the tank behave and plan runs that lift the house
+# a little above the limit, so it takes a while to cool down again: fewer,
+# longer runs instead of many short ones that drain the tank for little.
+#
+# Three small linear models, in degrees per hour, learned by recursive least
+# squares with forgetting (old samples fade out over a few days), each with
+# a fixed 2x2 state, so RAM and time per sample do not grow:
+#   house cooling, relay off:  house' = a0 + a1 * (house - desiredHouseMin)
+#   house heating, relay on:   house' = b0 + b1 * (water - house)
+#   tank discharge, relay on:  water' = c0 + c1 * (water - house)
+# A sample is the change over 'period' seconds with the relay in one state
+# (for the tank, only when it did not warm up meanwhile).
+#
+# When the house asks for heat, the run is planned to end at desiredHouseMin
+# + band, where band is what the house loses in 'off_hours'; the run is cut
+# where the tank would reach desiredWaterMin. A run the tank cannot carry
+# for min_runtime_minutes is not started. Params.decide_if_heat still has
+# the last word on a missing thermometer and on the hot-water safety, and
+# decides alone until the models have seen enough samples.
+#
+# The models are saved to predictive.json every hour, so the planned resets
+# do not throw away what was learned.
+
+import json
+import journal
+
+FILENAME = 'predictive.json'
+TANK = ('water', 'heaterOut', 'waterFromSun')
+
+class RLS:
+    # y = w0 * x0 + w1 * x1
+    __slots__ = ('forget', 'w0', 'w1', 'p00', 'p01', 'p11', 'n')
+
+    def __init__(self, forget=0.995, p0=100.0):
+        self.forget = forget
+        self.w0 = 0.0
+        self.w1 = 0.0
+        self.p00 = p0 # the covariance, symmetric
+        self.p01 = 0.0
+        self.p11 = p0
+        self.n = 0 # samples seen
+
+    def update(self, x0, x1, y):
+        q0 = self.p00 * x0 + self.p01 * x1
+        q1 = self.p01 * x0 + self.p11 * x1
+        d = self.forget + x0 * q0 + x1 * q1
+        k0 = q0 / d
+        k1 = q1 / d
+        e = y - (self.w0 * x0 + self.w1 * x1)
+        self.w0 += k0 * e
+        self.w1 += k1 * e
+        self.p00 = (self.p00 - k0 * q0) / self.forget
+        self.p01 = (self.p01 - k0 * q1) / self.forget
+        self.p11 = (self.p11 - k1 * q1) / self.forget
+        self.n += 1
+
+    def predict(self, x0, x1):
+        return self.w0 * x0 + self.w1 * x1
+
+    def state(self):
+        return [self.w0, self.w1, self.p00, self.p01, self.p11, self.n]
+
+    def load(self, s):
+        self.w0, self.w1, self.p00, self.p01, self.p11, self.n = s
+
+
+def tank_temp(temperatures):
+    # the warmest tank thermometer, as Params.decide_if_heat takes it
+    water = None
+    for n in TANK:
+        t = temperatures.get(n)
+        if t is not None and (water is None or t > water):
+            water = t
+    return water
+
+
+class Predictor:
+    def __init__(self, period=300, min_samples=6, off_hours=1.5, max_band=1.5,
+                 max_run_hours=4, filename=FILENAME):
+        self.period = period # seconds per sample
+        self.min_samples = min_samples # per model, before we plan
+        self.off_hours = off_hours # how long the house should last after a run
+        self.max_band = max_band # degrees above desiredHouseMin at most
+        self.max_run = max_run_hours * 3600
+        self.filename = filename
+        self.cooling = RLS()
+        self.heating = RLS()
+        self.tank = RLS()
+        self.last = None # (time, house, water, running) the sample started at
+        self.end = None # when the planned run ends
+        self.target = None # house temperature the run aims at
+        self.lastsave = None
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+            self.cooling.load(data["cooling"])
+            self.heating.load(data["heating"])
+            self.tank.load(data["tank"])
+            print("Loaded predictive models")
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        try:
+            with open(self.filename, 'w') as f:
+                json.dump({"cooling": self.cooling.state(), "heating": self.heating.state(),
+                           "tank": self.tank.state()}, f)
+        except OSError as e:
+            print('Cannot save predictive models', e)
+
+    def ready(self):
+        return min(self.cooling.n, self.heating.n, self.tank.n) >= self.min_samples
+
+    def observe(self, now, temperatures, running, house_min):
+        # learn from the readings; call after each read
+        house = temperatures.get("house")
+        water = tank_temp(temperatures)
+        if house is None or water is None:
+            self.last = None
+            return
+        if self.last is None or self.last[3] != running or now < self.last[0]:
+            self.last = (now, house, water, running)
+            return
+        t0, h0, w0, _ = self.last
+        dt = now - t0
+        if dt < self.period:
+            return
+        hours = dt / 3600
+        h = (house + h0) / 2
+        w = (water + w0) / 2
+        if running:
+            self.heating.update(1.0, w - h, (house - h0) / hours)
+            if water <= w0:
+                # not while a fire or the sun charges the tank
+                self.tank.update(1.0, w - h, (water - w0) / hours)
+        else:
+            self.cooling.update(1.0, h - house_min, (house - h0) / hours)
+        self.last = (now, house, water, running)
+        if self.lastsave is None:
+            self.lastsave = now
+        elif now - self.lastsave >= 3600:
+            self.save()
+            self.lastsave = now
+
+    def plan(self, now, house, water, params):
+        # seconds to run from now, 0 when the tank cannot carry a run
+        cool = max(0.05, -self.cooling.predict(1.0, house - params.desiredHouseMin))
+        self.target = params.desiredHouseMin + max(0.2, min(self.max_band, cool * self.off_hours))
+        rise = self.heating.predict(1.0, water - house)
+        run = self.max_run if rise <= 0.05 else (self.target - house) / rise * 3600
+        if params.desiredWaterMin >= 0:
+            drop = -self.tank.predict(1.0, water - house)
+            if drop > 0.05:
+                left = (water - params.desiredWaterMin) / drop * 3600
+                if left < params.min_runtime_minutes * 60:
+                    return 0
+                run = min(run, left)
+        return max(params.min_runtime_minutes * 60, min(self.max_run, run))
+
+    def decide(self, now, temps, params, running):
+        # like Params.decide_if_heat (and leaves why in params.decision)
+        should_heat = params.decide_if_heat(temps)
+        if not self.ready() or params.decision in (journal.WHY_NO_THERMOMETER, journal.WHY_WATER_HOT):
+            self.end = None
+            return should_heat
+        house = temps.temperatures["house"]
+        water = tank_temp(temps.temperatures)
+        if water is None:
+            # winter mode without tank thermometers
+            self.end = None
+            return should_heat
+        winter = params.desiredWaterMin < 0
+        if running and self.end is not None:
+            if now < self.end and house < self.target + 0.3 \
+                    and (winter or water > params.desiredWaterMin):
+                params.decision = journal.WHY_PLANNED
+                return True
+            self.end = None
+        if not should_heat:
+            self.end = None
+            return False
+        run = self.plan(now, house, water, params)
+        if run == 0:
+            params.decision = journal.WHY_TANK_LOW
+            return False
+        self.end = now + run
+        return True
+
+    def as_dict(self):
+        return {
+          "ready": self.ready(),
+          "cooling_per_hour": self.cooling.predict(1.0, 0.0),
+          "heating_gain": self.heating.w1,
+          "tank_gain": self.tank.w1,
+          "samples": [self.cooling.n, self.heating.n, self.tank.n],
+          "target": self.target if self.end is not None else None,
+          "end": self.end,
+        }
@@ -0,0 +1,1480 @@
+from hwbackend import backend, machine, onewire, ds18x20
+  # the Pico, a Linux host with w1 thermometers, or fake hardware
+on_raspberry = (backend == 'pico')
+if on_raspberry:
+    import rp2
+    import ubinascii
+try:
+    if on_raspberry:
+        # on raspberry, we need network
+        import network
+        import urequests as requests
+        # load custom credentials
+        from secrets import secrets
+    else:
+        import requests
+    import json
+    import socket
+    can_network = True
+except:
+    print("CANNOT NETWORK")
+    can_network = False
+import time
+import select
+from filters import ChannelFilter
+from electricdetector import ElectricDetector
+from snapshot import Snapshot
+import checkpoint
+from checkpoint import Checkpoints
+import journal
+from journal import Journal
+from decision import LIMITS, within_limits, Params
+import httpparser
+from admission import Admission
+import wlansupervisor
+from wlansupervisor import WlanSupervisor
+import zones
+import predictive
+import encoder
+from statusstrip import StatusStrip
+import backlight
+try:
+    import RGB1602 # the display
+    # https://www.waveshare.com/wiki/LCD1602_RGB_Module#Download_the_demo
+    # Then I flashed the .uf2 file onto pico
+    #  (i.e. connect USB while holding the bootsel button and then copy the file to pico)
+    can_display = True
+except:
+    can_display = False
+
+depthSensor = None # made on first use, see get_depth_sensor()
+
+# run the heating control on the second core, the network on the first
+# (see dualcore.py): 'dual_core': True in secrets.py on the Pico, DUAL_CORE=1
+# on a PC, where it runs in a thread
+if on_raspberry:
+    try:
+        dual_core = bool(secrets.get('dual_core'))
+    except NameError:
+        dual_core = False
+else:
+    import os
+    dual_core = os.environ.get('DUAL_CORE', '0') == '1'
+if dual_core:
+    import dualcore
+    from dualcore import SnapshotBuffer, Mailbox, Liveness
+
+# plan longer, fewer runs from learned house and tank rates (predictive.py):
+# 'predictive': True in secrets.py on the Pico, PREDICTIVE=1 on a PC
+if on_raspberry:
+    try:
+        predictive_control = bool(secrets.get('predictive'))
+    except NameError:
+        predictive_control = False
+else:
+    predictive_control = os.environ.get('PREDICTIVE', '0') == '1'
+
+relayPIN = 14
+thermoPIN = 15
+encoderPINs = None # (A, B, button) of a rotary encoder, e.g. (18, 19, 20)
+stripPIN = None # data pin of an 8-LED NeoPixel status strip, e.g. 7
+paramsFilename = "parameters.txt"
+
+WDT_RESET = getattr(machine, 'WDT_RESET', 3)
+def reset_cause():
+    # why we booted, where the machine can tell
+    try:
+        return machine.reset_cause()
+    except AttributeError:
+        return 0
+
+
+class Stats:
+    def __init__(self):
+        # for uptime
+        self.starttime = time.time()
+        self.heating_runtime_sum = 0
+        self.heating_starttime = None
+        self.electric_runtime_sum = 0
+        self.electric_starttime = None
+        # garden water level
+        self.garden_water_level = -1
+        self.garden_water_measurements = []
+        # restarts, counted across them by the checkpoints
+        self.boots = 1
+        self.watchdog_resets = 0
+        self.reset_cause = 0 # machine.reset_cause() of this boot
+        self.last_reason = checkpoint.REASON_NONE # of the previous reset
+    def restore(self, record, cause):
+        # continue the counters of a checkpoint (a dict, or None)
+        self.reset_cause = cause
+        if record is None:
+            return
+        self.heating_runtime_sum = record["heating_ms"] / 1000
+        self.electric_runtime_sum = record["electric_ms"] / 1000
+          # the relay is off after a reset, so nothing is running now
+        self.garden_water_measurements = record["garden"]
+        if self.garden_water_measurements:
+            self.garden_water_level = int(sum(self.garden_water_measurements)/len(self.garden_water_measurements))
+        self.boots = record["boots"] + 1
+        self.watchdog_resets = record["watchdog_resets"]
+        self.last_reason = record["reason"]
+        if cause == WDT_RESET and self.last_reason == checkpoint.REASON_NONE:
+            # machine.reset() looks the same, but we note the reason before it
+            self.watchdog_resets += 1
+        print("Restored counters, boot", self.boots, "reset cause", cause,
+              "reason", checkpoint.REASONS.get(self.last_reason))
+    def uptime_hours(self):
+        return (time.time() - self.starttime)/3600
+    def start_heating(self):
+        if self.heating_starttime is None:
+            self.heating_starttime = time.time()
+    def stop_heating(self):
+        if self.heating_starttime is None:
+            print("BUG! stopping without having started")
+        else:
+            self.heating_runtime_sum += time.time()-self.heating_starttime
+        self.heating_starttime = None
+    def operated_hours(self):
+        current_segment = 0 if self.heating_starttime is None else time.time()-self.heating_starttime
+        return (self.heating_runtime_sum + current_segment)/3600
+
+    def update_garden_water_level(self):
+        depthSensor = get_depth_sensor()
+        if depthSensor is not None:
+            currlevel = depthSensor.distance_mm()
+            if currlevel == -1:
+                self.garden_water_measurements = []
+                self.garden_water_level = -1
+            else:
+                self.garden_water_measurements += [currlevel]
+                if len(self.garden_water_measurements) > 20:
+                    # keep only last 20 measurements
+                    self.garden_water_measurements = self.garden_water_measurements[1:]
+                self.garden_water_level = int(sum(self.garden_water_measurements)/len(self.garden_water_measurements))
+                print("Garden:", self.garden_water_measurements, "...avg:", self.garden_water_level)
+    def monitor_electric_heating(self, electric_running):
+        if electric_running:
+            if self.electric_starttime is None:
+                self.electric_starttime = time.time()
+            else:
+                pass
+                # print("Electric heating running")
+        else: # electric_not_running
+            if self.electric_starttime is None:
+                pass
+                # print("Electric heating not running")
+            else:
+                self.electric_runtime_sum += time.time()-self.electric_starttime
+                self.electric_starttime = None
+    def electric_operated_hours(self):
+        current_segment = 0 if self.electric_starttime is None else time.time()-self.electric_starttime
+        return (self.electric_runtime_sum + current_segment)/3600
+
+class Display:
+    def __init__(self):
+        global can_display
+        if can_display:
+            try:
+                self.lcd = RGB1602.RGB1602(16,2)
+                self.backlight = backlight.Backlight(self.lcd)
+            except:
+                print("Failed to init display, disabling.")
+                can_display = False
+        self.rotation_state = 0
+        self.shown_version = None # snapshot on the first line and in the color
+        self.editline = None # the second line while the knob edits a limit
+        self.limitsline = None # the second line otherwise, as last drawn
+        self.writing = False # report() is using the display
+        self.edit_pending = False # show_edit() came while it was
+    def set_color_for_failure(self):
+        global can_display
+        if can_display:
+            # failure is yellow, not green, not blue, not red
+            try:
+                self.backlight.fade(backlight.YELLOW)
+            except:
+                print("Disabling display, some error")
+                can_display = False
+            self.check_backlight()
+    def set_color_by_temperature(self, temp):
+        # temperatures above "nice" level are red (we get hot showers)
+        # the max value is fully red
+        # the min value is fully blue (but for readability, we keep read at 100
+        # (the table is in backlight.py); above the safety limit it pulses
+        if can_display:
+            self.backlight.temperature(temp)
+            self.check_backlight()
+    def check_backlight(self):
+        # Backlight.write notes an I2C failure (also of a frame the timer
+        # ran) instead of raising; the display shares the bus, so it is
+        # disabled as a whole, as for any other display error
+        global can_display
+        if can_display and self.backlight.failed:
+            print("Backlight failed, disabling display.")
+            can_display = False
+        return can_display
+    def report(self, snap, mynetwork):
+        self.writing = True
+        try:
+            self.draw(snap, mynetwork)
+        finally:
+            self.writing = False
+        if self.edit_pending:
+            # the knob turned while we drew, draw what it says now
+            self.show_edit(self.editline)
+    def draw(self, snap, mynetwork):
+        if self.check_backlight():
+            self.backlight.poll() # when there is no timer
+        if snap.version != self.shown_version:
+            # color and the first line change only with a new snapshot
+            self.shown_version = snap.version
+            if snap.temperatures["water"] is None:
+                self.set_color_for_failure()
+            else:
+                self.set_color_by_temperature(snap.temperatures["water"])
+            line1 = ('Wtr%s^%s>%s Rm%s' % snap.lcd_temps())
+            
+            print("[[", line1, "]]")
+            if True and can_display:
+                self.lcd.setCursor(0,0)
+                self.lcd.printout(line1)
+        # up = int(stats.uptime_hours()/24)
+        # upstr = '99+' if up > 99 else '%2id' % up
+        if can_network:
+            if mynetwork.got_wlan:
+                if mynetwork.got_socket:
+                    wifistr = '+'
+                else:
+                    wifistr = 'x'
+            else:
+                wifistr = '.'
+        else:
+            wifistr = '-'
+        if snap.electric:
+            rotstates = 'Elec' # we are guessing that the electric heating is on
+        elif snap.heating_running and snap.should_heat:
+            # rotstates = '-\|/' # backslash not available
+            rotstates = '<^>v'
+        elif snap.heating_running and not snap.should_heat:
+            rotstates = 'v_v_' # will stop
+        elif not snap.heating_running and snap.should_heat:
+            rotstates = '^.^.' # will start
+        else:
+            rotstates = '. . '
+        self.rotation_state += 1
+        self.rotation_state %= 4
+        heatstr = rotstates[self.rotation_state]
+        # line2 = 'up'+upstr+',wifi'+wifistr+'  '+heatstr
+        if snap.garden_water_level == -1:
+            gardenstr = '-'
+        else:
+            lo = 0
+            hi = 2020
+            k = 9-int((max(snap.garden_water_level,lo)-lo)/(hi-lo)*9)
+            gardenstr = '%1i' % (k)
+        waterlimstr = ("--" if snap.desiredWaterMin < 0 else ("%2.0f"%(snap.desiredWaterMin)))
+        line2 = 'Lim%s-%2.0f G%s wi%s%s' % (waterlimstr, snap.desiredHouseMin, gardenstr, wifistr, heatstr)
+        self.limitsline = line2
+        if self.editline is not None:
+            line2 = self.editline
+        self.print_line2(line2)
+    def print_line2(self, line2):
+        print("[[", line2, "]]")
+        if True and can_display:
+            self.lcd.setCursor(0,1)
+            self.lcd.printout(line2)
+    def show_edit(self, line):
+        # the second line while the knob edits (None: back to the limits),
+        # drawn at once; it runs scheduled, between any two lines of the
+        # loop, so while report() is drawing it is left for report() to draw
+        self.editline = line
+        if self.writing:
+            self.edit_pending = True
+            return
+        self.edit_pending = False
+        self.writing = True
+        try:
+            line2 = line if line is not None else self.limitsline
+            if line2 is not None:
+                self.print_line2(line2)
+        finally:
+            self.writing = False
+#  0123456789012345
+#  Wtr43^30>50 Rm22 
+#  Lim35-20 wiOK  x
+#
+#  current setup:
+#  0123456789012345
+#  Water 43 Room 22
+#  up99+,wifi OK  -\|/-\|/
+#
+#  Alternative ideas:
+#  0123456789012345
+#  W 43<50, R 22>10
+#  W 50>50, R  8<10
+#  up99+,wifi OK  -\|/-\|/
+        
+
+class Knob:
+    # the limits set with the rotary encoder (encoder.py): a click goes
+    # idle -> water -> house -> idle, turning changes the value shown, each
+    # click stores it; left alone, it goes back to idle without storing.
+    # event() runs scheduled, between any two lines of the loop, so it shows
+    # the new value at once (Display.show_edit keeps out of report()) but
+    # only notes the clicked limits; tick() in the loop stores them
+    limits = LIMITS
+    timeout = 30 # seconds
+    def __init__(self, display, params):
+        self.display = display
+        self.params = params
+        self.mode = "idle"
+        self.value = None
+        self.lasttime = 0
+        self.stored = {} # clicked values tick() has not stored yet
+    def event(self, event):
+        if event == encoder.CLICK:
+            if self.mode == "idle":
+                self.mode = "water"
+                self.value = int(self.params.desiredWaterMin)
+            elif self.mode == "water":
+                self.stored["water"] = self.value
+                self.mode = "house"
+                self.value = int(self.params.desiredHouseMin)
+            else:
+                self.stored["house"] = self.value
+                self.mode = "idle"
+        elif self.mode != "idle":
+            lo, hi = self.limits[self.mode]
+            self.value = max(lo, min(hi, self.value + event))
+        self.lasttime = time.time()
+        self.show()
+    def show(self):
+        if self.mode == "idle":
+            self.display.show_edit(None)
+        else:
+            value = "--" if self.value < 0 else "%2i" % self.value
+            self.display.show_edit("Set %-5s %s ok?" % (self.mode, value))
+    def tick(self, now):
+        if self.mode != "idle" and now - self.lasttime > self.timeout:
+            self.mode = "idle"
+            self.show()
+        water = self.stored.pop("water", None)
+        house = self.stored.pop("house", None)
+        if water is not None or house is not None:
+            request(('limits', house, water))
+
+class Heating:
+    def __init__(self, relayPIN, watchdog, params):
+        # Main relay for controlling the output
+        self.relay = machine.Pin(relayPIN, machine.Pin.OUT)
+        self.relay.value(0) # switch off by default
+        self.heating_running = False
+        self.lastONtime = 0 # when did I last turn the heating on
+        self.lastOFFtime = 0 # when did I last turn the heating off
+        self.params = params
+        self.watchdog = watchdog
+        self.electric = ElectricDetector()
+          # guesses from temp differences if electric heating is on
+    
+    def guess_electric_heating_running(self, temps):
+        # the state computed by the detector for the latest sample, None if
+        # we do not know
+        return self.electric.state
+
+    def restore(self, record, now):
+        # relay timing from a checkpoint; the relay was switched off by the
+        # reset, so if it ran, it stopped just now
+        self.lastONtime = now - record["on_age_ms"] // 1000
+        if record["heating_running"]:
+            self.lastOFFtime = now
+        else:
+            self.lastOFFtime = now - record["off_age_ms"] // 1000
+
+    def set_heating(self, stats, temps, should_heat, now = time.time()):
+        # start or stop heating, but only if not switched too recently
+        # immediately stop our heating if we diagnose that electric
+        # heating is on
+
+        was_electric = self.electric.state
+        electric_guessed = self.electric.update(temps, now)
+        stats.monitor_electric_heating(electric_guessed)
+        if electric_guessed is not None and was_electric is not None and electric_guessed != was_electric:
+            events.log(now, journal.ELECTRIC_ON if electric_guessed else journal.ELECTRIC_OFF)
+
+        # first check if electric heating is on
+        if False and electric_guessed: # DISABLED
+            # immediate stop!
+            self.lastOFFtime = now
+            self.relay.value(0)
+            self.heating_running = False
+            stats.stop_heating()
+        elif self.heating_running:
+            if not should_heat:
+                if now - self.lastONtime > params.min_runtime_minutes*60:
+                    # do not run less than 3 minutes
+                    self.lastOFFtime = now
+                    self.watchdog.start_immediately()
+                    self.relay.value(0)
+                    self.heating_running = False
+                    stats.stop_heating()
+                    events.log(now, journal.RELAY_OFF, params.decision)
+        else:
+            # heating not running
+            if should_heat:
+                if now - self.lastOFFtime > params.min_stoptime_minutes*60:
+                    # do not pause for less than 10 minutes
+                    self.lastONtime = now
+                    self.watchdog.start_immediately()
+                    self.relay.value(1)
+                    self.heating_running = True
+                    stats.start_heating()
+                    events.log(now, journal.RELAY_ON, params.decision)
+
+class DelayedWatchdog:
+    # start the real hardware watchdog only after 1 minutes, for easier
+    # debugging
+    def __init__(self):
+        self.watchdog = None
+        self.inittime = time.time()
+    def start_immediately(self):
+        if not self.watchdog:
+            self.watchdog = machine.WDT(timeout=8388)
+            # strangely only 8 secs allowed, not my previous value: 5*60*1000)
+    def feed(self):
+        if self.watchdog:
+            self.watchdog.feed()
+        else:
+            if time.time() - self.inittime > 60*3:
+                self.start_immediately()
+                # auto reboot when dead for more than a minute
+
+
+
+class ReadSchedule:
+    # when to read one thermometer next: often when it moves fast, is close
+    # to a decision limit or heats up with the relay on; rarely when it sits
+    # still far from any limit
+    minperiod = 3 # seconds
+    maxperiod = 60
+    maxstep = 0.25 # degrees we are willing to miss between two reads
+    refresh = 60 # in alarm mode, read even without an alarm this often
+    ttl = 120 # forget a value that was not read successfully for this long
+    def __init__(self):
+        self.period = self.minperiod
+        self.nextread = 0
+        self.lastgood = None # time of the last successful read
+        self.lastvalue = None
+        self.rate = 0.0 # degrees per second, smoothed
+        self.settling = False # the filtered value did not catch up yet
+        self.near = False # within a degree of a limit, read when due
+    def due(self, now, early=0):
+        # early: seconds ahead, to share a conversion with another one
+        return now + early >= self.nextread
+    def read_ok(self, now, value, margin, fast, settling=False):
+        if self.lastgood is not None and now > self.lastgood:
+            rate = abs(value - self.lastvalue) / (now - self.lastgood)
+            self.rate = (self.rate + rate) / 2
+        self.lastgood = now
+        self.lastvalue = value
+        self.settling = settling
+        self.plan(now, margin, fast or settling)
+    def read_failed(self, now):
+        self.nextread = now + self.minperiod # retry soon
+    def plan(self, now, margin, fast):
+        # margin: degrees to the nearest decision limit (or None)
+        # fast: the relay is on and this thermometer follows it
+        period = self.maxperiod
+        if self.rate > 0:
+            period = min(period, self.maxstep / self.rate)
+            if margin is not None:
+                # at least 4 reads before we could reach the limit
+                period = min(period, margin / self.rate / 4)
+        self.near = margin is not None and margin < 1
+        if fast or self.near:
+            period = self.minperiod
+        self.period = max(self.minperiod, period)
+        self.nextread = now + self.period
+    def needs_refresh(self, now):
+        return self.lastgood is None or now - self.lastgood > self.refresh
+    def stale(self, now):
+        return self.lastgood is None or now - self.lastgood > self.ttl
+
+class Temperatures:
+    def __init__(self, thermoPIN, zones=None):
+        self.thermoPIN = thermoPIN
+        self.zones = zones # ZoneController, with more thermometers and limits
+        # find external thermometers
+        self.lastscan = time.time()
+        self.find_thermometers()
+        # find on-board thermometer
+        self.onboard_tempsensor = machine.ADC(4)
+        self.conversion_factor = 3.3 / 65535
+        self.boardTemp = 0.0
+        # alarm mode: thermometers get TH/TL around the decision limits and
+        # only those that crossed them are read (needs onewire_fast)
+        self.alarm_mode = hasattr(self.ds_sensor.ow, 'alarm_scan') if self.roms else False
+        self.alarm_bands = {} # rom index -> (TL, TH) programmed
+        self.alarm_limits = None # Params limits the bands were made for
+        self.lastalarm = 0 # time of the last alarm search
+        self.readings = 0 # counts updates that read something
+
+    rescan_period = 5 # seconds between searches for thermometers while none is found
+    group = 5 # seconds; thermometers due this soon share the conversion
+    alarm_period = 10 # seconds between alarm searches in alarm mode, due or not
+
+        
+    def find_thermometers(self):
+        thermometers = {
+          # thermoWater:
+          "water" : bytearray(b'(D\xc1\x81\xe3\x8f<\x07'),
+          # thermoHouse:
+          "house" : bytearray(b'(\x956\x81\xe3w<\xec'),
+          "waterFromSun" : bytearray(b'(du\x81\xe3\xdd<\x07'),
+          "heaterOut" : bytearray(b'(\x8c\x19\x81\xe3P<\x19'),
+        }
+        if self.zones is not None:
+            thermometers.update(self.zones.thermometers)
+
+        # Find thermometers
+        ds_pin = machine.Pin(self.thermoPIN)
+        self.ds_sensor = ds18x20.DS18X20(onewire.OneWire(ds_pin))
+        self.roms = self.ds_sensor.scan()
+        # # DEBUG:
+        # self.roms = [bytearray(b'(D\xc1\x81\xe3\x8f<\x07'), bytearray(b'(\x956\x81\xe3w<\xec')]
+        print('Found DS devices (thermometers): ', self.roms)
+        self.thermoIDX = dict.fromkeys(thermometers.keys())
+          # thermometer name -> thermometer index
+        for i in range(len(self.roms)):
+            print("I", i)
+            # print("type", type(self.roms))
+            # print("type", type(self.roms[i]))
+            r = self.roms[i]
+            print("Who's this thermo?", self.roms[i])
+            # can't hash bytearrays, so walk through dictionary
+            t = None # this termometer's name
+            for k, v in thermometers.items():
+                print("  Is it?", v)
+                if v == r:
+                    print("  yes!", k)
+                    t = k # found the thermometer
+            if t is not None:
+              self.thermoIDX[t] = i
+            else:
+              print("Found unexpected thermometer", r, "at index", i)
+            # self.houseRomIDX = i if self.roms[i] == thermoHouse else self.houseRomIDX
+            # self.waterRomIDX = i if self.roms[i] == thermoWater else self.waterRomIDX
+        #assert self.houseRomIDX != -1, "Failed to find house thermometer"
+        #assert self.waterRomIDX != -1, "Failed to find water thermometer"
+        for n in thermometers.keys():
+            if self.thermoIDX[n] is None:
+                print("Failed to find thermometer:", n)
+        self.temperatures = dict.fromkeys(thermometers.keys())
+          # thermometer name -> thermometer index
+        self.names = list(thermometers.keys()) # the journal numbers them so
+        self.lost = [] # forgotten after failing too long, until read again
+        self.schedules = dict([(n, ReadSchedule()) for n in thermometers.keys()])
+        # temperatures above are filtered, decisions should not jump on one
+        # glitched sample; the raw readings and trends are here:
+        self.filters = dict([(n, ChannelFilter()) for n in thermometers.keys()])
+        self.raw_temperatures = dict.fromkeys(thermometers.keys())
+        self.slopes = dict([(n, 0.0) for n in thermometers.keys()])
+          # thermometer name -> degrees per minute
+        # self.found_thermometers = self.houseRomIDX != -1 and self.waterRomIDX != -1
+        # self.houseTemp = 0.0
+        # self.waterTemp = 0.0
+    def update(self, params=None, heating=None, now=None):
+        # read the thermometers that are due; return True if any was read
+        if now is None:
+            now = time.time()
+        if len(self.roms) == 0:
+            if now - self.lastscan < self.rescan_period:
+                return False
+            print("Retrying to find thermometers")
+            self.lastscan = now
+            self.find_thermometers()
+            return False
+        limits = self.decision_limits(params) if params is not None else {}
+        relimit = self.alarm_mode and params is not None and self.alarm_limits != limits
+          # limits changed, alarm bands must be programmed again
+        found = [n for n, idx in self.thermoIDX.items() if idx is not None]
+        search = self.alarm_mode and params is not None and now - self.lastalarm >= self.alarm_period
+          # an alarm is looked for on its own period, not only when a
+          # thermometer is due
+        if not relimit and not search and not [n for n in found if self.schedules[n].due(now)]:
+            return False
+        # one conversion (and its wait) for all that are due soon, so that
+        # schedules that drifted apart do not each cost a conversion
+        due = [n for n in found if relimit or self.schedules[n].due(now, self.group)]
+        print("update called; due thermometers: ", due)
+        data = self.onboard_tempsensor.read_u16() * self.conversion_factor
+        self.boardTemp = 27-(data-0.706)/0.001721
+        # some thermometers were found
+        # some strange waiting needed
+        self.ds_sensor.convert_temp()
+        if on_raspberry:
+            time.sleep_ms(750)
+            # on linux the kernel waits for the conversion itself
+        toread = self.thermometers_to_read(params, due, relimit, now)
+        temps = {}
+        running = heating is not None and heating.heating_running
+        for n in due + [n for n in toread if n not in due]:
+            schedule = self.schedules[n]
+            if n not in toread:
+                # in alarm mode: no alarm, so it is still within its band
+                schedule.plan(now, self.margin(limits, n, schedule.lastvalue), running and n in self.follow_relay)
+                continue
+            idx = self.thermoIDX[n]
+            try:
+                t = self.ds_sensor.read_temp(self.roms[idx])
+            except Exception as e:
+                print("Failed to read thermometer", n, e)
+                schedule.read_failed(now)
+                continue
+            temps[idx] = t
+            if n in self.lost:
+                self.lost.remove(n)
+                events.log(now, journal.SENSOR_BACK, 0, self.names.index(n))
+            self.raw_temperatures[n] = t
+            self.temperatures[n] = self.filters[n].add(t, now)
+            self.slopes[n] = self.filters[n].slope
+            settling = self.temperatures[n] is None or abs(t - self.temperatures[n]) > schedule.maxstep
+              # a suspected glitch or a step the filter did not follow yet,
+              # read again soon
+            schedule.read_ok(now, t, self.margin(limits, n, t),
+                             running and n in self.follow_relay, settling)
+        print("update got temperatures: ", temps, "filtered: ", self.temperatures)
+        for n, schedule in self.schedules.items():
+            if self.temperatures[n] is not None and schedule.stale(now):
+                print("Thermometer", n, "not read for too long, forgetting it")
+                self.lost.append(n)
+                events.log(now, journal.SENSOR_LOST, 0, self.names.index(n))
+                self.temperatures[n] = None
+                self.raw_temperatures[n] = None
+                self.slopes[n] = 0.0
+                self.filters[n].reset()
+        if self.alarm_mode and params is not None:
+            self.set_alarm_bands(params, temps)
+        if not temps and not due:
+            return False # an alarm search that found nothing
+        self.readings += 1
+        return True
+
+    # thermometers that change fast when the relay is on
+    follow_relay = ("heaterOut", "waterFromSun")
+
+    def margin(self, limits, name, value):
+        # degrees from value to the nearest limit of the thermometer
+        if value is None or not limits.get(name):
+            return None
+        return min([abs(value - l) for l in limits[name]])
+
+    def thermometers_to_read(self, params, due, relimit, now):
+        # names of thermometers that need a full scratchpad read
+        if not self.alarm_mode or params is None or relimit:
+            return due
+        alarmed = self.ds_sensor.ow.alarm_scan()
+        self.lastalarm = now
+        print("alarm search: ", alarmed)
+        # whoever alarms is read, due or not; close to a limit the alarm
+        # (whole degrees) is too coarse, so those are read when due
+        return [n for n, idx in self.thermoIDX.items() if idx is not None and
+                (self.roms[idx] in alarmed or (n in due and
+                 (idx not in self.alarm_bands or self.schedules[n].settling
+                  or self.schedules[n].near or self.schedules[n].needs_refresh(now))))]
+
+    def decision_limits(self, params):
+        # thermometer name -> temperatures where Params.decide_if_heat
+        # changes its mind
+        water = [] if params.desiredWaterMin < 0 else [params.desiredWaterMin]
+        limits = {
+          "house": [params.desiredHouseMin],
+          "water": water + [57], # the safety limit
+          "waterFromSun": water,
+          "heaterOut": water,
+        }
+        if self.zones is not None:
+            for n, l in self.zones.limits().items():
+                limits[n] = limits.get(n, []) + l
+        return limits
+
+    # thermometers compared with '>' (water > limit): the decision changes
+    # above the limit, not at it
+    strict = ("water", "waterFromSun", "heaterOut")
+
+    def is_strict(self, name):
+        if name in self.strict:
+            return True
+        return self.zones is not None and any([name in z.tank for z in self.zones.zones])
+
+    def set_alarm_bands(self, params, temps, maxband=3):
+        # program TH/TL of the thermometers just read so that they alarm as
+        # soon as they cross a limit, or move more than maxband degrees (to
+        # keep the displayed values roughly fresh); the sensor alarms when
+        # the integer part of its reading is >= TH or <= TL
+        limits = self.decision_limits(params)
+        names = dict([(idx, n) for n, idx in self.thermoIDX.items() if idx is not None])
+        for i, t in temps.items():
+            v = int(t // 1) # the sensor compares only the integer part
+            th = v + maxband
+            tl = v - maxband
+            strict = self.is_strict(names.get(i))
+            for l in limits.get(names.get(i), []):
+                if t < l or (strict and t == l):
+                    # below it (also right at a strict one); within the
+                    # limit's own degree TH is the next degree (v + 1 below)
+                    # and the reads when due (ReadSchedule.near) cover it
+                    th = min(th, int(l // 1))
+                else:
+                    tl = max(tl, int(-(-l // 1)) - 1)
+            th = max(min(max(th, v + 1), 125), -55)
+            tl = max(min(min(tl, v - 1), 125), -55)
+            if self.alarm_bands.get(i) != (tl, th):
+                self.ds_sensor.write_scratch(self.roms[i],
+                    bytearray([th & 0xFF, tl & 0xFF, 0x7F]))
+                self.alarm_bands[i] = (tl, th)
+        self.alarm_limits = limits
+
+#print(ds_sensor.read_temp(houseTemp))
+
+
+
+
+class MyNetwork:
+    def __init__(self, watchdog):
+        self.watchdog = watchdog
+        if on_raspberry:
+            self.use_port = 80
+        else:
+            # assuming network is provided
+            self.use_port = 8080
+        self.socket = None
+        self.assets = load_assets()
+        self.sendbuf = bytearray(512)
+        self.request = httpparser.Request() # reused for every request
+        self.started = 0 # ticks_ms of the connection being served
+        self.admission = Admission(allow=allowed_networks())
+        self.data_etag = None # of self.data, the page values as json
+        self.data = None
+        # live viewers of /events (server-sent events)
+        self.subscribers = []
+        self.pushed = None # the state the viewers have, as a dict
+        self.pushed_version = None
+        self.lastpush = 0
+        wlan, ssid, pw = None, None, None
+        if on_raspberry and can_network:
+            # without the network module or secrets.py the heating still runs
+            try:
+                wlan = self.initialize_wlan()
+                ssid, pw = secrets['ssid'], secrets['pw']
+            except Exception as e:
+                print('Cannot set up Wi-Fi', e)
+                wlan = None
+        self.supervisor = WlanSupervisor(wlan, ssid, pw,
+                                         self.get_listening_socket, self.close_socket)
+
+    @property
+    def got_wlan(self):
+        return self.supervisor.state in (wlansupervisor.BIND, wlansupervisor.SERVE)
+
+    @property
+    def got_socket(self):
+        return self.supervisor.state == wlansupervisor.SERVE
+
+    def initialize_wlan(self):
+        # only switch the radio on, the supervisor connects
+        # Set country to avoid possible errors
+        rp2.country('CZ')
+    
+        wlan = network.WLAN(network.STA_IF)
+        wlan.active(True)
+        # If you need to disable powersaving mode
+        # wlan.config(pm = 0xa11140)
+    
+        # See the MAC address in the wireless chip OTP
+        mac = ubinascii.hexlify(network.WLAN().config('mac'),':').decode()
+        print('mac = ' + mac)
+    
+        # Other things to query
+        # print(wlan.config('channel'))
+        # print(wlan.config('essid'))
+        # print(wlan.config('txpower'))
+        self.wlan = wlan
+        return wlan
+
+    def get_listening_socket(self):
+        # called by the supervisor once we have an IP; True if listening
+        try:
+            # HTTP server with socket
+            addr = socket.getaddrinfo('0.0.0.0', self.use_port)[0][-1]
+            print('Will be listening on', addr)
+            
+            s = socket.socket()
+            # s.setsockopt(s.SOL_SOCKET, s.SO_REUSEADDR,1)
+                  # this is not defined on micropython
+            s.bind(addr)
+            s.listen(1)
+            print('Listening on', addr)
+            self.socket = s
+            if on_raspberry:
+                machine.Pin('LED', machine.Pin.OUT).on()
+            return True
+        except OSError as e:
+            print('Failed to get listening socket', e)
+            self.close_socket()
+            return False
+
+    def close_socket(self):
+        # the link is gone; the viewers and the socket with it
+        for cl in self.subscribers:
+            cl.close()
+        self.subscribers = []
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+        if on_raspberry:
+            machine.Pin('LED', machine.Pin.OUT).off()
+
+    def handle_network_requests(self, snap):
+        # handle network requests; return True if we got a request (only
+        # those count as contact: pushing to an open page does not prove the
+        # network works both ways)
+        if can_network:
+            if self.supervisor.step(time.time()):
+                got_a_request = self.respond_on_socket(snap)
+                print('Got a network request?', got_a_request)
+                self.push_snapshot(snap)
+                return got_a_request
+            return False
+
+    max_subscribers = 3
+    send_timeout = 0.2 # seconds; a viewer that cannot take an event by then is dropped
+    # a client has this long to send its whole request, and this long for
+    # the whole connection, the answer included; with the 0.7 s select and a
+    # 0.75 s conversion in the same loop well within the watchdog's 8.4 s
+    request_deadline = 2000 # ms
+    deadline = 4000 # ms
+    keepalive = 15 # seconds between comments to viewers when nothing changes
+
+    def subscribe(self, cl, snap):
+        # keep the connection open and push changes of the snapshot to it
+        if len(self.subscribers) >= self.max_subscribers:
+            self.write(cl, b'HTTP/1.0 503 Service Unavailable\r\nRetry-After: 30\r\n\r\n')
+            cl.close()
+            print('Too many viewers, refusing another one')
+            return
+        if self.pushed is None:
+            self.pushed = snap.as_dict()
+            self.pushed_version = snap.version
+        cl.settimeout(self.send_timeout)
+        try:
+            cl.send(b'HTTP/1.0 200 OK\r\nContent-type: text/event-stream\r\nCache-Control: no-cache\r\n\r\n')
+        except OSError:
+            cl.close()
+            return
+        self.subscribers.append(cl)
+        # the full state first, deltas from self.pushed come next
+        self.send_event(cl, 'data: %s\n\n' % json.dumps(self.pushed))
+        print('Viewers:', len(self.subscribers))
+
+    def push_snapshot(self, snap):
+        # send what changed to the viewers; return True if some got it
+        if not self.subscribers:
+            return False
+        now = time.time()
+        if snap.version != self.pushed_version:
+            state = snap.as_dict()
+            delta = dict([(k, v) for k, v in state.items() if self.pushed.get(k) != v])
+            self.pushed = state
+            self.pushed_version = snap.version
+            msg = 'data: %s\n\n' % json.dumps(delta)
+        elif now - self.lastpush > self.keepalive:
+            msg = ': keepalive\n\n'
+        else:
+            return False
+        self.lastpush = now
+        for cl in list(self.subscribers):
+            self.send_event(cl, msg)
+        return len(self.subscribers) > 0
+
+    def send_event(self, cl, msg):
+        data = msg.encode()
+        try:
+            sent = cl.send(data)
+        except OSError:
+            sent = -1
+        if sent != len(data):
+            # slow or gone, do not let it hold the control loop
+            print('Dropping a viewer')
+            self.subscribers.remove(cl)
+            cl.close()
+            return False
+        return True
+
+    def respond_on_socket(self, snap):
+        # knowing that socket is ready, check connections
+        # return True if a request was served (only those count as contact:
+        # refused, rate-limited, broken or timed out clients, like scanners,
+        # do not)
+        cl = None
+        answered = False # the status line went out
+        try:
+          read_list = [self.socket] # which sockets to check
+          readable, writable, errored = select.select(read_list, [], [], sleeptime)
+          for s1 in readable:
+            if s1 is self.socket:
+              cl, addr = self.socket.accept()
+              self.started = ticks_ms()
+              # there used to be crashes here, start watchdog
+              self.watchdog.start_immediately()
+              print('Client connected from', addr)
+              refuse = self.admission.admit(addr[0], time.time())
+              if refuse == 403:
+                  # not from our networks, not worth an answer
+                  cl.close()
+                  return False
+              if refuse == 429:
+                  cl.settimeout(self.send_timeout)
+                  answered = True
+                  cl.send(b'HTTP/1.0 429 Too Many Requests\r\nRetry-After: 10\r\n\r\n')
+                  cl.close()
+                  return False
+
+              req = self.request
+              req.reset()
+              state = httpparser.NEED_MORE
+              while state == httpparser.NEED_MORE:
+                  space = req.space()
+                  if len(space) == 0:
+                      break
+                  left = self.request_deadline - ticks_diff(ticks_ms(), self.started)
+                  if left <= 0:
+                      req.status = 408
+                      break
+                  cl.settimeout(left / 1000)
+                  try:
+                      n = recv_into(cl, space)
+                  except OSError:
+                      req.status = 408 # timed out (or reset, then nobody reads it)
+                      break
+                  if not n:
+                      break # closed before the request was complete
+                  state = req.feed(n)
+              print('REQUEST:', req.method, req.path, req.query, req.status)
+              if state != httpparser.DONE:
+                  if req.status is not None:
+                      answered = True
+                      self.write(cl, ('HTTP/1.0 %i %s\r\n\r\n' % (req.status, httpparser.REASONS[req.status])).encode())
+                  cl.close()
+                  return False
+              if req.path == '/settings' and req.method == 'POST':
+                  status = self.change_settings(req.args())
+                  if status is not None:
+                      answered = True
+                      self.write(cl, ('HTTP/1.0 %i %s\r\n\r\n' % (status, httpparser.REASONS[status])).encode())
+                      cl.close()
+                      return False
+              # the answers below may fail halfway, too late for a 500
+              answered = True
+              if req.path == '/events' and req.method == 'GET':
+                  self.subscribe(cl, snap)
+                  return True
+              if req.path == '/settings':
+                if req.method != 'POST':
+                  self.write(cl, b'HTTP/1.0 405 Method Not Allowed\r\nAllow: POST\r\n\r\n')
+                else:
+                  # and back to the (cached) page
+                  self.write(cl, b'HTTP/1.0 303 See Other\r\nLocation: /\r\n\r\n')
+              elif req.method != 'GET':
+                self.write(cl, b'HTTP/1.0 405 Method Not Allowed\r\nAllow: GET\r\n\r\n')
+              elif req.path == '/data.json':
+                self.send_data(cl, snap, req.headers.get('if-none-match'))
+              elif req.path in ('/journal.csv', '/journal.bin'):
+                self.send_journal(cl, req.args(), req.path.endswith('.csv'))
+              elif req.path in self.assets:
+                self.send_asset(cl, self.assets[req.path], req.headers.get('if-none-match'),
+                                req.headers.get('accept-encoding', ''))
+              else:
+                self.write(cl, b'HTTP/1.0 404 Not Found\r\n\r\n')
+              cl.close()
+              print('Done serving')
+              boot.mark('answer')
+              return True
+          return False
+        except OSError as e:
+            print('Connection closed', e)
+            self.drop(cl)
+        except Exception as e:
+            # a bug in one answer must not take the server down
+            print('Error serving', self.request.method, self.request.path, repr(e))
+            if cl is not None and not answered:
+                try:
+                    self.write(cl, b'HTTP/1.0 500 Internal Server Error\r\n\r\n')
+                except OSError:
+                    pass
+            self.drop(cl)
+        return False
+
+    def write(self, cl, data):
+        # send within what is left of the connection's time, so that a slow
+        # client cannot hold the loop longer than 'deadline' in total
+        left = self.deadline - ticks_diff(ticks_ms(), self.started)
+        if left <= 0:
+            raise OSError('too slow a client')
+        cl.settimeout(left / 1000)
+        cl.sendall(data)
+
+    def drop(self, cl):
+        # close a connection that failed, also a viewer that was being added
+        if cl is None:
+            return
+        if cl in self.subscribers:
+            self.subscribers.remove(cl)
+        try:
+            cl.close()
+        except OSError:
+            pass
+
+    def change_settings(self, pairs):
+        # None if done, else the status of the answer: 404 for a zone we do
+        # not have, 400 if the limits are out of LIMITS (nothing is changed)
+        print('PAIRS:', pairs) # the args that we received
+        if "zone" in pairs:
+            zone = zonectl.get(pairs["zone"])
+            if zone is None:
+                return 404
+            try:
+              queryHouse = 0+int(pairs["house"])
+            except:
+              queryHouse = zone.house_min
+            try:
+              queryWater = 0+int(pairs["water"])
+            except:
+              queryWater = zone.water_min
+            if not within_limits(queryHouse, queryWater):
+                return 400
+            request(('zone', zone.name, queryHouse, queryWater))
+            return None
+        try:
+          queryHouse = 0+int(pairs["house"])
+        except:
+          queryHouse = params.desiredHouseMin
+        try:
+          queryWater = 0+int(pairs["water"])
+        except:
+          queryWater = params.desiredWaterMin
+        if not within_limits(queryHouse, queryWater):
+            return 400
+        request(('limits', queryHouse, queryWater))
+        return None
+
+    def send_data(self, cl, snap, if_none_match):
+        # the values for the page, made once per snapshot
+        # (with the limits, which may be newer than the snapshot)
+        limits = [params.desiredHouseMin, params.desiredWaterMin]
+        for z in zonectl.zones:
+            limits += [z.house_min, z.water_min]
+        etag = '"d%i-%s"' % (snap.version, '-'.join([str(l) for l in limits]))
+        if if_none_match == etag:
+            self.write(cl, ('HTTP/1.0 304 Not Modified\r\nETag: %s\r\n\r\n' % etag).encode())
+            return
+        if etag != self.data_etag:
+            data = dict(snap.as_dict())
+            data["desiredHouseMin"] = params.desiredHouseMin
+            data["desiredWaterMin"] = params.desiredWaterMin
+            data["zones"] = [dict(z) for z in snap.zones]
+            for z, zone in zip(data["zones"], zonectl.zones):
+                z["house_min"] = zone.house_min
+                z["water_min"] = zone.water_min
+            self.data = json.dumps(data).encode()
+            self.data_etag = etag
+        self.write(cl, ('HTTP/1.0 200 OK\r\nContent-type: application/json\r\nCache-Control: no-cache\r\nETag: %s\r\n\r\n' % etag).encode())
+        self.write(cl, self.data)
+
+    def send_journal(self, cl, args, csv):
+        # the event journal, as CSV or as the records themselves;
+        # ?from=&to= in seconds, at most limit= (500, 1000 at most) records
+        try:
+            t0 = int(args.get('from', 0))
+            t1 = int(args.get('to', 0xffffffff))
+            limit = int(args.get('limit', 500))
+        except ValueError:
+            self.write(cl, b'HTTP/1.0 400 Bad Request\r\n\r\n')
+            return
+        self.write(cl, ('HTTP/1.0 200 OK\r\nContent-type: %s\r\nCache-Control: no-cache\r\n\r\n' % (
+            'text/csv' if csv else 'application/octet-stream')).encode())
+        buf = self.sendbuf
+        mv = memoryview(buf)
+        n = 0
+        if csv:
+            self.write(cl, journal.CSV_HEADER.encode())
+        for rec in events.query(t0, t1, limit):
+            data = journal.csv_line(rec).encode() if csv else journal.pack(rec)
+            if n + len(data) > len(buf):
+                self.write(cl, mv[:n])
+                n = 0
+            buf[n:n + len(data)] = data
+            n += len(data)
+        self.write(cl, mv[:n])
+
+    def send_asset(self, cl, asset, if_none_match, accept_encoding):
+        # a static file, streamed from flash as it is (gzipped by make
+        # assets); the plain file to clients that do not accept gzip
+        name, etag, encoding = asset["file"], asset.get("etag"), asset.get("encoding")
+        if encoding == 'gzip' and ('gzip' not in accept_encoding
+                                   or 'gzip;q=0' in accept_encoding.replace(' ', '')):
+            if "identity" not in asset:
+                self.write(cl, b'HTTP/1.0 406 Not Acceptable\r\nVary: Accept-Encoding\r\n\r\n')
+                return
+            name, etag, encoding = asset["identity"], asset.get("identity_etag"), None
+        if etag is not None and if_none_match == etag:
+            self.write(cl, ('HTTP/1.0 304 Not Modified\r\nETag: %s\r\n\r\n' % etag).encode())
+            return
+        headers = 'HTTP/1.0 200 OK\r\nContent-type: %s\r\n' % asset["type"]
+        if etag is not None:
+            headers += 'ETag: %s\r\nCache-Control: no-cache\r\n' % etag
+        if encoding is not None:
+            headers += 'Content-Encoding: %s\r\n' % encoding
+        if "encoding" in asset:
+            headers += 'Vary: Accept-Encoding\r\n'
+        self.write(cl, (headers + '\r\n').encode())
+        buf = self.sendbuf
+        mv = memoryview(buf)
+        with open(name, 'rb') as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                self.write(cl, mv[:n])
+
+
+try:
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_ms():
+        return int(time.monotonic() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+
+class BootProfile:
+    # milliseconds to each step of the startup, the first heating decision
+    # and the first answer on the web; on the Pico the ticks count from
+    # power-on, so the imports are included
+    def __init__(self):
+        self.start = 0 if on_raspberry else ticks_ms()
+        self.marks = {}
+
+    def mark(self, name):
+        if name not in self.marks:
+            ms = ticks_diff(ticks_ms(), self.start)
+            self.marks[name] = ms
+            print('Boot:', name, 'after', ms, 'ms')
+
+def allowed_networks():
+    # optional 'allow' in secrets.py, e.g. ['192.168.1.0/24'];
+    # without it anyone may connect
+    try:
+        return secrets.get('allow')
+    except NameError:
+        return None
+
+def recv_into(cl, buf):
+    # MicroPython sockets have readinto, CPython ones recv_into
+    if hasattr(cl, 'readinto'):
+        return cl.readinto(buf)
+    return cl.recv_into(buf)
+
+assetsFilename = "www/assets.json"
+
+def load_assets():
+    # URL path -> file, type and ETag; made by build_assets.py
+    try:
+        with open(assetsFilename, 'r') as f:
+            return json.load(f)
+    except:
+        print("No", assetsFilename, "(run make assets), serving index.html as it is")
+        return {"/": {"file": "index.html", "type": "text/html"}}
+
+
+
+def take_snapshot(version, now, params, stats, temps, heating, should_heat):
+    # everything the display, the web page and the log show, computed once
+    snap = Snapshot(version, now)
+    snap.temperatures = dict(temps.temperatures)
+    snap.raw_temperatures = dict(temps.raw_temperatures)
+    snap.slopes = dict(temps.slopes)
+    snap.boardTemp = temps.boardTemp
+    snap.should_heat = should_heat
+    snap.heating_running = heating.heating_running
+    snap.electric = heating.guess_electric_heating_running(temps)
+    snap.electric_confidence = heating.electric.confidence
+    snap.electric_transitions = heating.electric.transitions
+    snap.uptime_hours = stats.uptime_hours()
+    snap.operated_hours = stats.operated_hours()
+    snap.electric_hours = stats.electric_operated_hours()
+    snap.garden_water_level = stats.garden_water_level
+    snap.garden_water_measurements = tuple(stats.garden_water_measurements)
+    snap.desiredHouseMin = params.desiredHouseMin
+    snap.desiredWaterMin = params.desiredWaterMin
+    snap.zones = zonectl.as_list()
+    snap.predictive = predictor.as_dict() if predictor is not None else None
+    snap.wifi = mynetwork.supervisor.stats()
+    snap.clients = mynetwork.admission.stats()
+    snap.boot = boot.marks
+    snap.restarts = {
+      "boots": stats.boots,
+      "watchdog_resets": stats.watchdog_resets,
+      "reset_cause": stats.reset_cause,
+      "last_reason": checkpoint.REASONS.get(stats.last_reason),
+    }
+    return snap
+
+
+# Listen for connections, with a non-blocking socket.accept
+sleeptime = 0.7 # seconds
+tempreaddelay = 5 # seconds
+
+# the devices and the state, made by main(); importing this module touches
+# no hardware
+watchdog = None
+params = None
+heating = None
+lcd = None
+temps = None
+mynetwork = None
+stats = None
+checkpoints = None
+events = None # the Journal
+zonectl = None # the zones besides the main heating, see zones.py
+predictor = None # predictive.Predictor when predictive_control
+knob = None # Knob, when there is a rotary encoder
+strip = None # StatusStrip, when there is one
+mailbox = None # dualcore.Mailbox of the changes for core 1, on both cores
+reset_asked = False
+limits_changed = False # decide again and make a new snapshot
+boot = None
+lastreadtime = None
+lastcontactedtime = None
+should_heat = None
+
+def get_depth_sensor():
+    # the garden tank sensor, made when first needed
+    global depthSensor
+    if depthSensor is None and on_raspberry:
+        try:
+            from hcsr04 import HCSR04
+            # needs microsecond timing, which only the Pico has
+            depthSensor = HCSR04(trigger_pin=13, echo_pin=11)
+        except:
+            print("No depth sensor")
+            depthSensor = False
+    return depthSensor or None
+
+def request(change):
+    # new limits, ('limits', house, water) or ('zone', name, house, water),
+    # or ('reset', reason); on both cores they are made by core 1, the only
+    # one that writes the parameters, the zones and the checkpoints
+    if mailbox is None:
+        apply_change(time.time(), change)
+    elif not mailbox.put(change):
+        print('Control core does not take', change)
+
+def apply_change(now, change):
+    global limits_changed
+    if change[0] == 'limits':
+        if params.store_params(desiredHouseMin=change[1], desiredWaterMin=change[2]):
+            limits_changed = True
+    elif change[0] == 'zone':
+        if zonectl.store(change[1], house_min=change[2], water_min=change[3]):
+            limits_changed = True
+            zone = zonectl.get(change[1])
+            events.log(now, journal.SETPOINT, zone.index, zone.house_min, zone.water_min)
+    elif change[0] == 'reset':
+        planned_reset(now, change[1])
+
+def ask_reset(reason):
+    # once; the safety checks keep asking until it happens
+    global reset_asked
+    if not reset_asked:
+        reset_asked = True
+        request(('reset', reason))
+
+def control_step(now, snap):
+    # read what is due, decide and switch the relay; returns the snapshot
+    # to show, a new one when something was read
+    global lastreadtime, should_heat, limits_changed
+    if mailbox is not None:
+        for change in mailbox.take():
+            apply_change(now, change)
+    read_something = temps.update(params, heating, now)
+      # each thermometer has its own schedule
+    if limits_changed:
+        limits_changed = False
+        read_something = True
+    if now - lastreadtime > tempreaddelay:
+        stats.update_garden_water_level()
+        #houseTemp = ds_sensor.read_temp(thermoHouse)
+        #waterTemp = ds_sensor.read_temp(thermoWater)
+        lastreadtime = now
+        read_something = True
+    if read_something:
+        # Consider heating
+        if predictor is not None:
+            predictor.observe(now, temps.temperatures, heating.heating_running, params.desiredHouseMin)
+            should_heat = predictor.decide(now, temps, params, heating.heating_running)
+        else:
+            should_heat = params.decide_if_heat(temps)
+        was_running = heating.heating_running
+        heating.set_heating(stats, temps, should_heat, now)
+        switched = zonectl.step(temps.temperatures, now, {"tank": 1 if heating.heating_running else 0})
+        checkpoints.save(now, stats, heating, force=(heating.heating_running != was_running) or switched,
+                         zones=zonectl.zones)
+        boot.mark('decision')
+        print('Read temperatures, should heat? ', should_heat, '; heating running? ', heating.heating_running)
+        snap = take_snapshot(snap.version + 1, now, params, stats, temps, heating, should_heat)
+    return snap
+
+def serve_step(now, snap):
+    # show and serve a snapshot; the safety resets
+    global lastcontactedtime
+    events.tick(now)
+    if knob is not None:
+        knob.tick(now)
+    # only when debugging
+    #lcd.report(snap, mynetwork)
+    try:
+        lcd.report(snap, mynetwork)
+    except:
+        print(" !!! Error reporting to the display")
+    if strip is not None:
+        strip.show(snap)
+        strip.tick()
+    if can_network:
+        got_a_request = mynetwork.handle_network_requests(snap)
+        if got_a_request:
+            lastcontactedtime = now
+    if stats.uptime_hours() > 48:
+        # safety reset every two days
+        ask_reset(checkpoint.REASON_UPTIME)
+    if lastcontactedtime is not None and now - lastcontactedtime > 60*30:
+        # safety reset after 30 mins of no contact with outside world
+        ask_reset(checkpoint.REASON_NO_CONTACT)
+    if lastcontactedtime is None and stats.uptime_hours() > 0.5:
+        # safety reset every 30 mins of no contact
+        ask_reset(checkpoint.REASON_NO_CONTACT)
+
+def planned_reset(now, reason):
+    # save the counters first, so that the reset costs nothing but the time
+    checkpoints.save(now, stats, heating, reason, force=True, zones=zonectl.zones)
+    events.log(now, journal.RESET, reason)
+    events.flush(now)
+    machine.reset()
+
+control_failures = 3 # steps in a row that may fail before core 1 gives up
+
+def relays_off():
+    # the safe state when the control cannot go on
+    heating.relay.value(0)
+    heating.heating_running = False
+    for z in zonectl.zones:
+        if z.relay is not None:
+            z.relay.value(0)
+            z.running = False
+
+def control_loop(snapshots, liveness):
+    # on core 1 when running on both cores; a step that fails is skipped,
+    # but after control_failures in a row the relays are switched off and
+    # core 1 stops beating, so core 0 stops feeding the watchdog and the
+    # board resets
+    snap = snapshots.latest()
+    failures = 0
+    while True:
+        now = time.time()
+        liveness.beat(1, now)
+        try:
+            snap = control_step(now, snap)
+            failures = 0
+        except Exception as e:
+            failures += 1
+            print('Control step failed', failures, repr(e))
+            if failures >= control_failures:
+                relays_off()
+                print('Control core gives up')
+                return
+        snapshots.publish(snap)
+        time.sleep(sleeptime)
+
+def main():
+    # start up in the order that gets the relay safe and the first decision
+    # soonest; the Wi-Fi join runs while the thermometers are scanned
+    global watchdog, params, heating, lcd, temps, mynetwork, stats, checkpoints
+    global events, boot, lastreadtime, zonectl, predictor, knob, strip, mailbox
+    boot = BootProfile()
+    events = Journal()
+    # hardware watchdog
+    watchdog = DelayedWatchdog()
+    params = Params(paramsFilename, events)
+    if predictive_control:
+        predictor = predictive.Predictor()
+    heating = Heating(relayPIN, watchdog, params)
+      # the relay is off from here on
+    zonectl = zones.load()
+    zonectl.start(machine, watchdog, events)
+    boot.mark('relay')
+    # initialize my failsafe networking
+    mynetwork = MyNetwork(watchdog)
+    if can_network:
+        mynetwork.supervisor.step(time.time()) # starts the join, does not wait
+    boot.mark('wlan')
+    temps = Temperatures(thermoPIN, zonectl)
+    boot.mark('thermometers')
+    lcd = Display()
+    lcd.set_color_for_failure()
+    if stripPIN is not None:
+        strip = StatusStrip(stripPIN)
+    if encoderPINs is not None:
+        knob = Knob(lcd, params)
+        encoder.Encoder(encoderPINs[0], encoderPINs[1], encoderPINs[2], knob.event)
+    boot.mark('display')
+    lastreadtime = time.time()
+    stats = Stats()
+    # continue where the last boot stopped
+    checkpoints = Checkpoints()
+    record = checkpoints.load()
+    stats.restore(record, reset_cause())
+    if record is not None:
+        heating.restore(record, lastreadtime)
+        zonectl.restore(record, lastreadtime)
+    events.log(lastreadtime, journal.BOOT, stats.reset_cause, stats.last_reason)
+    boot.mark('checkpoint')
+    snap = take_snapshot(0, lastreadtime, params, stats, temps, heating, should_heat)
+    if dual_core:
+        # core 1 controls the heating, core 0 (this one) shows and serves
+        snapshots = SnapshotBuffer(snap)
+        mailbox = Mailbox()
+        liveness = Liveness(time.time())
+        dualcore.start(control_loop, snapshots, liveness)
+        while True:
+            now = time.time()
+            liveness.beat(0, now)
+            if liveness.alive(now):
+                watchdog.feed() # this must be called regularly
+            else:
+                # the control is stuck, let the watchdog reset us
+                print('Control core does not respond')
+                watchdog.start_immediately()
+            snap = snapshots.latest()
+            print('Idling...', snap.temps_line())
+            serve_step(now, snap)
+            time.sleep(sleeptime)
+    else:
+        while True:
+            watchdog.feed() # this must be called regularly
+            print('Idling...', snap.temps_line())
+            # ]'Water: ', temps.temps["water"], '; House: ', temps.houseTemp, '; Board: ', temps.boardTemp, '; Up: ', stats.uptime_hours(), '; HoursOperated: ', stats.operated_hours())
+            now = time.time()
+            #print('now: ', now, ', diff: ', now-lastreadtime)
+            snap = control_step(now, snap)
+            serve_step(now, snap)
+            time.sleep(sleeptime)
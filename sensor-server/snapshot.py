@@ -0,0 +1,88 @@
+# What the control step found out in one pass, published once and read by
+# the display, the web server and the log. Do not modify a published
+# snapshot, make a new one (with a higher version) instead; readers compare
+# versions to skip work they did already. Formatted strings are made on
+# first use and kept.
+
+def fmt1(t):
+    return "%.1f" % t if t is not None else "--"
+
+class Snapshot:
+    __slots__ = ('version', 'time', 'temperatures', 'raw_temperatures',
+                 'slopes', 'boardTemp', 'should_heat', 'heating_running',
+                 'electric', 'electric_confidence', 'electric_transitions',
+                 'uptime_hours', 'operated_hours', 'electric_hours',
+                 'garden_water_level', 'garden_water_measurements',
+                 'desiredHouseMin', 'desiredWaterMin', 'wifi', 'restarts', 'boot',
+                 'zones', 'predictive', 'clients',
+                 '_line', '_lcd', '_dict')
+
+    def __init__(self, version=0, now=0):
+        self.version = version
+        self.time = now
+        self.temperatures = {}
+        self.raw_temperatures = {}
+        self.slopes = {}
+        self.boardTemp = 0.0
+        self.should_heat = None
+        self.heating_running = False
+        self.electric = None
+        self.electric_confidence = 0.0
+        self.electric_transitions = 0
+        self.uptime_hours = 0.0
+        self.operated_hours = 0.0
+        self.electric_hours = 0.0
+        self.garden_water_level = -1
+        self.garden_water_measurements = ()
+        self.desiredHouseMin = None
+        self.desiredWaterMin = None
+        self.wifi = {} # WlanSupervisor.stats()
+        self.restarts = {} # boots and why, kept by the checkpoints
+        self.boot = {} # BootProfile.marks, ms to each step of the startup
+        self.zones = [] # ZoneController.as_list(), the zones besides the main heating
+        self.predictive = None # Predictor.as_dict(), when predictive control is on
+        self.clients = {} # Admission.stats(), connections turned away
+        self._line = None
+        self._lcd = None
+        self._dict = None
+
+    def temps_line(self):
+        # for the log: water:45.5 house:19.2 ...
+        if self._line is None:
+            self._line = " ".join(["%s:%s" % (n, fmt1(t)) for n, t in self.temperatures.items()])
+        return self._line
+
+    def lcd_temps(self):
+        # two characters per thermometer, for the first line of the display
+        if self._lcd is None:
+            self._lcd = tuple([('%2.0f' % v) if v else '--'
+                               for v in [self.temperatures.get(n)
+                                         for n in ['water', 'waterFromSun', 'heaterOut', 'house']]])
+        return self._lcd
+
+    def as_dict(self):
+        # what the web page shows live, ready for json
+        if self._dict is None:
+            self._dict = {
+              "version": self.version,
+              "temperatures": self.temperatures,
+              "should_heat": self.should_heat,
+              "heating_running": self.heating_running,
+              "electric": self.electric,
+              "electric_confidence": self.electric_confidence,
+              "electric_transitions": self.electric_transitions,
+              "uptime_hours": self.uptime_hours,
+              "operated_hours": self.operated_hours,
+              "electric_hours": self.electric_hours,
+              "garden_water_level": self.garden_water_level,
+              "garden_water_measurements": self.garden_water_measurements,
+              "desiredHouseMin": self.desiredHouseMin,
+              "desiredWaterMin": self.desiredWaterMin,
+              "wifi": self.wifi,
+              "restarts": self.restarts,
+              "boot": self.boot,
+              "zones": self.zones,
+              "predictive": self.predictive,
+              "clients": self.clients,
+            }
+        return self._dict
@@ -0,0 +1,113 @@
+# The NeoPixel strip (8 LEDs, as in simple-examples/neopixel8.py) as a
+# status display of the server:
+#   0..4  garden water level as a bar (red when there is no reading)
+#   5, 6  tank temperature, blue (20) .. red (60), like the LCD backlight
+#   7     relay: green running, orange about to start, purple electric
+#
+# show() only computes the wanted colors, once per snapshot, into a shadow
+# buffer; tick() moves the strip towards them by at most 'fps' frames a
+# second, a few frames per change (a short fade), and does not write at all
+# while the strip already shows what is wanted. The write is bit-banged
+# with the interrupts off, so skipping it keeps the loop and the 1-Wire
+# timing undisturbed.
+
+import time
+try:
+    import neopixel
+except ImportError:
+    import fake_neopixel as neopixel
+try:
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+except AttributeError:
+    def ticks_ms():
+        return int(time.time() * 1000)
+    def ticks_diff(a, b):
+        return a - b
+import machine
+import backlight
+
+BAR = 5 # LEDs of the garden bar
+GARDEN_HI = 2020 # mm from the sensor to the water when the barrel is empty
+
+def tank_rgb(temp, bright):
+    # the ramp of the backlight, scaled to 'bright'
+    r, g, b = backlight.temperature_rgb(temp)
+    return r * bright // 255, g * bright // 255, b * bright // 255
+
+class StatusStrip:
+    def __init__(self, pin, n=8, bright=40, fps=20, frames=4):
+        self.np = neopixel.NeoPixel(machine.Pin(pin, machine.Pin.OUT), n)
+        self.n = n
+        self.bright = bright # 0..255, the LEDs are bright
+        self.period = 1000 // fps # ms between writes at least
+        self.frames = frames # writes a change takes
+        self.target = bytearray(3 * n) # the shadow: what we want shown
+        self.shown = bytearray(3 * n) # what the strip shows
+        self.steps = bytearray(3 * n) # per frame, so that a change takes 'frames'
+        self.lastwrite = ticks_ms() - self.period
+        self.version = None
+        self.writes = 0
+        self.clear()
+
+    def clear(self):
+        for i in range(self.n):
+            self.np[i] = (0, 0, 0)
+        self.np.write()
+
+    def set(self, i, rgb):
+        j = 3 * i
+        self.target[j] = rgb[0]
+        self.target[j + 1] = rgb[1]
+        self.target[j + 2] = rgb[2]
+
+    def show(self, snap):
+        if snap.version == self.version:
+            return
+        self.version = snap.version
+        b = self.bright
+        level = snap.garden_water_level
+        if level == -1:
+            for i in range(BAR):
+                self.set(i, (b // 2, 0, 0))
+        else:
+            full = BAR - min(BAR, max(0, level) * BAR // GARDEN_HI)
+            for i in range(BAR):
+                self.set(i, (0, b // 4, b) if i < full else (0, 0, 0))
+        water = snap.temperatures.get("water")
+        rgb = (b // 2, b // 2, 0) if water is None else tank_rgb(water, b)
+        self.set(5, rgb)
+        self.set(6, rgb)
+        if snap.electric:
+            relay = (b // 2, 0, b // 2)
+        elif snap.heating_running:
+            relay = (0, b, 0)
+        elif snap.should_heat:
+            relay = (b, b // 3, 0)
+        else:
+            relay = (0, 0, 0)
+        self.set(7, relay)
+        for k in range(3 * self.n):
+            self.steps[k] = (abs(self.target[k] - self.shown[k]) + self.frames - 1) // self.frames
+
+    def tick(self):
+        # call often; writes only when something changes
+        if self.shown == self.target:
+            return False
+        now = ticks_ms()
+        if ticks_diff(now, self.lastwrite) < self.period:
+            return False
+        self.lastwrite = now
+        shown, target = self.shown, self.target
+        for i in range(self.n):
+            j = 3 * i
+            if shown[j] == target[j] and shown[j + 1] == target[j + 1] and shown[j + 2] == target[j + 2]:
+                continue
+            for k in range(j, j + 3):
+                d = target[k] - shown[k]
+                step = min(abs(d), self.steps[k])
+                shown[k] += step if d > 0 else -step
+            self.np[i] = (shown[j], shown[j + 1], shown[j + 2])
+        self.np.write()
+        self.writes += 1
+        return True
@@ -0,0 +1,71 @@
+# the modules of sensor-server are top-level ones, as on the Pico
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# and the firmware (sensorserver) on the fake hardware
+os.environ.setdefault('SENSOR_BACKEND', 'fake')
+
+
+ROMS = {
+    "water": bytearray(b'(D\xc1\x81\xe3\x8f<\x07'),
+    "house": bytearray(b'(\x956\x81\xe3w<\xec'),
+    "waterFromSun": bytearray(b'(du\x81\xe3\xdd<\x07'),
+    "heaterOut": bytearray(b'(\x8c\x19\x81\xe3P<\x19'),
+}
+
+
+class DS18X20:
+    # what the firmware's ds18x20 does, over onewire_fast; counts the reads
+    def __init__(self, ow):
+        self.ow = ow
+        self.reads = []
+
+    def scan(self):
+        return [rom for rom in self.ow.scan() if rom[0] == 0x28]
+
+    def convert_temp(self):
+        self.ow.reset(True)
+        self.ow.writebyte(self.ow.SKIP_ROM)
+        self.ow.writebyte(0x44)
+
+    def read_temp(self, rom):
+        buf = bytearray(9)
+        self.ow.reset(True)
+        self.ow.select_rom(rom)
+        self.ow.writebyte(0xBE)
+        self.ow.readinto(buf)
+        assert not self.ow.crc8(buf)
+        self.reads.append(bytes(rom))
+        t = buf[1] << 8 | buf[0]
+        if t & 0x8000:
+            t -= 0x10000
+        return t / 16
+
+    def write_scratch(self, rom, buf):
+        self.ow.reset(True)
+        self.ow.select_rom(rom)
+        self.ow.writebyte(0x4E)
+        self.ow.write(buf)
+
+
+@pytest.fixture
+def sensors(monkeypatch, tmp_path):
+    # Temperatures on a simulated bus with the four thermometers; the
+    # devices by name, to set what they feel
+    import onewire_fast
+    import sensorserver
+    from fake_onewire import FakeBus, FakeDS18B20
+    from journal import Journal
+    devices = dict([(n, FakeDS18B20(rom)) for n, rom in ROMS.items()])
+    bus = FakeBus(devices.values())
+    monkeypatch.setattr(sensorserver, 'onewire',
+                        SimpleNamespace(OneWire=lambda pin: onewire_fast.OneWire(pin, bus)))
+    monkeypatch.setattr(sensorserver, 'ds18x20', SimpleNamespace(DS18X20=DS18X20))
+    monkeypatch.setattr(sensorserver, 'events', Journal(prefix=str(tmp_path / 'journal.')))
+    temps = sensorserver.Temperatures(15)
+    assert temps.alarm_mode
+    return temps, devices
@@ -0,0 +1,52 @@
+import admission
+from admission import Admission
+
+
+def test_parse_net():
+    assert admission.parse_net('192.168.1.0/24') == (0xc0a80100, 0xffffff00)
+    assert admission.parse_net('10.0.0.7') == (0x0a000007, 0xffffffff)
+    assert admission.parse_net('0.0.0.0/0') == (0, 0)
+    for bad in ('192.168.1.0/33', '192.168.1/24', '192.168.1.256', 'lan', '10.0.0.0/x'):
+        assert admission.parse_net(bad) is None, bad
+
+
+def test_allowlist():
+    a = Admission(allow=['192.168.1.0/24', '10.0.0.7'])
+    assert a.admit('192.168.1.99', 0) is None
+    assert a.admit('10.0.0.7', 0) is None
+    assert a.admit('10.0.0.8', 0) == 403
+    assert a.admit('::1', 0) == 403
+    assert a.stats() == {"refused": 2, "limited": 0}
+
+
+def test_bad_entries_skipped():
+    a = Admission(allow=['lan', '192.168.1.0/24'])
+    assert a.admit('192.168.1.1', 0) is None
+    assert a.admit('192.168.2.1', 0) == 403
+    # none valid: anyone may connect
+    a = Admission(allow=['lan'])
+    assert a.admit('8.8.8.8', 0) is None
+
+
+def test_burst_then_refill():
+    a = Admission(rate=0.5, burst=3)
+    assert [a.admit('1.2.3.4', 0) for i in range(4)] == [None, None, None, 429]
+    assert a.admit('1.2.3.4', 1) == 429 # half a token
+    assert a.admit('1.2.3.4', 2) is None # one more
+    assert a.admit('1.2.3.4', 2) == 429
+    # refills up to the burst only
+    assert [a.admit('1.2.3.4', 100) for i in range(4)] == [None, None, None, 429]
+    assert a.stats()["limited"] == 4
+    # others have their own bucket
+    assert a.admit('1.2.3.5', 2) is None
+
+
+def test_oldest_client_forgotten():
+    a = Admission(rate=0, burst=1, clients=2)
+    assert a.admit('1.1.1.1', 0) is None
+    assert a.admit('2.2.2.2', 1) is None
+    assert a.admit('3.3.3.3', 2) is None
+    assert len(a.buckets) == 2
+    assert '1.1.1.1' not in a.buckets
+    assert a.admit('2.2.2.2', 3) == 429
+    assert a.admit('1.1.1.1', 4) is None # starts with a full bucket again
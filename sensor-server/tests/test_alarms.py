@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+from conftest import ROMS
+
+
+def params(house=20, water=50):
+    return SimpleNamespace(desiredHouseMin=house, desiredWaterMin=water)
+
+
+def band(temps, name):
+    return temps.alarm_bands[temps.thermoIDX[name]]
+
+
+def th_tl(device):
+    return (device.scratch[3], device.scratch[2])
+
+
+def test_bands(sensors):
+    temps, devices = sensors
+    idx = temps.thermoIDX
+    p = params()
+    temps.set_alarm_bands(p, {idx["house"]: 18.5, idx["water"]: 45.0,
+                              idx["heaterOut"]: 52.0, idx["waterFromSun"]: 70.0})
+    assert band(temps, "house") == (15, 20) # alarms at 20.0, where it stops
+    assert band(temps, "water") == (42, 48)
+    assert band(temps, "heaterOut") == (49, 55) # alarms below 50
+    assert band(temps, "waterFromSun") == (67, 73)
+    # the sensor got them
+    assert th_tl(devices["house"]) == (15, 20)
+
+
+def test_band_at_strict_limit(sensors):
+    temps, devices = sensors
+    idx = temps.thermoIDX
+    # water 50.0 is not above 50 yet: the next degree must alarm, not 53
+    temps.set_alarm_bands(params(), {idx["water"]: 50.0, idx["heaterOut"]: 50.5,
+                                     idx["house"]: 20.0})
+    assert band(temps, "water") == (47, 51)
+    assert band(temps, "heaterOut") == (49, 53) # above: alarms below 50
+    assert band(temps, "house") == (19, 23) # not strict: 20.0 is no longer cold
+    temps.set_alarm_bands(params(), {idx["water"]: 57.0})
+    assert band(temps, "water") == (54, 58) # the safety limit is strict too
+
+
+def test_alarmed_read_others_planned(sensors):
+    temps, devices = sensors
+    for n, t in (("house", 15), ("water", 40), ("waterFromSun", 30), ("heaterOut", 35)):
+        devices[n].temp = t
+    p = params()
+    ds = temps.ds_sensor
+    assert temps.update(p, None, 1000)
+    assert len(ds.reads) == 4 # no bands yet
+    ds.reads.clear()
+    # nothing crossed its band: only the alarm search
+    devices["water"].temp = 40.5
+    temps.update(p, None, 1030)
+    assert ds.reads == []
+    # the house crosses its band
+    devices["house"].temp = 18.25
+    temps.update(p, None, 1040)
+    assert ds.reads == [bytes(ROMS["house"])]
+    assert temps.raw_temperatures["house"] == 18.25
+
+
+def test_near_limit_read_when_due(sensors):
+    temps, devices = sensors
+    for n, t in (("house", 19.75), ("water", 60), ("waterFromSun", 30), ("heaterOut", 35)):
+        devices[n].temp = t
+    p = params()
+    ds = temps.ds_sensor
+    temps.update(p, None, 1000)
+    house = temps.schedules["house"]
+    assert house.near and house.period == house.minperiod
+    ds.reads.clear()
+    # 19.9 does not alarm (TH is 20), but it is read at its short period
+    devices["house"].temp = 19.875
+    temps.update(p, None, 1000 + house.minperiod)
+    assert ds.reads == [bytes(ROMS["house"])]
+    assert temps.raw_temperatures["house"] == 19.875
@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+
+import pytest
+
+import hwbackend # registers 'machine'
+import backlight
+import sensorserver
+from backlight import Backlight
+
+REGS = SimpleNamespace(REG_RED=0x04, REG_GREEN=0x03, REG_BLUE=0x02)
+RGB_ADDRESS = 0xc0 >> 1
+
+
+class FakeI2C:
+    # records the register writes, raises once told to fail
+    def __init__(self):
+        self.writes = []
+        self.fail = False
+
+    def writeto_mem(self, addr, reg, data):
+        if self.fail:
+            raise OSError(5) # EIO
+        self.writes.append((addr, reg, ord(data)))
+
+
+class FakeLCD:
+    # the part of RGB1602 the backlight uses
+    def __init__(self, i2c):
+        self.i2c = i2c
+
+    def setReg(self, reg, data):
+        self.i2c.writeto_mem(RGB_ADDRESS, reg, chr(data))
+
+    def setCursor(self, col, row):
+        pass
+
+    def printout(self, text):
+        pass
+
+
+@pytest.fixture
+def i2c(monkeypatch):
+    monkeypatch.setattr(backlight, 'RGB1602', REGS)
+    return FakeI2C()
+
+
+def test_only_changed_channels(i2c):
+    b = Backlight(FakeLCD(i2c))
+    b.steady((100, 0, 255))
+    assert i2c.writes == [(RGB_ADDRESS, 0x04, 100), (RGB_ADDRESS, 0x03, 0), (RGB_ADDRESS, 0x02, 255)]
+    del i2c.writes[:]
+    b.steady((100, 0, 255))
+    assert i2c.writes == []
+    b.steady((120, 0, 255))
+    assert i2c.writes == [(RGB_ADDRESS, 0x04, 120)]
+
+
+def test_temperature(i2c):
+    b = Backlight(FakeLCD(i2c))
+    b.temperature(20)
+    assert b.rgb == [100, 0, 255]
+    del i2c.writes[:]
+    b.temperature(20.4) # the same whole degree
+    assert i2c.writes == []
+    b.temperature(backlight.HOT + 1)
+    assert b.mode == backlight.PULSING and b.running
+    b.poll()
+    assert i2c.writes == [(RGB_ADDRESS, 0x04, backlight.PULSE[0]), (RGB_ADDRESS, 0x02, 0)]
+
+
+def test_fade_ends_steady(i2c):
+    b = Backlight(FakeLCD(i2c), fade_frames=4)
+    b.steady((0, 0, 0))
+    b.fade(backlight.YELLOW)
+    for _ in range(5):
+        b.step()
+    assert b.mode == backlight.STEADY and not b.running
+    assert b.rgb == list(backlight.YELLOW)
+    # blue never changed from 0, so it was never written again
+    assert [w for w in i2c.writes if w[1] == 0x02] == [(RGB_ADDRESS, 0x02, 0)]
+
+
+def test_failure_noted(i2c):
+    b = Backlight(FakeLCD(i2c))
+    b.wheel()
+    i2c.fail = True
+    b.step()
+    assert b.failed and not b.running
+    b.step() # no more writes after a failure
+    i2c.fail = False
+    b.step()
+    assert i2c.writes == []
+
+
+def test_display_disabled(i2c, monkeypatch):
+    lcd = FakeLCD(i2c)
+    monkeypatch.setattr(sensorserver, 'can_display', True)
+    monkeypatch.setattr(sensorserver, 'RGB1602', SimpleNamespace(RGB1602=lambda cols, rows: lcd),
+                        raising=False)
+    d = sensorserver.Display()
+    d.set_color_by_temperature(30)
+    assert sensorserver.can_display
+    i2c.fail = True
+    d.set_color_by_temperature(45)
+    assert d.backlight.failed
+    assert not sensorserver.can_display
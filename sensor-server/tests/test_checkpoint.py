@@ -0,0 +1,93 @@
+import struct
+from types import SimpleNamespace
+
+import checkpoint
+from checkpoint import Checkpoints
+
+
+def stats(heating_sum=3600, boots=2):
+    return SimpleNamespace(heating_runtime_sum=heating_sum, heating_starttime=None,
+                           electric_runtime_sum=60, electric_starttime=None,
+                           garden_water_measurements=[100, 200, 70000],
+                           boots=boots, watchdog_resets=1, reset_cause=3)
+
+
+def heating(running=False, on=900, off=950):
+    return SimpleNamespace(heating_running=running, lastONtime=on, lastOFFtime=off)
+
+
+def zone(running, on, off):
+    return SimpleNamespace(running=running, lastONtime=on, lastOFFtime=off)
+
+
+def files(tmp_path):
+    return (str(tmp_path / 'checkpoint.a'), str(tmp_path / 'checkpoint.b'))
+
+
+def test_round_trip(tmp_path):
+    c = Checkpoints(files(tmp_path))
+    zones = [zone(True, 990, 500), zone(False, 100, 800)]
+    assert c.save(1000, stats(), heating(), checkpoint.REASON_UPTIME, zones=zones)
+    r = Checkpoints(files(tmp_path)).load()
+    assert r["heating_ms"] == 3600000
+    assert r["electric_ms"] == 60000
+    assert not r["heating_running"]
+    assert r["on_age_ms"] == 100000
+    assert r["off_age_ms"] == 50000
+    assert r["boots"] == 2
+    assert r["watchdog_resets"] == 1
+    assert r["reset_cause"] == 3
+    assert r["reason"] == checkpoint.REASON_UPTIME
+    assert r["garden"] == [100, 200, 0xffff]
+    assert r["zones"] == [{"running": True, "on_age_ms": 10000, "off_age_ms": 500000},
+                          {"running": False, "on_age_ms": 900000, "off_age_ms": 200000}]
+
+
+def test_alternates_and_takes_newest(tmp_path):
+    names = files(tmp_path)
+    c = Checkpoints(names, period=0)
+    assert c.save(1000, stats(boots=1), heating())
+    assert c.save(1001, stats(boots=2), heating())
+    with open(names[0], 'rb') as f:
+        a = f.read()
+    with open(names[1], 'rb') as f:
+        b = f.read()
+    assert len(a) == len(b) == checkpoint.SIZE + 4
+    assert struct.unpack_from('<I', a, 4)[0] == 2
+    assert struct.unpack_from('<I', b, 4)[0] == 1
+    c = Checkpoints(names)
+    assert c.load()["boots"] == 2
+    assert c.seq == 2
+    # the next save goes over the older file
+    c.save(1002, stats(boots=3), heating(), force=True)
+    with open(names[1], 'rb') as f:
+        assert struct.unpack_from('<I', f.read(), 4)[0] == 3
+
+
+def test_damaged_copy_skipped(tmp_path):
+    names = files(tmp_path)
+    c = Checkpoints(names, period=0)
+    c.save(1000, stats(boots=1), heating())
+    c.save(1001, stats(boots=2), heating())
+    with open(names[0], 'r+b') as f: # the newer one, cut off by a reset
+        f.seek(20)
+        f.write(b'\xff')
+    assert Checkpoints(names).load()["boots"] == 1
+    with open(names[1], 'wb') as f:
+        f.write(b'NZC2')
+    assert Checkpoints(names).load() is None
+
+
+def test_no_files(tmp_path):
+    assert Checkpoints(files(tmp_path)).load() is None
+
+
+def test_saves_only_changes(tmp_path):
+    c = Checkpoints(files(tmp_path), period=600)
+    assert c.save(1000, stats(), heating())
+    assert not c.save(1100, stats(heating_sum=7200), heating()) # too soon
+    assert not c.save(1700, stats(), heating()) # only the ages changed
+    assert not c.save(2200, stats(heating_sum=7200), heating()) # the period starts over
+    assert c.save(2300, stats(heating_sum=7200), heating())
+    assert c.save(2301, stats(heating_sum=7200), heating(), force=True)
+    assert c.writes == 3
@@ -0,0 +1,63 @@
+from electricdetector import ElectricDetector
+
+
+class Temps:
+    # what the detector reads of Temperatures
+    def __init__(self):
+        self.readings = 0
+        self.temperatures = {"waterFromSun": None, "heaterOut": None}
+
+    def read(self, sun, out):
+        self.readings += 1
+        self.temperatures = {"waterFromSun": sun, "heaterOut": out}
+
+
+def feed(d, temps, deltas, t0=0, step=60):
+    for i, delta in enumerate(deltas):
+        temps.read(30.0, None if delta is None else 30.0 + delta)
+        d.update(temps, t0 + i * step)
+    return d.state
+
+
+def test_on_and_off_with_hysteresis():
+    d, temps = ElectricDetector(), Temps()
+    assert feed(d, temps, [10] * 6) is False
+    assert feed(d, temps, [30] * 6, 360) is True
+    assert d.transitions == 1
+    # between the thresholds it stays on
+    assert feed(d, temps, [25] * 6, 720) is True
+    assert feed(d, temps, [20] * 6, 1080) is False
+    assert d.transitions == 2
+
+
+def test_dwell():
+    d, temps = ElectricDetector(dwell=600, size=1), Temps()
+    assert feed(d, temps, [10], 0) is False
+    assert feed(d, temps, [30], 60) is False # too soon after the last change
+    assert d.confidence == 0.0
+    assert feed(d, temps, [30], 600) is True
+
+
+def test_fast_rise_starts_early():
+    d, temps = ElectricDetector(), Temps()
+    feed(d, temps, [10] * 6)
+    # mean over 24 but under 27, rising fast
+    assert feed(d, temps, [21, 23, 25, 27, 29, 31], 360, step=30) is True
+    assert d.mean() < d.on_delta
+
+
+def test_same_reading_counted_once():
+    d, temps = ElectricDetector(), Temps()
+    temps.read(30.0, 40.0)
+    d.update(temps, 0)
+    d.update(temps, 60)
+    assert d.count == 1
+
+
+def test_lost_thermometer():
+    d, temps = ElectricDetector(), Temps()
+    feed(d, temps, [30] * 6)
+    assert d.state is True
+    assert feed(d, temps, [None], 400) is None
+    assert d.count == 0
+    assert feed(d, temps, [10], 460) is False
@@ -0,0 +1,187 @@
+from types import SimpleNamespace
+
+import hwbackend # registers 'machine'
+import encoder
+import sensorserver
+from encoder import Encoder, TABLE, CLICK
+
+FORWARD = [0b00, 0b10, 0b11, 0b01] # A leads B
+
+
+class FakePin:
+    # an input with a pull-up and an interrupt handler
+    IN = 0
+    PULL_UP = 1
+    IRQ_RISING = 4
+    IRQ_FALLING = 8
+
+    def __init__(self, id, mode=None, pull=None):
+        self.v = 1
+        self.handler = None
+
+    def value(self):
+        return self.v
+
+    def irq(self, handler, trigger):
+        self.handler = handler
+
+    def set(self, v):
+        # an edge, and its interrupt
+        if v != self.v:
+            self.v = v
+            self.handler(self)
+
+
+class Knob:
+    # an encoder with fake pins, a clock and a schedule that waits for run()
+    def __init__(self, monkeypatch, on_event, size=16):
+        self.now = 0
+        self.scheduled = []
+        monkeypatch.setattr(encoder, 'machine', SimpleNamespace(Pin=FakePin))
+        monkeypatch.setattr(encoder, 'ticks_ms', lambda: self.now)
+        monkeypatch.setattr(encoder, 'schedule', lambda fn, arg: self.scheduled.append((fn, arg)))
+        self.enc = Encoder(1, 2, 3, on_event, size=size)
+
+    def ab(self, state):
+        # A then B, as the two edges come one by one
+        self.enc.a.set(state >> 1)
+        self.enc.b.set(state & 1)
+
+    def turn(self, detents):
+        i = FORWARD.index((self.enc.a.v << 1) | self.enc.b.v)
+        step = 1 if detents > 0 else -1
+        for _ in range(abs(detents) * 4):
+            i = (i + step) % 4
+            self.ab(FORWARD[i])
+
+    def click(self, held=50):
+        self.now += 1000
+        self.enc.sw.set(0)
+        self.now += held
+        self.enc.sw.set(1)
+
+    def run(self):
+        # what micropython.schedule runs after the interrupt
+        scheduled, self.scheduled = self.scheduled, []
+        for fn, arg in scheduled:
+            fn(arg)
+
+
+def test_table():
+    for i in range(4):
+        prev, cur = FORWARD[i], FORWARD[(i + 1) % 4]
+        assert TABLE[prev << 2 | cur] == 1
+        assert TABLE[cur << 2 | prev] == 255
+        assert TABLE[prev << 2 | prev] == 0
+        # two bits at once: a bounce or a missed edge, no direction
+        assert TABLE[prev << 2 | FORWARD[(i + 2) % 4]] == 0
+    assert sorted(TABLE) == [0] * 8 + [1] * 4 + [255] * 4
+
+
+def test_turns_and_bounces(monkeypatch):
+    events = []
+    k = Knob(monkeypatch, events.append)
+    k.turn(2)
+    k.turn(-1)
+    k.run()
+    assert events == [1, 1, -1]
+    # a contact bouncing back and forth cancels out (the detents rest at
+    # 11, the pull-ups)
+    del events[:]
+    for _ in range(5):
+        k.ab(0b01)
+        k.ab(0b11)
+    k.run()
+    assert events == []
+    k.turn(1)
+    k.run()
+    assert events == [1]
+
+
+def test_click_debounced(monkeypatch):
+    events = []
+    k = Knob(monkeypatch, events.append)
+    k.click(held=10) # shorter than click_ms
+    k.run()
+    assert events == []
+    k.click()
+    k.run()
+    assert events == [CLICK]
+    # a bounce of the release within debounce_ms
+    k.now += 1000
+    k.enc.sw.set(0)
+    k.now += 40
+    k.enc.sw.set(1)
+    k.now += 2
+    k.enc.sw.set(0)
+    k.now += 2
+    k.enc.sw.set(1)
+    k.run()
+    assert events == [CLICK, CLICK]
+
+
+def test_ring_overflow(monkeypatch):
+    events = []
+    k = Knob(monkeypatch, events.append, size=8)
+    k.turn(10) # while the consumer does not run
+    assert len(k.scheduled) == 1 # scheduled once, not per event
+    assert k.enc.dropped == 3 # 7 fit in a ring of 8
+    k.run()
+    assert events == [1] * 7
+    k.turn(1)
+    k.run()
+    assert events == [1] * 8
+
+
+class Display:
+    # the second line, as Display.show_edit draws it
+    def __init__(self):
+        self.lines = []
+
+    def show_edit(self, line):
+        self.lines.append(line)
+
+
+def test_knob_value_drawn_when_scheduled(monkeypatch):
+    requests = []
+    monkeypatch.setattr(sensorserver, 'request', requests.append)
+    display = Display()
+    params = SimpleNamespace(desiredHouseMin=20, desiredWaterMin=50)
+    knob = sensorserver.Knob(display, params)
+    k = Knob(monkeypatch, knob.event)
+    k.click()
+    k.turn(3)
+    assert display.lines == [] # nothing until the consumer runs
+    k.run()
+    assert display.lines == ["Set water 50 ok?", "Set water 51 ok?", "Set water 52 ok?",
+                             "Set water 53 ok?"]
+    k.click()
+    k.turn(-2)
+    k.run()
+    assert display.lines[-1] == "Set house 18 ok?"
+    knob.tick(k.now / 1000)
+    assert requests == [('limits', None, 53)] # the loop stores what was clicked
+    k.click()
+    k.run()
+    assert display.lines[-1] is None
+    knob.tick(k.now / 1000)
+    assert requests[-1] == ('limits', 18, None)
+
+
+def test_edit_waits_for_report(monkeypatch):
+    # the knob draws while report() has the display: report() draws it after
+    monkeypatch.setattr(sensorserver, 'can_display', False)
+    d = sensorserver.Display()
+    drawn = []
+    monkeypatch.setattr(d, 'print_line2', drawn.append)
+
+    def draw(snap, mynetwork):
+        d.print_line2("Lim50-20")
+        d.show_edit("Set water 51 ok?") # the scheduled consumer, meanwhile
+        assert drawn == ["Lim50-20"]
+    monkeypatch.setattr(d, 'draw', draw)
+    d.limitsline = "Lim50-20"
+    d.report(None, None)
+    assert drawn == ["Lim50-20", "Set water 51 ok?"]
+    d.show_edit(None)
+    assert drawn[-1] == "Lim50-20"
@@ -0,0 +1,62 @@
+from filters import ChannelFilter, POWER_ON_VALUE
+
+
+def test_first_sample_passes():
+    f = ChannelFilter()
+    assert f.add(40.0, 0) == 40.0
+    assert f.slope == 0.0
+
+
+def test_single_spike_dropped():
+    f = ChannelFilter(tau=6, spike=2.0)
+    for i in range(5):
+        f.add(40.0, i * 5)
+    f.add(60.0, 25)
+    assert f.value == 40.0
+    assert f.rejected == 1
+
+
+def test_step_gets_through():
+    f = ChannelFilter(tau=6, spike=2.0)
+    for i in range(5):
+        f.add(40.0, i * 5)
+    f.add(50.0, 25) # a glitch, as far as we know
+    f.add(50.0, 30) # no: the median moves
+    assert f.value > 40.0
+    for i in range(7, 30):
+        f.add(50.0, i * 5)
+    assert abs(f.value - 50.0) < 0.01
+
+
+def test_power_on_value():
+    f = ChannelFilter()
+    assert f.add(POWER_ON_VALUE, 0) is None
+    f.add(40.0, 5)
+    assert f.add(POWER_ON_VALUE, 10) == 40.0
+    assert f.rejected == 2
+    # unless it is really that hot
+    f = ChannelFilter()
+    f.add(84.5, 0)
+    assert f.add(POWER_ON_VALUE, 5) > 84.5
+
+
+def test_ema_with_irregular_samples():
+    f = ChannelFilter(tau=6, spike=100)
+    f.add(40.0, 0)
+    assert f.add(41.0, 6) == 40.5 # dt == tau: half way
+    assert f.add(41.0, 6) == 40.5 # no time passed
+
+
+def test_slope():
+    f = ChannelFilter(tau=6, spike=2.0)
+    for i in range(60):
+        f.add(40.0 + i * 0.5, i * 30) # a degree a minute
+    assert abs(f.slope - 1.0) < 0.05
+
+
+def test_reset():
+    f = ChannelFilter()
+    f.add(40.0, 0)
+    f.reset()
+    assert f.value is None
+    assert f.add(20.0, 5) == 20.0
@@ -0,0 +1,93 @@
+import httpparser
+from httpparser import Request, NEED_MORE, DONE, ERROR
+
+
+def feed(req, data):
+    # data in one recv
+    space = req.space()
+    space[:len(data)] = data
+    return req.feed(len(data))
+
+
+def test_split_request():
+    req = Request()
+    raw = b'GET /data.json?x=1 HTTP/1.1\r\nIf-None-Match: "d1"\r\nX-Other: y\r\n\r\n'
+    for i in range(len(raw) - 1):
+        assert feed(req, raw[i:i + 1]) == NEED_MORE
+    assert feed(req, raw[-1:]) == DONE
+    assert req.method == 'GET'
+    assert req.path == '/data.json'
+    assert req.query == 'x=1'
+    assert req.headers == {'if-none-match': '"d1"'}
+
+
+def test_post_form():
+    req = Request()
+    body = b'house=21&water=45'
+    assert feed(req, b'POST /settings HTTP/1.0\r\nContent-Type: application/x-www-form-urlencoded\r\n'
+                     b'Content-Length: %d\r\n\r\n' % len(body)) == NEED_MORE
+    assert feed(req, body) == DONE
+    assert req.args() == {'house': '21', 'water': '45'}
+
+
+def test_head_too_large():
+    req = Request(maxhead=64)
+    assert feed(req, b'GET / HTTP/1.0\r\n' + b'X: ' + b'a' * 60) == ERROR
+    assert req.status == 431
+
+
+def test_line_too_long():
+    req = Request(maxline=32)
+    assert feed(req, b'GET /' + b'a' * 40) == ERROR
+    assert req.status == 414
+
+
+def test_body_too_large():
+    req = Request(maxbody=8)
+    assert feed(req, b'POST / HTTP/1.0\r\nContent-Length: 9\r\n\r\n') == ERROR
+    assert req.status == 413
+
+
+def test_too_many_lines():
+    req = Request(maxlines=4)
+    assert feed(req, b'GET / HTTP/1.0\r\nA: 1\r\nB: 2\r\nC: 3\r\nD: 4\r\n\r\n') == ERROR
+    assert req.status == 431
+
+
+def test_garbage():
+    for raw in (b'GET /\r\n\r\n', b'GET / FTP/1.0\r\n\r\n', b'GET /%ff HTTP/1.0\r\n\r\n',
+                b'POST / HTTP/1.0\r\nContent-Length: x\r\n\r\n'):
+        req = Request()
+        assert feed(req, raw) == ERROR, raw
+        assert req.status == 400, raw
+
+
+def test_reset():
+    req = Request()
+    feed(req, b'GET /a HTTP/1.0\r\n\r\n')
+    req.reset()
+    assert feed(req, b'GET /b HTTP/1.0\r\n\r\n') == DONE
+    assert req.path == '/b'
+
+
+def test_unquote():
+    assert httpparser.unquote('a%20b+c') == 'a b+c'
+    assert httpparser.unquote_plus('a%20b+c') == 'a b c'
+    assert httpparser.unquote('%C5%BE') == 'ž'
+    assert httpparser.unquote('100%') == '100%'
+    assert httpparser.unquote('%zz') == '%zz'
+    assert httpparser.unquote('%a') == '%a'
+    assert httpparser.unquote('x%ay') == 'x%ay'
+    assert httpparser.unquote_plus('%+1') == '% 1'
+
+
+def test_plus_in_path():
+    req = Request()
+    assert feed(req, b'GET /a+b%20c?x=1+2 HTTP/1.0\r\n\r\n') == DONE
+    assert req.path == '/a+b c'
+    assert httpparser.parse_qs(req.query) == {'x': '1 2'}
+
+
+def test_parse_qs():
+    assert httpparser.parse_qs('zone=bed%20room&house=20&bad') == {'zone': 'bed room', 'house': '20'}
+    assert httpparser.parse_qs('') == {}
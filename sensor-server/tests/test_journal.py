@@ -0,0 +1,70 @@
+import os
+
+import journal
+from journal import Journal
+
+
+def small(tmp_path):
+    # 3 segments of 4 records, flushed every 2
+    return Journal(prefix=str(tmp_path / 'journal.'), segments=3, segment_records=4,
+                   buffer_records=2)
+
+
+def test_query_includes_ram(tmp_path):
+    j = small(tmp_path)
+    for t in range(100, 105):
+        j.log(t, journal.RELAY_ON, 1, t)
+    assert j.n == 1 # the fifth waits in RAM
+    assert [r[0] for r in j.query()] == [100, 101, 102, 103, 104]
+    assert [r[1] for r in j.query()] == [0, 1, 2, 3, 4]
+    assert list(j.query(101, 104)) == [(t, t - 100, journal.RELAY_ON, 1, t, 0) for t in (101, 102, 103)]
+    assert [r[0] for r in j.query(limit=2)] == [100, 101]
+    assert list(j.query(200)) == []
+
+
+def test_rotation(tmp_path):
+    j = small(tmp_path)
+    for t in range(100, 114):
+        j.log(t, journal.SETPOINT, 0, t, t)
+    j.flush()
+    # 14 records in segments of 4: the oldest segment was started over
+    assert [r[0] for r in j.query()] == list(range(104, 114))
+    sizes = sorted(os.path.getsize(str(tmp_path / ('journal.%d' % i))) for i in range(3))
+    assert sizes == [2 * journal.SIZE, 4 * journal.SIZE, 4 * journal.SIZE]
+    assert [r[0] for r in j.query(105, 109)] == [105, 106, 107, 108]
+
+
+def test_continues_after_reboot(tmp_path):
+    j = small(tmp_path)
+    for t in range(1000, 1006):
+        j.log(t, journal.RELAY_ON)
+    j.flush()
+    # the clock starts over at a reset
+    j = small(tmp_path)
+    assert j.seq == 6
+    j.log(5, journal.BOOT)
+    j.log(3, journal.RELAY_OFF) # never back in time
+    times = [r[0] for r in j.query()]
+    assert times == sorted(times)
+    assert times[-2:] == [1006, 1006]
+    assert [r[1] for r in j.query()] == list(range(8))
+
+
+def test_query_limit_capped(tmp_path):
+    j = small(tmp_path)
+    j.log(1, journal.BOOT)
+    assert len(list(j.query(limit=-1))) == 0
+    assert len(list(j.query(limit=journal.MAXQUERY + 5))) == 1
+
+
+def test_values_clamped(tmp_path):
+    j = small(tmp_path)
+    j.log(1, journal.SETPOINT, 0, 99999, -40000)
+    j.log(2, journal.SETPOINT, 300, 20.7, 45)
+    assert [r[3:] for r in j.query()] == [(0, 32767, -32768), (255, 20, 45)]
+
+
+def test_csv_and_pack():
+    rec = (10, 2, journal.RELAY_ON, journal.WHY_HOUSE_COLD, 1, 0)
+    assert journal.csv_line(rec) == '10,2,relay_on,1,1,0\n'
+    assert len(journal.pack(rec)) == journal.SIZE == 14
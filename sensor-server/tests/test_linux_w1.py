@@ -0,0 +1,91 @@
+import shutil
+import time
+
+import pytest
+
+import fake_w1sysfs
+import linux_w1
+from linux_w1 import DS18X20, OneWire, OneWireError
+
+
+def sensors(path):
+    return DS18X20(OneWire(path=path))
+
+
+def test_names_and_roms():
+    for rom, t in fake_w1sysfs.thermometers:
+        assert linux_w1.rom_from_name(linux_w1.name_from_rom(rom)) == rom
+
+
+def test_scan(tmp_path):
+    path = str(tmp_path)
+    fake_w1sysfs.make_tree(path)
+    (tmp_path / '00-400000000000').mkdir() # not a thermometer
+    assert linux_w1.available(path)
+    assert not linux_w1.available(str(tmp_path / 'none'))
+    ds = sensors(path)
+    assert sorted(ds.scan()) == sorted([rom for rom, t in fake_w1sysfs.thermometers])
+    assert len(ds.ow.scan()) == 5
+
+
+def test_read_temp(tmp_path):
+    path = str(tmp_path)
+    fake_w1sysfs.make_tree(path)
+    ds = sensors(path)
+    ds.convert_temp()
+    for rom, t in fake_w1sysfs.thermometers:
+        assert ds.read_temp(rom) == t
+    # without a conversion, read right away
+    rom = fake_w1sysfs.thermometers[1][0]
+    fake_w1sysfs.set_temperature(path, rom, 21.5)
+    assert ds.read_temp(rom) == 21.5
+
+
+class SlowDS18X20(DS18X20):
+    # every read takes a conversion time, as in the kernel
+    conversion = 0.3
+
+    def read_sysfs(self, name):
+        time.sleep(self.conversion)
+        return DS18X20.read_sysfs(self, name)
+
+
+def test_one_conversion_for_all(tmp_path):
+    path = str(tmp_path)
+    fake_w1sysfs.make_tree(path)
+    ds = SlowDS18X20(OneWire(path=path))
+    start = time.time()
+    ds.convert_temp()
+    temps = [ds.read_temp(rom) for rom, t in fake_w1sysfs.thermometers]
+    took = time.time() - start
+    assert temps == [t for rom, t in fake_w1sysfs.thermometers]
+    assert took < 2 * SlowDS18X20.conversion # not 4 of them
+
+
+def test_w1_slave(tmp_path):
+    path = str(tmp_path)
+    fake_w1sysfs.make_tree(path, w1_slave_only=True)
+    ds = sensors(path)
+    rom = fake_w1sysfs.thermometers[0][0]
+    assert ds.read_temp(rom) == 45.5
+    fake_w1sysfs.set_temperature(path, rom, 46.0, w1_slave_only=True, crc_ok=False)
+    with pytest.raises(OneWireError):
+        ds.read_temp(rom)
+    ds.convert_temp()
+    with pytest.raises(OneWireError):
+        ds.read_temp(rom)
+
+
+def test_vanished_device(tmp_path):
+    path = str(tmp_path)
+    fake_w1sysfs.make_tree(path)
+    ds = sensors(path)
+    rom = fake_w1sysfs.thermometers[2][0]
+    assert ds.read_temp(rom) == 30.0
+    shutil.rmtree(str(tmp_path / linux_w1.name_from_rom(rom)))
+    with pytest.raises(OSError):
+        ds.read_temp(rom)
+    assert rom not in ds.scan()
+    ds.convert_temp() # only the ones still there
+    assert linux_w1.name_from_rom(rom) not in ds.pending
+    assert len(ds.pending) == 3
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from sensorserver import ReadSchedule
+
+
+def test_still_and_far_is_read_rarely():
+    s = ReadSchedule()
+    s.read_ok(0, 40.0, margin=10, fast=False)
+    assert s.period == s.maxperiod
+    assert not s.due(59) and s.due(60)
+    assert s.due(56, early=5) # shares a conversion due soon
+
+
+def test_moving_is_read_more_often():
+    s = ReadSchedule()
+    s.read_ok(0, 40.0, margin=None, fast=False)
+    s.read_ok(60, 43.0, margin=None, fast=False)
+    # 0.05 degrees/s, halved by the smoothing: 0.25 degrees in 10 s
+    assert s.rate == 0.025
+    assert s.period == 10
+    s.read_ok(70, 43.0, margin=None, fast=False)
+    assert s.period == 20 # calmed down
+
+
+def test_close_to_a_limit():
+    s = ReadSchedule()
+    s.read_ok(0, 40.0, margin=None, fast=False)
+    s.read_ok(10, 40.1, margin=8, fast=False)
+    assert not s.near
+    assert abs(s.period - s.maxstep / s.rate) < 1e-6
+    s.read_ok(20, 40.1, margin=0.5, fast=False)
+    assert s.near and s.period == s.minperiod
+    s.plan(20, None, False) # winter mode: no limit any more
+    assert not s.near
+
+
+def test_fast_and_settling():
+    s = ReadSchedule()
+    s.read_ok(0, 40.0, margin=None, fast=True)
+    assert s.period == s.minperiod
+    s.read_ok(3, 40.0, margin=None, fast=False, settling=True)
+    assert s.period == s.minperiod
+    s.read_ok(6, 40.0, margin=None, fast=False)
+    assert s.period == s.maxperiod
+
+
+def test_failed_read_retried_soon():
+    s = ReadSchedule()
+    s.read_ok(0, 40.0, margin=None, fast=False)
+    s.read_failed(10)
+    assert s.nextread == 10 + s.minperiod
+    assert s.lastgood == 0
+    assert not s.stale(s.ttl) and s.stale(s.ttl + 1)
+    assert ReadSchedule().stale(0) # never read
+
+
+def test_lost_thermometer_expires(sensors):
+    temps, devices = sensors
+    p = SimpleNamespace(desiredHouseMin=20, desiredWaterMin=50)
+    temps.update(p, None, 1000)
+    assert temps.temperatures["house"] == 20.0
+    temps.ds_sensor.ow.bus.devices.remove(devices["house"])
+    now = 1000
+    while now < 1000 + ReadSchedule.ttl:
+        now += 10
+        temps.update(p, None, now)
+        assert temps.temperatures["house"] == 20.0
+    temps.update(p, None, now + 10)
+    assert temps.temperatures["house"] is None
+    assert temps.raw_temperatures["house"] is None
+    assert temps.lost == ["house"]
+    assert temps.temperatures["water"] == 20.0 # the others go on
+    # back on the bus: read again at the next retry
+    temps.ds_sensor.ow.bus.devices.append(devices["house"])
+    temps.update(p, None, now + 20)
+    assert temps.temperatures["house"] == 20.0
+    assert temps.lost == []
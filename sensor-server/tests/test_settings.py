@@ -0,0 +1,111 @@
+import json
+import os
+from html.parser import HTMLParser
+from types import SimpleNamespace
+
+import pytest
+
+import decision
+import sensorserver
+import zones
+
+
+class Presets(HTMLParser):
+    # the fields of the forms that POST to /settings
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.forms = []
+        self.form = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form' and attrs.get('action') == '/settings':
+            self.form = {}
+        elif tag == 'input' and self.form is not None and attrs.get('type') == 'hidden':
+            self.form[attrs['name']] = attrs['value']
+
+    def handle_endtag(self, tag):
+        if tag == 'form' and self.form is not None:
+            if self.form:
+                self.forms.append(self.form)
+            self.form = None
+
+
+def presets():
+    p = Presets()
+    with open(os.path.join(os.path.dirname(sensorserver.__file__), 'index.html')) as f:
+        p.feed(f.read())
+    return p.forms
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    made = []
+    monkeypatch.setattr(sensorserver, 'request', made.append)
+    monkeypatch.setattr(sensorserver, 'params',
+                        SimpleNamespace(desiredHouseMin=20, desiredWaterMin=50))
+    bed = zones.Zone(1, 'bed', 16, room='bed')
+    monkeypatch.setattr(sensorserver, 'zonectl', zones.ZoneController([bed]))
+    return made
+
+
+def change(pairs):
+    return sensorserver.MyNetwork.change_settings(None, pairs)
+
+
+def test_presets_accepted(requests):
+    forms = presets()
+    assert len(forms) == 5
+    for form in forms:
+        assert change(form) is None, form
+    assert requests == [('limits', int(f['house']), int(f['water'])) for f in forms]
+
+
+def test_out_of_range_refused(requests):
+    for house, water in (('99999', '45'), ('4', '45'), ('31', '45'), ('20', '-2'), ('20', '91')):
+        assert change({'house': house, 'water': water}) == 400
+        assert change({'zone': 'bed', 'house': house, 'water': water}) == 400
+    assert requests == []
+
+
+def test_missing_field_kept(requests):
+    assert change({'water': '35'}) is None
+    assert change({'zone': 'bed', 'house': '22'}) is None
+    assert requests == [('limits', 20, 35), ('zone', 'bed', 22, 50)]
+
+
+def test_unknown_zone(requests):
+    assert change({'zone': 'attic', 'house': '22', 'water': '50'}) == 404
+    assert requests == []
+
+
+class Events:
+    def __init__(self):
+        self.logged = []
+
+    def log(self, *record):
+        self.logged.append(record)
+
+
+def test_saved_out_of_range_refused(tmp_path):
+    path = str(tmp_path / 'parameters.txt')
+    with open(path, 'w') as f:
+        json.dump({'desiredHouseMin': 22, 'desiredWaterMin': 95}, f)
+    p = decision.Params(path)
+    assert (p.desiredHouseMin, p.desiredWaterMin) == (22, 50) # not 90
+
+
+def test_store_out_of_range_refused(tmp_path):
+    path = str(tmp_path / 'parameters.txt')
+    events = Events()
+    p = decision.Params(path, events)
+    assert p.store_params(desiredHouseMin=21, desiredWaterMin=90)
+    assert not p.store_params(desiredWaterMin=91)
+    assert not p.store_params(desiredHouseMin=4, desiredWaterMin=60)
+    assert (p.desiredHouseMin, p.desiredWaterMin) == (21, 90)
+    with open(path) as f:
+        assert json.load(f) == {'desiredHouseMin': 21, 'desiredWaterMin': 90}
+    assert [e[2:] for e in events.logged] == [(0, 21, 90)]
+    # and back as they were stored
+    p = decision.Params(path)
+    assert (p.desiredHouseMin, p.desiredWaterMin) == (21, 90)
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+import hwbackend # registers 'machine'
+import statusstrip
+import fake_neopixel
+from statusstrip import StatusStrip
+
+
+def snap(version, water=40, level=1010, running=False, should=False, electric=False):
+    return SimpleNamespace(version=version, temperatures={"water": water},
+                           garden_water_level=level, heating_running=running,
+                           should_heat=should, electric=electric)
+
+
+class Clock:
+    def __init__(self, monkeypatch):
+        self.now = 0
+        monkeypatch.setattr(statusstrip, 'ticks_ms', lambda: self.now)
+
+
+def settle(strip, clock):
+    # tick until the strip shows what is wanted; the writes it took
+    writes = strip.np.writes
+    for _ in range(100):
+        clock.now += strip.period
+        strip.tick()
+    return strip.np.writes - writes
+
+
+def test_uses_fake_neopixel(monkeypatch):
+    Clock(monkeypatch)
+    strip = StatusStrip(7)
+    assert isinstance(strip.np, fake_neopixel.NeoPixel)
+    assert strip.np.writes == 1 # cleared
+    assert strip.np.pixels == [(0, 0, 0)] * 8
+
+
+def test_no_write_when_nothing_changed(monkeypatch):
+    clock = Clock(monkeypatch)
+    strip = StatusStrip(7, bright=40, frames=4)
+    strip.show(snap(1, running=True))
+    assert settle(strip, clock) == 4 # a change fades in over 'frames' writes
+    assert strip.np[7] == (0, 40, 0)
+    assert strip.np[5] == strip.np[6] == statusstrip.tank_rgb(40, 40)
+    # the same snapshot again, or a new one that looks the same
+    strip.show(snap(1, running=True))
+    strip.show(snap(2, running=True))
+    assert settle(strip, clock) == 0
+    assert not strip.tick()
+
+
+def test_writes_at_most_fps(monkeypatch):
+    clock = Clock(monkeypatch)
+    strip = StatusStrip(7, fps=20, frames=4)
+    strip.show(snap(1, water=None, level=-1))
+    clock.now += strip.period
+    assert strip.tick()
+    for _ in range(10):
+        clock.now += 1
+        assert not strip.tick() # within 50 ms of the last write
+    clock.now += strip.period
+    assert strip.tick()
+    assert strip.writes == 2
+
+
+def test_colors(monkeypatch):
+    clock = Clock(monkeypatch)
+    strip = StatusStrip(7, bright=40)
+    strip.show(snap(1, water=None, level=-1, should=True))
+    settle(strip, clock)
+    assert strip.np.pixels[:5] == [(20, 0, 0)] * 5 # no garden reading
+    assert strip.np[5] == (20, 20, 0) # no tank reading
+    assert strip.np[7] == (40, 13, 0) # about to start
+    strip.show(snap(2, level=0, electric=True))
+    settle(strip, clock)
+    assert strip.np.pixels[:5] == [(0, 10, 40)] * 5 # a full barrel
+    assert strip.np[7] == (20, 0, 20)
+    strip.show(snap(3, level=statusstrip.GARDEN_HI))
+    settle(strip, clock)
+    assert strip.np.pixels[:5] == [(0, 0, 0)] * 5 # empty
+    assert strip.np[7] == (0, 0, 0)
+
+
+class RecordingNeoPixel(fake_neopixel.NeoPixel):
+    # notes which LEDs are set
+    def __init__(self, pin, n):
+        fake_neopixel.NeoPixel.__init__(self, pin, n)
+        self.set = []
+
+    def __setitem__(self, i, rgb):
+        self.set.append(i)
+        fake_neopixel.NeoPixel.__setitem__(self, i, rgb)
+
+
+def test_only_changed_leds_set(monkeypatch):
+    clock = Clock(monkeypatch)
+    monkeypatch.setattr(statusstrip, 'neopixel', SimpleNamespace(NeoPixel=RecordingNeoPixel))
+    strip = StatusStrip(7)
+    strip.show(snap(1))
+    settle(strip, clock)
+    del strip.np.set[:]
+    strip.show(snap(2, running=True))
+    assert settle(strip, clock) == 4
+    assert set(strip.np.set) == {7}
@@ -0,0 +1,140 @@
+from wlansupervisor import (WlanSupervisor, CONNECT, WAIT, BIND, SERVE, LOST, BACKOFF,
+                            STAT_GOT_IP)
+
+STAT_CONNECTING = 1
+
+
+class FakeWlan:
+    # the part of network.WLAN the supervisor uses
+    def __init__(self):
+        self.stat = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.fail_connect = False
+        self.connected = STAT_CONNECTING # the status right after connect()
+
+    def connect(self, ssid, pw):
+        self.connects += 1
+        if self.fail_connect:
+            raise OSError(1)
+        self.stat = self.connected
+
+    def disconnect(self):
+        self.disconnects += 1
+        self.stat = 0
+
+    def status(self, param=None):
+        if param == 'rssi':
+            return -60
+        return self.stat
+
+    def ifconfig(self):
+        return ('192.168.1.20', '255.255.255.0', '192.168.1.1', '192.168.1.1')
+
+
+class Socket:
+    def __init__(self):
+        self.ok = True
+        self.binds = 0
+        self.unbinds = 0
+
+    def bind(self):
+        self.binds += 1
+        return self.ok
+
+    def unbind(self):
+        self.unbinds += 1
+
+
+def supervisor(wlan, sock, **kw):
+    return WlanSupervisor(wlan, 'ssid', 'pw', sock.bind, sock.unbind, **kw)
+
+
+def test_connect_serve_lose():
+    wlan, sock = FakeWlan(), Socket()
+    s = supervisor(wlan, sock)
+    assert s.state == CONNECT
+    assert not s.step(100)
+    assert s.state == WAIT and wlan.connects == 1
+    assert not s.step(101) # still associating
+    assert s.state == WAIT
+    wlan.stat = STAT_GOT_IP
+    s.step(103)
+    assert s.state == BIND
+    assert s.associate_time == 3 and s.ip == '192.168.1.20'
+    assert s.step(104)
+    assert s.state == SERVE and sock.binds == 1
+    assert s.step(105)
+    assert s.rssi == -60
+    wlan.stat = -1 # the link went down
+    assert not s.step(106)
+    assert s.state == LOST
+    s.step(107)
+    assert s.state == BACKOFF
+    assert sock.unbinds == 1 and wlan.disconnects == 1 and s.reconnects == 1
+    s.step(108) # 1 s of the 2
+    assert s.state == BACKOFF
+    s.step(109)
+    assert s.state == CONNECT
+    s.step(110)
+    assert s.state == WAIT and wlan.connects == 2
+
+
+def test_backoff_doubles_to_cap():
+    wlan, sock = FakeWlan(), Socket()
+    s = supervisor(wlan, sock, connect_timeout=5, min_backoff=2, max_backoff=16)
+    now = 0
+    waits = []
+    for _ in range(6):
+        s.step(now) # CONNECT -> WAIT
+        assert s.state == WAIT
+        now += 6 # never gets an IP
+        s.step(now)
+        assert s.state == BACKOFF
+        start = now
+        while s.state == BACKOFF:
+            now += 1
+            s.step(now)
+        waits.append(now - start)
+    assert waits == [2, 4, 8, 16, 16, 16]
+    assert s.failures == 6 and s.connects == 6
+
+
+def test_failures_back_off():
+    wlan, sock = FakeWlan(), Socket()
+    s = supervisor(wlan, sock)
+    wlan.fail_connect = True
+    s.step(0)
+    assert s.state == BACKOFF and s.failures == 1
+    wlan.fail_connect = False
+    wlan.connected = -3 # bad auth
+    s.step(2)
+    assert s.state == CONNECT
+    s.step(3)
+    assert s.state == WAIT
+    s.step(4)
+    assert s.state == BACKOFF and s.failures == 2
+    # a socket that cannot bind backs off too, serving resets the backoff
+    wlan.connected = STAT_GOT_IP
+    sock.ok = False
+    now = 100
+    while s.state != BIND:
+        s.step(now)
+        now += 1
+    s.step(now)
+    assert s.state == BACKOFF and s.failures == 3
+    assert s.backoff == 8 # 2, then 4, now 8
+    sock.ok = True
+    while s.state != SERVE:
+        now += 1
+        s.step(now)
+    assert s.backoff == s.min_backoff
+
+
+def test_without_wlan():
+    sock = Socket()
+    s = supervisor(None, sock)
+    assert s.state == BIND
+    assert s.step(0)
+    assert s.step(1)
+    assert s.stats()["state"] == SERVE
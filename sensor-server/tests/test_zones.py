@@ -0,0 +1,128 @@
+import json
+
+import journal
+import zones
+from zones import Zone, ZoneController
+
+
+class Pin:
+    OUT = 1
+    def __init__(self, pin, mode=None):
+        self.v = None
+    def value(self, v):
+        self.v = v
+
+
+class Machine:
+    Pin = Pin
+
+
+class Watchdog:
+    def start_immediately(self):
+        pass
+
+
+class Events:
+    def __init__(self):
+        self.logged = []
+    def log(self, now, kind, reason=0, a=0, b=0):
+        self.logged.append((kind, a))
+
+
+def controller(zs, sources=None):
+    c = ZoneController(zs, sources)
+    c.start(Machine, Watchdog(), Events())
+    return c
+
+
+def test_wants():
+    z = Zone(1, 'bed', 16, room='bed', house_min=20, water_min=40)
+    assert z.wants({'bed': 19, 'water': 45})
+    assert z.decision == journal.WHY_HOUSE_COLD
+    assert not z.wants({'bed': 19, 'water': 30, 'heaterOut': 39})
+    assert z.wants({'bed': 19, 'water': 30, 'heaterOut': 41}) # the warmest counts
+    assert not z.wants({'bed': 21, 'water': 45})
+    assert z.decision == journal.WHY_SATISFIED
+    assert not z.wants({'water': 45})
+    assert z.decision == journal.WHY_NO_THERMOMETER
+    z.water_min = -1 # winter mode
+    assert z.wants({'bed': 19})
+    assert z.decision == journal.WHY_WINTER
+
+
+def test_min_times():
+    z = Zone(1, 'bed', 16, room='bed', house_min=20, water_min=40)
+    c = controller([z])
+    cold, warm = {'bed': 18, 'water': 50}, {'bed': 22, 'water': 50}
+    assert not c.step(cold, 100) # not 10 minutes since the boot yet
+    assert c.step(cold, 700)
+    assert z.running and z.relay.v == 1
+    assert not c.step(warm, 800) # runs at least 3 minutes
+    assert c.step(warm, 900)
+    assert not z.running and z.relay.v == 0
+    assert z.runtime == 200
+    assert not c.step(cold, 1000) # stops at least 10 minutes
+    assert c.step(cold, 1600)
+    assert c.events.logged == [(journal.RELAY_ON, 1), (journal.RELAY_OFF, 1), (journal.RELAY_ON, 1)]
+
+
+def test_source_cap():
+    a = Zone(1, 'a', 16, room='a', house_min=20, water_min=40)
+    b = Zone(2, 'b', 17, room='b', house_min=20, water_min=40)
+    c = controller([a, b], {'tank': 1})
+    temps = {'a': 19, 'b': 15, 'water': 50}
+    c.step(temps, 700)
+    assert b.running and not a.running # the coldest first
+    # the main heating takes the tank: b gives way after its minimum run
+    c.step(temps, 800, {'tank': 1})
+    assert b.running
+    c.step(temps, 900, {'tank': 1})
+    assert not b.running and not a.running
+
+
+def test_limits():
+    a = Zone(1, 'a', 16, room='a', tank=('water',), house_min=20, water_min=40)
+    b = Zone(2, 'b', 17, room='b', tank=('water',), house_min=21, water_min=-1)
+    c = ZoneController([a, b])
+    assert c.limits() == {'a': [20], 'water': [40], 'b': [21]}
+
+
+def test_restore():
+    z = Zone(1, 'bed', 16, room='bed')
+    c = controller([z])
+    c.restore({"zones": [{"running": True, "on_age_ms": 60000, "off_age_ms": 900000}]}, 1000)
+    assert z.lastONtime == 940
+    assert z.lastOFFtime == 1000 # the relay was switched off by the reset
+    c.restore({}, 1000) # an old checkpoint, without zones
+
+
+def test_load_and_store(tmp_path):
+    name = str(tmp_path / 'zones.json')
+    with open(name, 'w') as f:
+        json.dump({"thermometers": {"bed": "28ff641e0d1803c1"}, "sources": {"tank": 2},
+                   "zones": [{"name": "bed", "relay": 16, "room": "bed", "house_min": 21,
+                              "water_min": 40, "tank": ["water"]}]}, f)
+    c = zones.load(name)
+    assert [(z.index, z.name, z.tank) for z in c.zones] == [(1, 'bed', ('water',))]
+    assert c.sources == {'tank': 2}
+    assert c.thermometers == {'bed': bytearray(b'\x28\xff\x64\x1e\x0d\x18\x03\xc1')}
+    assert c.store('bed', house_min=22, water_min=10)
+    assert not c.store('attic', house_min=22)
+    assert c.get('bed').water_min == 10
+    with open(name) as f:
+        saved = json.load(f)["zones"][0]
+    assert (saved["house_min"], saved["water_min"]) == (22, zones.WATER_MIN_SAVED)
+
+
+def test_load_without_file(tmp_path):
+    assert zones.load(str(tmp_path / 'zones.json')).zones == []
+    bad = tmp_path / 'bad.json'
+    bad.write_text('{')
+    assert zones.load(str(bad)).zones == []
+    for config in ({"zones": [{"name": "bed", "relay": 16, "rooom": "bed"}]},
+                   {"zones": [{"name": "bed"}]},
+                   {"thermometers": {"bed": "28ff64"}},
+                   {"thermometers": {"bed": "28ff641e0d1803cx"}},
+                   {"zones": {"name": "bed"}}):
+        bad.write_text(json.dumps(config))
+        assert zones.load(str(bad)).zones == []
@@ -0,0 +1,120 @@
+# Keeps the Wi-Fi link and the listening socket up without ever waiting:
+# step() is called once per control loop, looks at wlan.status() and moves
+# at most one state further.
+#
+#   CONNECT  call wlan.connect(), go to WAIT
+#   WAIT     until the link is up (BIND) or failed / taking too long (BACKOFF)
+#   BIND     open the listening socket, SERVE if it worked, else BACKOFF
+#   SERVE    all good; if the link goes down, LOST
+#   LOST     close the socket, count a reconnect, BACKOFF
+#   BACKOFF  wait 2, 4, 8 ... up to 300 s, then CONNECT again
+#
+# Without a wlan (on a PC the host has the network) we start in BIND.
+
+CONNECT = 'connect'
+WAIT = 'wait'
+BIND = 'bind'
+SERVE = 'serve'
+LOST = 'lost'
+BACKOFF = 'backoff'
+
+# wlan.status() values of the Pico W
+STAT_GOT_IP = 3
+
+class WlanSupervisor:
+    def __init__(self, wlan, ssid, pw, bind, unbind,
+                 connect_timeout=15, min_backoff=2, max_backoff=300):
+        self.wlan = wlan
+        self.ssid = ssid
+        self.pw = pw
+        self.bind = bind # opens the socket; returns True if it worked
+        self.unbind = unbind
+        self.connect_timeout = connect_timeout # seconds in WAIT
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.state = CONNECT if wlan is not None else BIND
+        self.since = None # when we entered the state
+        self.backoff = min_backoff
+        # link quality, for the page
+        self.rssi = None
+        self.connects = 0 # wlan.connect() calls
+        self.failures = 0 # connects that did not get an IP
+        self.reconnects = 0 # links that were up and got lost
+        self.associate_time = None # seconds from connect() to an IP, last time
+        self.ip = None
+
+    def link_up(self):
+        return self.wlan is None or self.wlan.status() == STAT_GOT_IP
+
+    def goto(self, state, now):
+        print('WLAN', self.state, '->', state)
+        self.state = state
+        self.since = now
+
+    def step(self, now):
+        # one move of the state machine; returns True when serving
+        if self.since is None:
+            self.since = now
+        state = self.state
+        if state == CONNECT:
+            self.connects += 1
+            try:
+                self.wlan.connect(self.ssid, self.pw)
+            except OSError as e:
+                print('WLAN connect failed', e)
+                self.fail(now)
+                return False
+            self.goto(WAIT, now)
+        elif state == WAIT:
+            status = self.wlan.status()
+            if status == STAT_GOT_IP:
+                self.associate_time = now - self.since
+                self.ip = self.wlan.ifconfig()[0]
+                print('Connected, ip =', self.ip, 'after', self.associate_time, 's')
+                self.goto(BIND, now)
+            elif status < 0 or now - self.since > self.connect_timeout:
+                # -1 link fail, -2 no net, -3 bad auth, or just too slow
+                print('Wi-Fi connection failed, status', status)
+                self.fail(now)
+        elif state == BIND:
+            if self.bind():
+                self.backoff = self.min_backoff
+                self.goto(SERVE, now)
+            else:
+                self.fail(now)
+        elif state == SERVE:
+            if not self.link_up():
+                self.goto(LOST, now)
+            elif self.wlan is not None:
+                try:
+                    self.rssi = self.wlan.status('rssi')
+                except (OSError, ValueError, TypeError):
+                    pass
+        elif state == LOST:
+            self.reconnects += 1
+            self.unbind()
+            try:
+                self.wlan.disconnect()
+            except OSError:
+                pass
+            self.goto(BACKOFF, now)
+        elif state == BACKOFF:
+            if now - self.since >= self.backoff:
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                self.goto(CONNECT if self.wlan is not None else BIND, now)
+        return self.state == SERVE
+
+    def fail(self, now):
+        self.failures += 1
+        self.goto(BACKOFF, now)
+
+    def stats(self):
+        return {
+          "state": self.state,
+          "rssi": self.rssi,
+          "connects": self.connects,
+          "failures": self.failures,
+          "reconnects": self.reconnects,
+          "associate_time": self.associate_time,
+          "backoff": self.backoff,
+        }
@@ -0,0 +1,233 @@
+# More rooms from one Pico: besides the main heating (Heating and Params,
+# relay on pin 14), zones.json may list zones, each with its own relay pin,
+# its own room thermometer, setpoints and min run / stop times:
+#
+#   {
+#     "thermometers": {"bedroom": "28ff641e0d1803c1"},
+#     "sources": {"tank": 2},
+#     "zones": [
+#       {"name": "bedroom", "relay": 16, "room": "bedroom",
+#        "house_min": 21, "water_min": 40,
+#        "min_runtime_minutes": 3, "min_stoptime_minutes": 10}
+#     ]
+#   }
+#
+# "thermometers" are ROMs (hex) of the extra thermometers on the 1-wire bus.
+# "sources" caps how many zones may draw from a source at once; the main
+# heating counts as one user of "tank" while it runs, and is never held back
+# (it also frees the tank when the water is too hot). When over the cap, the
+# zones closest to their setpoint wait or stop first.
+#
+# All zones are decided in one pass over the temperatures already read for
+# the main heating, so more zones cost a few comparisons, no more reading.
+
+import json
+try:
+    from ubinascii import unhexlify
+except ImportError:
+    from binascii import unhexlify
+import journal
+
+FILENAME = 'zones.json'
+WATER_MIN_SAVED = 33 # never saved lower, as Params.desiredWaterMinNeverSaveLessThanThis
+TANK = ('water', 'heaterOut', 'waterFromSun') # the warmest of them is the water
+
+class Zone:
+    def __init__(self, index, name, relay, room='house', tank=TANK, source='tank',
+                 house_min=20, water_min=50, min_runtime_minutes=3, min_stoptime_minutes=10):
+        self.index = index # 1.., the journal numbers zones so (0 is the main heating)
+        self.name = name
+        self.pin = relay
+        self.room = room # thermometer name
+        self.tank = tank
+        self.source = source
+        self.house_min = house_min
+        self.water_min = water_min # below 0: winter mode, water ignored
+        self.min_runtime_minutes = min_runtime_minutes
+        self.min_stoptime_minutes = min_stoptime_minutes
+        self.relay = None # machine.Pin, made by ZoneController
+        self.running = False
+        self.want = False
+        self.decision = journal.WHY_NONE
+        self.lastONtime = 0
+        self.lastOFFtime = 0
+        self.runtime = 0 # seconds since boot
+
+    def wants(self, temperatures):
+        # like Params.decide_if_heat; leaves why in self.decision
+        house = temperatures.get(self.room)
+        self.decision = journal.WHY_NO_THERMOMETER
+        if house is None:
+            return False
+        if self.water_min < 0:
+            self.decision = journal.WHY_WINTER if house < self.house_min else journal.WHY_SATISFIED
+            return house < self.house_min
+        water = None
+        for n in self.tank:
+            t = temperatures.get(n)
+            if t is not None and (water is None or t > water):
+                water = t
+        if water is None:
+            return False
+        cold = house < self.house_min and water > self.water_min
+        self.decision = journal.WHY_HOUSE_COLD if cold else journal.WHY_SATISFIED
+        return cold
+
+    def deficit(self, temperatures):
+        # how much colder than wanted; the coldest zone goes first
+        house = temperatures.get(self.room)
+        return -1000 if house is None else self.house_min - house
+
+    def limits(self):
+        # thermometer name -> temperatures where wants() changes its mind
+        water = [] if self.water_min < 0 else [self.water_min]
+        l = {self.room: [self.house_min]}
+        for n in self.tank:
+            l[n] = water
+        return l
+
+    def as_dict(self):
+        return {"name": self.name, "room": self.room, "running": self.running,
+                "want": self.want, "house_min": self.house_min, "water_min": self.water_min,
+                "runtime_hours": self.runtime / 3600}
+
+
+class ZoneController:
+    def __init__(self, zones=(), sources=None, thermometers=None, filename=FILENAME):
+        self.zones = list(zones)
+        self.sources = sources or {} # source -> most zones at once
+        self.thermometers = thermometers or {} # name -> ROM bytearray
+        self.filename = filename
+
+    def start(self, machine, watchdog, events):
+        # the relays, all off
+        self.watchdog = watchdog
+        self.events = events
+        for z in self.zones:
+            z.relay = machine.Pin(z.pin, machine.Pin.OUT)
+            z.relay.value(0)
+
+    def restore(self, record, now):
+        # relay timing from a checkpoint, as Heating.restore; zones by order
+        for z, r in zip(self.zones, record.get("zones", [])):
+            z.lastONtime = now - r["on_age_ms"] // 1000
+            if r["running"]:
+                z.lastOFFtime = now
+            else:
+                z.lastOFFtime = now - r["off_age_ms"] // 1000
+
+    def switch(self, z, on, now):
+        if z.running and not on:
+            z.runtime += now - z.lastONtime
+            z.lastOFFtime = now
+        elif on and not z.running:
+            z.lastONtime = now
+        else:
+            return
+        self.watchdog.start_immediately()
+        z.relay.value(1 if on else 0)
+        z.running = on
+        self.events.log(now, journal.RELAY_ON if on else journal.RELAY_OFF, z.decision, z.index)
+        self.switched = True
+
+    def step(self, temperatures, now, busy=None):
+        # decide and switch all zones; busy: source -> users outside the
+        # zones (the main heating); returns True if a relay switched
+        self.switched = False
+        if not self.zones:
+            return False
+        users = dict(busy or {})
+        waiting = []
+        for z in self.zones:
+            z.want = z.wants(temperatures)
+            if z.running:
+                if not z.want and now - z.lastONtime > z.min_runtime_minutes * 60:
+                    self.switch(z, False, now)
+                else:
+                    users[z.source] = users.get(z.source, 0) + 1
+            elif z.want and now - z.lastOFFtime > z.min_stoptime_minutes * 60:
+                waiting.append(z)
+        # over a cap (the main heating started): the warmest give way
+        running = sorted([z for z in self.zones if z.running], key=lambda z: z.deficit(temperatures))
+        for z in running:
+            cap = self.sources.get(z.source)
+            if cap is not None and users[z.source] > cap \
+                    and now - z.lastONtime > z.min_runtime_minutes * 60:
+                self.switch(z, False, now)
+                users[z.source] -= 1
+        # start the coldest first, while the sources have room
+        waiting.sort(key=lambda z: -z.deficit(temperatures))
+        for z in waiting:
+            cap = self.sources.get(z.source)
+            if cap is None or users.get(z.source, 0) < cap:
+                self.switch(z, True, now)
+                users[z.source] = users.get(z.source, 0) + 1
+        return self.switched
+
+    def limits(self):
+        # for the alarm bands of Temperatures
+        out = {}
+        for z in self.zones:
+            for n, l in z.limits().items():
+                out[n] = out.get(n, []) + l
+        return out
+
+    def get(self, name):
+        for z in self.zones:
+            if z.name == name:
+                return z
+        return None
+
+    def store(self, name, house_min=None, water_min=None):
+        # new setpoints of a zone, saved to zones.json (the water never below
+        # WATER_MIN_SAVED); False if no such zone
+        z = self.get(name)
+        if z is None:
+            return False
+        if house_min is not None:
+            z.house_min = house_min
+        if water_min is not None:
+            z.water_min = water_min
+        try:
+            with open(self.filename) as f:
+                config = json.load(f)
+            for c in config["zones"]:
+                if c["name"] == name:
+                    c["house_min"] = z.house_min
+                    c["water_min"] = max(z.water_min, WATER_MIN_SAVED)
+            with open(self.filename, 'w') as f:
+                json.dump(config, f)
+        except (OSError, ValueError, KeyError) as e:
+            print('Cannot save zones', e)
+        return True
+
+    def as_list(self):
+        return [z.as_dict() for z in self.zones]
+
+
+def load(filename=FILENAME):
+    # ZoneController from zones.json; without the file, no zones
+    try:
+        with open(filename) as f:
+            config = json.load(f)
+    except OSError:
+        return ZoneController(filename=filename)
+    except ValueError as e:
+        print('Bad', filename, e)
+        return ZoneController(filename=filename)
+    try:
+        zones = []
+        for i, c in enumerate(config.get("zones", [])):
+            c = dict(c)
+            if "tank" in c:
+                c["tank"] = tuple(c["tank"])
+            zones.append(Zone(i + 1, **c))
+        thermometers = dict((n, bytearray(unhexlify(rom)))
+                            for n, rom in config.get("thermometers", {}).items())
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        # a key misspelt or missing, a bad ROM: run without zones rather
+        # than fail at every boot
+        print('Bad', filename, repr(e))
+        return ZoneController(filename=filename)
+    print('Zones:', [z.name for z in zones])
+    return ZoneController(zones, config.get("sources"), thermometers, filename)